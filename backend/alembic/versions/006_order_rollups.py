@@ -0,0 +1,37 @@
+"""Add order_rollups table
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-17
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = '006'
+down_revision: Union[str, None] = '005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Per-(cafe, date, dish, options) order counters maintained by OrderService
+    op.create_table(
+        'order_rollups',
+        sa.Column('cafe_id', sa.Integer(), nullable=False),
+        sa.Column('order_date', sa.Date(), nullable=False),
+        sa.Column('kind', sa.String(20), nullable=False),
+        sa.Column('item_id', sa.Integer(), nullable=False),
+        sa.Column('options_key', sa.Text(), nullable=False, server_default=''),
+        sa.Column('quantity', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('amount', sa.Numeric(12, 2), nullable=False, server_default='0'),
+        sa.ForeignKeyConstraint(['cafe_id'], ['cafes.id']),
+        sa.PrimaryKeyConstraint('cafe_id', 'order_date', 'kind', 'item_id', 'options_key'),
+    )
+
+    # Populate with: python -m workers.rollups
+
+
+def downgrade() -> None:
+    op.drop_table('order_rollups')
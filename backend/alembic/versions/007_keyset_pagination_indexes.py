@@ -0,0 +1,29 @@
+"""Add indexes for keyset pagination
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-17
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = '007'
+down_revision: Union[str, None] = '006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Sort keys of cursor-paginated listings
+    op.create_index('ix_orders_order_date_id', 'orders', ['order_date', 'id'])
+    op.create_index('ix_summaries_date_id', 'summaries', ['date', 'id'])
+    op.create_index(
+        'ix_cafe_link_requests_created_at_id', 'cafe_link_requests', ['created_at', 'id']
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_cafe_link_requests_created_at_id', table_name='cafe_link_requests')
+    op.drop_index('ix_summaries_date_id', table_name='summaries')
+    op.drop_index('ix_orders_order_date_id', table_name='orders')
@@ -0,0 +1,94 @@
+"""Add per-user order statistics projection
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-17
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = '008'
+down_revision: Union[str, None] = '007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Daily per-user counters (orders, categories, dishes) maintained by OrderService
+    op.create_table(
+        'user_stats_days',
+        sa.Column('user_tgid', sa.BigInteger(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('kind', sa.String(20), nullable=False),
+        sa.Column('key', sa.String(255), nullable=False, server_default=''),
+        sa.Column('count', sa.Integer(), nullable=False, server_default='0'),
+        sa.ForeignKeyConstraint(['user_tgid'], ['users.tgid'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_tgid', 'day', 'kind', 'key'),
+    )
+    # Roll-off scans expired days across all users
+    op.create_index('ix_user_stats_days_day', 'user_stats_days', ['day'])
+
+    # Rolling 30-day totals read by recommendations
+    op.create_table(
+        'user_stats_totals',
+        sa.Column('user_tgid', sa.BigInteger(), nullable=False),
+        sa.Column('kind', sa.String(20), nullable=False),
+        sa.Column('key', sa.String(255), nullable=False, server_default=''),
+        sa.Column('count', sa.Integer(), nullable=False, server_default='0'),
+        sa.ForeignKeyConstraint(['user_tgid'], ['users.tgid'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_tgid', 'kind', 'key'),
+    )
+
+    # Last order date lookup
+    op.create_index('ix_orders_user_tgid_created_at', 'orders', ['user_tgid', 'created_at'])
+
+    # Backfill the current window, so recommendations see every order placed
+    # before the deploy (same rules as stats_contributions; rebuild anytime
+    # with: python -m workers.rollups --user-stats)
+    op.execute(
+        """
+        WITH recent AS (
+            SELECT user_tgid, created_at::date AS day, combo_items AS items, extras
+            FROM orders
+            WHERE created_at >= CURRENT_DATE - 29
+        ),
+        contributions AS (
+            SELECT user_tgid, day, 'order' AS kind, '' AS key, 1 AS count
+            FROM recent
+            UNION ALL
+            SELECT user_tgid, day, 'category', item->>'category', 1
+            FROM recent, json_array_elements(items) AS item
+            WHERE COALESCE(item->>'category', '') <> ''
+            UNION ALL
+            SELECT user_tgid, day, 'dish', item->>'menu_item_id', 1
+            FROM recent, json_array_elements(items) AS item
+            WHERE item->>'menu_item_id' IS NOT NULL
+            UNION ALL
+            SELECT user_tgid, day, 'dish', extra->>'menu_item_id',
+                   COALESCE((extra->>'quantity')::int, 1)
+            FROM recent, json_array_elements(extras) AS extra
+            WHERE extra->>'menu_item_id' IS NOT NULL
+        )
+        INSERT INTO user_stats_days (user_tgid, day, kind, key, count)
+        SELECT user_tgid, day, kind, key, SUM(count)
+        FROM contributions
+        GROUP BY user_tgid, day, kind, key
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO user_stats_totals (user_tgid, kind, key, count)
+        SELECT user_tgid, kind, key, SUM(count)
+        FROM user_stats_days
+        GROUP BY user_tgid, kind, key
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_orders_user_tgid_created_at', table_name='orders')
+    op.drop_table('user_stats_totals')
+    op.drop_index('ix_user_stats_days_day', table_name='user_stats_days')
+    op.drop_table('user_stats_days')
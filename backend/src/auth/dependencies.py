@@ -5,6 +5,7 @@ from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from ..cache.principal import get_principal
 from ..database import get_db
 from ..models import User
 from .jwt import JWTError, verify_token
@@ -19,6 +20,9 @@ async def get_current_user(
     """
     Get current user from JWT token.
     Raises 401 if token is invalid or user not found.
+
+    The user is served from the principal cache, so the database is only
+    queried on a cache miss. The returned User is detached from the session.
     """
     token = credentials.credentials
 
@@ -39,8 +43,11 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    result = await db.execute(select(User).where(User.tgid == tgid))
-    user = result.scalar_one_or_none()
+    async def load_user() -> User | None:
+        result = await db.execute(select(User).where(User.tgid == tgid))
+        return result.scalar_one_or_none()
+
+    user = await get_principal(tgid, load_user)
 
     if user is None:
         raise HTTPException(
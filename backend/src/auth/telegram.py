@@ -2,13 +2,23 @@ import hashlib
 import hmac
 import json
 import time
+from functools import lru_cache
 from urllib.parse import parse_qsl
 
+# initData older than this is rejected
+INIT_DATA_MAX_AGE = 86400  # 24 hours
+
 
 class TelegramAuthError(Exception):
     pass
 
 
+@lru_cache(maxsize=4)
+def _secret_key(bot_token: str) -> bytes:
+    """HMAC-SHA256("WebAppData", bot_token), derived once per bot token."""
+    return hmac.new(b"WebAppData", bot_token.encode(), hashlib.sha256).digest()
+
+
 def validate_telegram_init_data(init_data: str, bot_token: str) -> dict:
     """
     Validate Telegram WebApp initData and extract user info.
@@ -21,7 +31,7 @@ def validate_telegram_init_data(init_data: str, bot_token: str) -> dict:
     5. Compute check_hash = HMAC-SHA256(secret_key, data_check_string)
     6. Compare hashes
 
-    Returns dict with user info on success.
+    Returns dict with user info (and auth_date) on success.
     Raises TelegramAuthError on failure.
     """
     try:
@@ -40,7 +50,7 @@ def validate_telegram_init_data(init_data: str, bot_token: str) -> dict:
         raise TelegramAuthError("Invalid auth_date")
 
     current_time = int(time.time())
-    if current_time - auth_date > 86400:  # 24 hours
+    if current_time - auth_date > INIT_DATA_MAX_AGE:
         raise TelegramAuthError("Authentication data expired")
 
     received_hash = parsed.pop("hash")
@@ -50,16 +60,9 @@ def validate_telegram_init_data(init_data: str, bot_token: str) -> dict:
         f"{k}={v}" for k, v in sorted(parsed.items())
     )
 
-    # Generate secret key
-    secret_key = hmac.new(
-        b"WebAppData",
-        bot_token.encode(),
-        hashlib.sha256
-    ).digest()
-
     # Calculate hash
     calculated_hash = hmac.new(
-        secret_key,
+        _secret_key(bot_token),
         data_check_string.encode(),
         hashlib.sha256
     ).hexdigest()
@@ -87,4 +90,5 @@ def validate_telegram_init_data(init_data: str, bot_token: str) -> dict:
         "last_name": user_data.get("last_name", ""),
         "username": user_data.get("username", ""),
         "language_code": user_data.get("language_code", "en"),
+        "auth_date": auth_date,
     }
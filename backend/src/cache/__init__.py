@@ -4,6 +4,16 @@ Redis caching module for lunch bot.
 Provides async Redis client wrapper with common caching operations.
 """
 
+from .local_cache import (
+    ExpiringLocalCache,
+    LocalCache,
+    availability_cache,
+    availability_matrices,
+    deadline_cache,
+    menu_cache,
+    start_cache_listeners,
+    stop_cache_listeners,
+)
 from .redis_client import (
     close_redis_client,
     delete_cache,
@@ -13,6 +23,7 @@ from .redis_client import (
     increment,
     set_cache,
 )
+from .spend_counter import adjust_spent, get_spent
 
 __all__ = [
     "get_redis_client",
@@ -22,4 +33,14 @@ __all__ = [
     "increment",
     "get_int",
     "close_redis_client",
+    "LocalCache",
+    "ExpiringLocalCache",
+    "menu_cache",
+    "deadline_cache",
+    "availability_cache",
+    "availability_matrices",
+    "start_cache_listeners",
+    "stop_cache_listeners",
+    "get_spent",
+    "adjust_spent",
 ]
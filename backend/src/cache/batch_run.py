@@ -0,0 +1,273 @@
+"""
+Checkpoints of the nightly recommendations batch.
+
+Each run has an ID and a Redis hash with its progress; users that got
+recommendations (or failed) are recorded in per-run sets. A run stopped by a
+restart or AllKeysExhaustedException is resumed by the next start (worker
+startup, the retry at the key quota reset, a manual trigger): users in the
+done set, and users whose cached recommendations are newer than the run
+start (e.g. generated manually), are skipped, so no quota is spent twice.
+
+Worker replicas share a run: one of them wins the coordinator lock and
+enqueues the users, and each user is claimed by exactly one consumer before
+it is processed.
+
+Redis Schema:
+- recommendations:batch:current → run ID of the latest run
+- recommendations:batch:{run_id} → hash: status, started_at, total, cursor,
+  resumed_at, processed_at_resume, updated_at (TTL: RUN_TTL)
+- recommendations:batch:{run_id}:done → set of tgids with recommendations
+- recommendations:batch:{run_id}:failed → set of tgids that failed
+- recommendations:batch:{run_id}:claim:{tgid} → "1" while a consumer
+  processes the user (TTL: CLAIM_TTL, refreshed by the owner)
+- recommendations:batch:coordinator → "1" while a replica enqueues a run
+  (TTL: COORDINATOR_TTL)
+"""
+
+import asyncio
+import json
+import time
+import uuid
+from collections.abc import Iterable
+from datetime import datetime
+from typing import Any
+
+from .redis_client import get_redis_client
+
+CURRENT_RUN_KEY = "recommendations:batch:current"
+RUN_KEY = "recommendations:batch:{run_id}"
+DONE_KEY = "recommendations:batch:{run_id}:done"
+FAILED_KEY = "recommendations:batch:{run_id}:failed"
+CLAIM_KEY = "recommendations:batch:{run_id}:claim:{tgid}"
+COORDINATOR_KEY = "recommendations:batch:coordinator"
+USER_CACHE_KEY = "recommendations:user:{tgid}"
+
+# A stopped run older than this is not resumed: its first results are about
+# to expire from the 24h recommendations cache
+RUN_MAX_AGE = 20 * 3600
+RUN_TTL = 2 * 86400
+# Cache entries read per MGET when checking freshness
+MGET_CHUNK = 500
+# The owner refreshes its claims every CLAIM_REFRESH_INTERVAL, so a claim
+# only expires when its consumer died; a redelivered task then takes it over
+CLAIM_TTL = 30
+CLAIM_REFRESH_INTERVAL = 10
+CLAIM_POLL_INTERVAL = 1
+# Replicas triggered within this window (same cron tick, repeated manual
+# events) do not enqueue the run again
+COORDINATOR_TTL = 600
+
+RUNNING = "running"
+STOPPED = "stopped"
+COMPLETED = "completed"
+
+
+class BatchRun:
+    """Progress checkpoint of one recommendations batch run."""
+
+    def __init__(self, run_id: str, started_at: float):
+        self.run_id = run_id
+        self.started_at = started_at
+        self.key = RUN_KEY.format(run_id=run_id)
+        self.done_key = DONE_KEY.format(run_id=run_id)
+        self.failed_key = FAILED_KEY.format(run_id=run_id)
+        self.resumed = False
+
+    @classmethod
+    async def open(cls, total: int, now: float | None = None) -> "BatchRun":
+        """Resume the latest run if it stopped recently, otherwise start a new one."""
+        now = time.time() if now is None else now
+        redis = await get_redis_client()
+
+        run = await get_resumable_run(now)
+        if run is None:
+            run = cls(uuid.uuid4().hex, now)
+            await redis.set(CURRENT_RUN_KEY, run.run_id, ex=RUN_TTL)
+            await redis.hset(run.key, mapping={"started_at": run.started_at, "cursor": ""})
+
+        processed = await redis.scard(run.done_key) + await redis.scard(run.failed_key)
+        await redis.hset(
+            run.key,
+            mapping={
+                "status": RUNNING,
+                "total": total,
+                "resumed_at": now,
+                "processed_at_resume": processed,
+                "updated_at": now,
+            },
+        )
+        await redis.expire(run.key, RUN_TTL)
+        return run
+
+    @classmethod
+    async def load(cls, run_id: str) -> "BatchRun | None":
+        """Existing run by ID, or None if it expired."""
+        redis = await get_redis_client()
+        state = await redis.hgetall(RUN_KEY.format(run_id=run_id))
+        if not state:
+            return None
+        return cls(run_id, float(state.get("started_at", 0)))
+
+    async def pending(self, tgids: list[int]) -> list[int]:
+        """
+        Users of `tgids` still to process, in the given order.
+
+        Users with recommendations cached after the run started are marked
+        done without a Gemini call.
+        """
+        redis = await get_redis_client()
+        done = {int(tgid) for tgid in await redis.smembers(self.done_key)}
+        candidates = [tgid for tgid in tgids if tgid not in done]
+
+        pending = []
+        fresh = []
+        for i in range(0, len(candidates), MGET_CHUNK):
+            chunk = candidates[i:i + MGET_CHUNK]
+            values = await redis.mget([USER_CACHE_KEY.format(tgid=tgid) for tgid in chunk])
+            for tgid, value in zip(chunk, values):
+                if value is not None and self._generated_after_start(value):
+                    fresh.append(tgid)
+                else:
+                    pending.append(tgid)
+
+        if fresh:
+            await redis.sadd(self.done_key, *fresh)
+            await redis.srem(self.failed_key, *fresh)
+            await redis.expire(self.done_key, RUN_TTL)
+        return pending
+
+    async def claim(self, tgid: int, wait: float = 0) -> bool:
+        """
+        Take a user for processing.
+
+        A claim held by another consumer is waited for up to `wait` seconds:
+        a live owner keeps refreshing it and finishes the user, a dead one's
+        claim expires within CLAIM_TTL and is taken over.
+
+        Returns:
+            False if the user is done or another consumer still holds the claim
+        """
+        redis = await get_redis_client()
+        claim_key = CLAIM_KEY.format(run_id=self.run_id, tgid=tgid)
+        deadline = time.monotonic() + wait
+        while not await redis.sismember(self.done_key, tgid):
+            if await redis.set(claim_key, "1", nx=True, ex=CLAIM_TTL):
+                return True
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(CLAIM_POLL_INTERVAL)
+        return False
+
+    async def refresh_claims(self, tgids: Iterable[int]) -> None:
+        """Extend the claims of users still being processed."""
+        redis = await get_redis_client()
+        for tgid in tgids:
+            await redis.expire(CLAIM_KEY.format(run_id=self.run_id, tgid=tgid), CLAIM_TTL)
+
+    async def release(self, tgid: int) -> None:
+        """Drop the claim of a user that was not done, so a resumed run retries it."""
+        redis = await get_redis_client()
+        await redis.delete(CLAIM_KEY.format(run_id=self.run_id, tgid=tgid))
+
+    async def mark_done(self, tgid: int) -> None:
+        redis = await get_redis_client()
+        await redis.sadd(self.done_key, tgid)
+        await redis.srem(self.failed_key, tgid)
+        await redis.expire(self.done_key, RUN_TTL)
+
+    async def mark_failed(self, tgid: int) -> None:
+        redis = await get_redis_client()
+        await redis.sadd(self.failed_key, tgid)
+        await redis.expire(self.failed_key, RUN_TTL)
+
+    async def advance(self, cursor: int) -> None:
+        """Record the last user handed to a worker."""
+        redis = await get_redis_client()
+        await redis.hset(self.key, mapping={"cursor": cursor, "updated_at": time.time()})
+
+    async def finish(self, status: str) -> None:
+        """Mark the run completed, or stopped so the next start resumes it."""
+        redis = await get_redis_client()
+        await redis.hset(self.key, mapping={"status": status, "updated_at": time.time()})
+
+    async def status(self) -> dict[str, Any]:
+        return await _run_status(self.run_id)
+
+    def _generated_after_start(self, value: str) -> bool:
+        try:
+            generated_at = json.loads(value).get("generated_at")
+            return (
+                generated_at is not None
+                and datetime.fromisoformat(generated_at).timestamp() >= self.started_at
+            )
+        except (ValueError, TypeError, AttributeError):
+            return False
+
+
+async def _run_status(run_id: str) -> dict[str, Any]:
+    redis = await get_redis_client()
+    state = await redis.hgetall(RUN_KEY.format(run_id=run_id))
+    done = await redis.scard(DONE_KEY.format(run_id=run_id))
+    failed = await redis.scard(FAILED_KEY.format(run_id=run_id))
+
+    total = int(state.get("total", 0))
+    remaining = max(total - done - failed, 0)
+    eta_seconds = None
+    if state.get("status") == RUNNING and remaining:
+        # Throughput since the run was (re)started by this process
+        processed = done + failed - int(state.get("processed_at_resume", 0))
+        elapsed = time.time() - float(state.get("resumed_at", time.time()))
+        if processed > 0 and elapsed > 0:
+            eta_seconds = round(remaining * elapsed / processed)
+    elif state.get("status") == COMPLETED:
+        eta_seconds = 0
+
+    cursor = state.get("cursor")
+    return {
+        "run_id": run_id,
+        "status": state.get("status"),
+        "started_at": float(state.get("started_at", 0)),
+        "total": total,
+        "done": done,
+        "failed": failed,
+        "remaining": remaining,
+        "cursor": int(cursor) if cursor else None,
+        "eta_seconds": eta_seconds,
+    }
+
+
+async def get_resumable_run(now: float | None = None) -> BatchRun | None:
+    """The latest run if it is running or stopped and younger than RUN_MAX_AGE."""
+    now = time.time() if now is None else now
+    redis = await get_redis_client()
+    run_id = await redis.get(CURRENT_RUN_KEY)
+    if run_id is None:
+        return None
+
+    state = await redis.hgetall(RUN_KEY.format(run_id=run_id))
+    started_at = float(state.get("started_at", 0))
+    if state.get("status") not in (RUNNING, STOPPED) or now - started_at >= RUN_MAX_AGE:
+        return None
+    run = BatchRun(run_id, started_at)
+    run.resumed = True
+    return run
+
+
+async def elect_coordinator() -> bool:
+    """
+    Claim the right to enqueue a batch run.
+
+    Returns:
+        True for exactly one of the replicas triggered within COORDINATOR_TTL
+    """
+    redis = await get_redis_client()
+    return bool(await redis.set(COORDINATOR_KEY, "1", nx=True, ex=COORDINATOR_TTL))
+
+
+async def get_batch_status() -> dict[str, Any] | None:
+    """Status of the latest batch run, or None if no run is recorded."""
+    redis = await get_redis_client()
+    run_id = await redis.get(CURRENT_RUN_KEY)
+    if run_id is None:
+        return None
+    return await _run_status(run_id)
@@ -0,0 +1,272 @@
+"""
+Process-local per-cafe caches with cross-process invalidation.
+
+Each process keeps per-cafe data (menus, deadline schedules) in memory.
+Freshness is tracked by a per-cafe version counter in Redis; every write
+bumps the counter and publishes the cafe ID on an invalidation channel so
+all API workers and background workers drop their local copy.
+
+Redis Schema (per namespace, e.g. "menu", "deadline"):
+- {namespace}:version:{cafe_id} → "12" (version counter, bumped on every write)
+- {namespace}:invalidate → pub/sub channel carrying cafe IDs
+"""
+
+import asyncio
+import time
+from collections.abc import Awaitable, Callable, Hashable
+from datetime import datetime
+from typing import Any
+
+import structlog
+from redis.exceptions import RedisError
+
+from .redis_client import get_redis_client
+
+logger = structlog.get_logger(__name__)
+
+
+class LocalCache:
+    """
+    In-process cache of per-cafe values keyed by a Redis version counter.
+
+    While the invalidation listener is subscribed, local entries are served
+    without any network call. Without a listener each read costs one Redis GET
+    to compare versions. If Redis is unreachable the cache is bypassed and the
+    loader is called directly, so reads never fail because of the cache.
+    """
+
+    def __init__(self, namespace: str) -> None:
+        self.namespace = namespace
+        self.version_key = f"{namespace}:version:{{cafe_id}}"
+        self.channel = f"{namespace}:invalidate"
+        self._entries: dict[int, tuple[int, Any]] = {}
+        # Bumped locally on every eviction to discard loads that raced an invalidation
+        self._generations: dict[int, int] = {}
+        self._listener_task: asyncio.Task | None = None
+        self._listening = False
+
+    async def get(self, cafe_id: int, loader: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Return the cached value for a cafe, loading it on miss.
+
+        Args:
+            cafe_id: Cafe ID
+            loader: Coroutine factory that loads the value from the database
+
+        Returns:
+            Cached or freshly loaded value
+        """
+        entry = self._entries.get(cafe_id)
+        if entry is not None and self._listening:
+            return entry[1]
+
+        try:
+            version = await self._get_version(cafe_id)
+        except RedisError as e:
+            logger.warning(
+                "Local cache unavailable, loading from database",
+                namespace=self.namespace,
+                error=str(e),
+            )
+            return await loader()
+
+        if entry is not None and entry[0] == version:
+            return entry[1]
+
+        generation = self._generations.get(cafe_id, 0)
+        value = await loader()
+        if self._generations.get(cafe_id, 0) == generation:
+            self._entries[cafe_id] = (version, value)
+            logger.debug(
+                "Local cache set", namespace=self.namespace, cafe_id=cafe_id, version=version
+            )
+        return value
+
+    async def invalidate(self, cafe_id: int) -> None:
+        """
+        Bump the cafe's version and notify all processes.
+
+        Args:
+            cafe_id: Cafe whose data changed
+        """
+        self.evict(cafe_id)
+        try:
+            client = await get_redis_client()
+            version = await client.incr(self.version_key.format(cafe_id=cafe_id))
+            await client.publish(self.channel, str(cafe_id))
+            logger.info(
+                "Local cache invalidated",
+                namespace=self.namespace,
+                cafe_id=cafe_id,
+                version=version,
+            )
+        except RedisError as e:
+            logger.error(
+                "Failed to publish cache invalidation",
+                namespace=self.namespace,
+                cafe_id=cafe_id,
+                error=str(e),
+            )
+
+    async def version(self, cafe_id: int) -> int:
+        """
+        Current version of a cafe's data in Redis (raises RedisError if unavailable).
+
+        A missing counter is seeded with a time-based value, so versions never
+        repeat after Redis loses its data and can safely be used in ETags.
+        """
+        client = await get_redis_client()
+        key = self.version_key.format(cafe_id=cafe_id)
+        value = await client.get(key)
+        if value is None:
+            await client.set(key, int(time.time() * 1000), nx=True)
+            value = await client.get(key)
+        return int(value)
+
+    def entry_version(self, cafe_id: int) -> int | None:
+        """Version of the locally cached value, or None if nothing is cached."""
+        entry = self._entries.get(cafe_id)
+        return entry[0] if entry is not None else None
+
+    def evict(self, cafe_id: int) -> None:
+        """Drop the local copy of a cafe's value."""
+        self._entries.pop(cafe_id, None)
+        self._generations[cafe_id] = self._generations.get(cafe_id, 0) + 1
+
+    def clear(self) -> None:
+        """Drop all local entries."""
+        for cafe_id in list(self._entries):
+            self.evict(cafe_id)
+
+    async def start_listener(self) -> None:
+        """Subscribe to invalidations in the background (idempotent)."""
+        if self._listener_task is None or self._listener_task.done():
+            self._listener_task = asyncio.create_task(self._listen())
+
+    async def stop_listener(self) -> None:
+        """Cancel the background subscription."""
+        if self._listener_task is not None:
+            self._listener_task.cancel()
+            try:
+                await self._listener_task
+            except asyncio.CancelledError:
+                pass
+            self._listener_task = None
+        self._listening = False
+
+    async def _get_version(self, cafe_id: int) -> int:
+        client = await get_redis_client()
+        value = await client.get(self.version_key.format(cafe_id=cafe_id))
+        return int(value) if value is not None else 0
+
+    async def _listen(self) -> None:
+        """Evict entries on invalidation messages, reconnecting on Redis errors."""
+        while True:
+            try:
+                client = await get_redis_client()
+                async with client.pubsub() as pubsub:
+                    await pubsub.subscribe(self.channel)
+                    # Entries loaded while unsubscribed may have missed messages
+                    self.clear()
+                    self._listening = True
+                    logger.info("Cache invalidation listener subscribed", channel=self.channel)
+
+                    async for message in pubsub.listen():
+                        if message.get("type") != "message":
+                            continue
+                        try:
+                            self.evict(int(message["data"]))
+                        except (TypeError, ValueError):
+                            logger.warning("Invalid cache invalidation message", data=message)
+            except asyncio.CancelledError:
+                raise
+            except (RedisError, OSError) as e:
+                logger.warning(
+                    "Cache invalidation listener disconnected",
+                    channel=self.channel,
+                    error=str(e),
+                )
+            finally:
+                self._listening = False
+            await asyncio.sleep(1)
+
+
+class ExpiringLocalCache:
+    """
+    In-process values under arbitrary keys, each valid until its own expiry time.
+
+    All values belong to one entry of a LocalCache: its value is a generation
+    token, so invalidating that entry drops every value in all processes.
+    """
+
+    def __init__(self, cache: LocalCache, cafe_id: int = 0) -> None:
+        self.cache = cache
+        self.cafe_id = cafe_id
+        self._generation: object | None = None
+        self._entries: dict[Hashable, tuple[datetime, Any]] = {}
+
+    async def get(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[tuple[Any, datetime]]],
+        now: datetime,
+    ) -> Any:
+        """
+        Return the value for `key` unless it expired, loading it on miss.
+
+        Args:
+            key: Cache key
+            loader: Coroutine factory returning the value and its expiry time
+            now: Current time, compared with expiry times
+
+        Returns:
+            Cached or freshly loaded value
+        """
+        generation = await self.cache.get(self.cafe_id, _new_generation)
+        if generation is not self._generation:
+            self._generation = generation
+            self._entries = {}
+
+        entry = self._entries.get(key)
+        if entry is not None and now < entry[0]:
+            return entry[1]
+
+        value, expires_at = await loader()
+        # A newer generation was seen during the load: the value may be stale
+        if self._generation is generation:
+            self._entries = {k: e for k, e in self._entries.items() if now < e[0]}
+            self._entries[key] = (expires_at, value)
+        return value
+
+
+async def _new_generation() -> object:
+    return object()
+
+
+# Singleton instances
+menu_cache = LocalCache("menu")
+deadline_cache = LocalCache("deadline")
+# Version of the bulk availability matrices; not per cafe, so a single entry (key 0)
+availability_cache = LocalCache("availability")
+# Bulk availability matrices per (cafe IDs, days, start date)
+availability_matrices = ExpiringLocalCache(availability_cache)
+# Authenticated principals, keyed by Telegram ID instead of cafe ID
+principal_cache = LocalCache("principal")
+# Cafe list; only its version counter is used (ETags), under a single entry (key 0)
+cafes_cache = LocalCache("cafes")
+
+
+async def start_cache_listeners() -> None:
+    """Subscribe all local caches to their invalidation channels."""
+    await menu_cache.start_listener()
+    await deadline_cache.start_listener()
+    await availability_cache.start_listener()
+    await principal_cache.start_listener()
+
+
+async def stop_cache_listeners() -> None:
+    """Stop all invalidation listeners."""
+    await menu_cache.stop_listener()
+    await deadline_cache.stop_listener()
+    await availability_cache.stop_listener()
+    await principal_cache.stop_listener()
@@ -0,0 +1,49 @@
+"""
+Replay cache for Telegram logins.
+
+A Mini App sends the same initData every time it is reopened within a
+session, and many users log in at once before the order deadline. The
+response of a successful /auth/telegram call (JWT and user) is stored under
+a digest of the initData and office, so a repeated login is answered from
+Redis without HMAC validation, database queries or a commit.
+
+Redis Schema:
+- login:{sha256(office, init_data)} → AuthResponse JSON
+  (TTL: LOGIN_TTL, never past the initData expiry)
+"""
+
+import hashlib
+
+from .redis_client import get_redis_client
+
+LOGIN_KEY = "login:{digest}"
+# Upper bound for serving a cached login; keeps the returned user data fresh
+LOGIN_TTL = 600
+
+
+def _key(init_data: str, office: str) -> str:
+    digest = hashlib.sha256(f"{office}\n{init_data}".encode()).hexdigest()
+    return LOGIN_KEY.format(digest=digest)
+
+
+async def get_cached_login(init_data: str, office: str) -> str | None:
+    """Stored AuthResponse JSON for this initData, if it was validated recently."""
+    redis = await get_redis_client()
+    return await redis.get(_key(init_data, office))
+
+
+async def cache_login(init_data: str, office: str, response: str, ttl: int) -> None:
+    """
+    Store a successful login response.
+
+    Args:
+        init_data: Validated initData string
+        office: Office from the request (part of the key, since it updates the user)
+        response: AuthResponse JSON
+        ttl: Seconds until the initData expires; capped at LOGIN_TTL
+    """
+    ttl = min(ttl, LOGIN_TTL)
+    if ttl <= 0:
+        return
+    redis = await get_redis_client()
+    await redis.set(_key(init_data, office), response, ex=ttl)
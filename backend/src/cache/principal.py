@@ -0,0 +1,112 @@
+"""
+Cache of authenticated principals for get_current_user.
+
+The fields auth depends on (role, is_active, ...) are cached per Telegram ID
+in two tiers: a process-local LocalCache entry, refreshed at least every
+LOCAL_TTL seconds and evicted across processes via pub/sub, and a shared
+Redis copy with a short TTL. Steady-state authentication therefore never
+touches Postgres. User writes call invalidate_principal after commit.
+
+Redis Schema:
+- principal:{tgid} → JSON with the user's columns (TTL PRINCIPAL_TTL)
+"""
+
+import json
+import time
+from collections.abc import Awaitable, Callable
+from decimal import Decimal
+
+import structlog
+from redis.exceptions import RedisError
+
+from ..models import User
+from .local_cache import principal_cache
+from .redis_client import get_redis_client
+
+logger = structlog.get_logger(__name__)
+
+PRINCIPAL_KEY = "principal:{tgid}"
+# Shared copy lifetime; bounds staleness if an invalidation is lost
+PRINCIPAL_TTL = 300
+# Local copies are re-read from Redis at least this often
+LOCAL_TTL = 30.0
+
+_FIELDS = ("tgid", "name", "office", "role", "is_active", "weekly_limit")
+
+
+def _dump(user: User) -> dict:
+    data = {field: getattr(user, field) for field in _FIELDS}
+    if data["weekly_limit"] is not None:
+        data["weekly_limit"] = str(data["weekly_limit"])
+    return data
+
+
+def _load(data: dict) -> User:
+    """Detached User carrying the cached columns."""
+    fields = dict(data)
+    if fields["weekly_limit"] is not None:
+        fields["weekly_limit"] = Decimal(fields["weekly_limit"])
+    return User(**fields)
+
+
+async def get_principal(
+    tgid: int, load_user: Callable[[], Awaitable[User | None]]
+) -> User | None:
+    """
+    Return the principal for a Telegram ID, loading it from the database on miss.
+
+    Args:
+        tgid: Telegram user ID from the token
+        load_user: Coroutine factory selecting the user from the database
+
+    Returns:
+        Detached User (or None if the user does not exist; misses are not cached)
+    """
+
+    async def load() -> tuple[float, dict] | None:
+        data = await _load_shared(tgid, load_user)
+        return None if data is None else (time.monotonic() + LOCAL_TTL, data)
+
+    entry = await principal_cache.get(tgid, load)
+    if entry is not None and entry[0] <= time.monotonic():
+        principal_cache.evict(tgid)
+        entry = await principal_cache.get(tgid, load)
+    if entry is None:
+        principal_cache.evict(tgid)
+        return None
+    return _load(entry[1])
+
+
+async def invalidate_principal(tgid: int) -> None:
+    """Drop the cached principal in Redis and in every process."""
+    try:
+        redis = await get_redis_client()
+        await redis.delete(PRINCIPAL_KEY.format(tgid=tgid))
+    except RedisError as e:
+        logger.error("Failed to delete cached principal", tgid=tgid, error=str(e))
+    await principal_cache.invalidate(tgid)
+
+
+async def _load_shared(
+    tgid: int, load_user: Callable[[], Awaitable[User | None]]
+) -> dict | None:
+    key = PRINCIPAL_KEY.format(tgid=tgid)
+    try:
+        redis = await get_redis_client()
+        cached = await redis.get(key)
+        if cached is not None:
+            return json.loads(cached)
+    except RedisError as e:
+        logger.warning("Principal cache unavailable, loading from database", error=str(e))
+        redis = None
+
+    user = await load_user()
+    if user is None:
+        return None
+    data = _dump(user)
+    if redis is not None:
+        try:
+            await redis.set(key, json.dumps(data), ex=PRINCIPAL_TTL)
+        except RedisError as e:
+            logger.warning("Failed to cache principal", tgid=tgid, error=str(e))
+    return data
@@ -0,0 +1,110 @@
+"""
+Per-user weekly spend counters in Redis.
+
+One counter per user and week (Monday of the order date) holds the spent
+amount in kopecks. Checking the weekly limit and applying a change happen in
+a single Lua script, so concurrent orders cannot both slip under the limit.
+A missing counter is seeded from Postgres; counters expire hourly so any
+drift is reconciled with the orders table.
+"""
+
+from collections.abc import Awaitable, Callable
+from datetime import date, timedelta
+from decimal import Decimal
+
+from .redis_client import get_redis_client
+
+SPEND_KEY = "spend:{tgid}:{week_start}"
+# Counters are re-seeded from Postgres at least this often
+COUNTER_TTL = 3600
+
+# Returns {-1, 0} if the counter is missing, {0, current} if the limit would be
+# exceeded, {1, new} once the delta is applied. INCRBY keeps the seeding TTL.
+_ADJUST_SCRIPT = """
+local current = redis.call('GET', KEYS[1])
+if not current then
+    return {-1, 0}
+end
+current = tonumber(current)
+local delta = tonumber(ARGV[1])
+local limit = tonumber(ARGV[2])
+if delta > 0 and limit >= 0 and current + delta > limit then
+    return {0, current}
+end
+return {1, redis.call('INCRBY', KEYS[1], delta)}
+"""
+
+
+def week_start(order_date: date) -> date:
+    return order_date - timedelta(days=order_date.weekday())
+
+
+def _key(tgid: int, order_date: date) -> str:
+    return SPEND_KEY.format(tgid=tgid, week_start=week_start(order_date).isoformat())
+
+
+def _to_kopecks(amount: Decimal) -> int:
+    return int((amount * 100).to_integral_value())
+
+
+def _from_kopecks(value: int) -> Decimal:
+    return (Decimal(value) / 100).quantize(Decimal("0.01"))
+
+
+async def _seed(key: str, load_spent: Callable[[], Awaitable[Decimal]]) -> None:
+    spent = await load_spent()
+    redis = await get_redis_client()
+    # NX: a concurrent request may have seeded (and adjusted) the counter meanwhile
+    await redis.set(key, _to_kopecks(spent), nx=True, ex=COUNTER_TTL)
+
+
+async def get_spent(
+    tgid: int, order_date: date, load_spent: Callable[[], Awaitable[Decimal]]
+) -> Decimal:
+    """Spent amount for the week of `order_date`, seeding the counter if needed."""
+    key = _key(tgid, order_date)
+    redis = await get_redis_client()
+    value = await redis.get(key)
+    if value is None:
+        await _seed(key, load_spent)
+        value = await redis.get(key)
+    return _from_kopecks(int(value))
+
+
+async def adjust_spent(
+    tgid: int,
+    order_date: date,
+    delta: Decimal,
+    limit: Decimal | None = None,
+    load_spent: Callable[[], Awaitable[Decimal]] | None = None,
+) -> tuple[bool, Decimal]:
+    """
+    Atomically add `delta` to the week's spend unless it would exceed `limit`.
+
+    Args:
+        load_spent: Loads the week's spend from Postgres when the counter is
+            missing; without it a missing counter is left alone (it will be
+            seeded with the correct value on next use)
+
+    Returns:
+        (applied, spent) - spent is the new total if applied, else the current one
+
+    Raises:
+        RedisError: if Redis is unavailable
+    """
+    key = _key(tgid, order_date)
+    redis = await get_redis_client()
+    limit_kopecks = _to_kopecks(limit) if limit is not None else -1
+
+    for _ in range(2):
+        status, value = await redis.eval(
+            _ADJUST_SCRIPT, 1, key, _to_kopecks(delta), limit_kopecks
+        )
+        if status != -1:
+            return status == 1, _from_kopecks(value)
+        if load_spent is None:
+            return True, Decimal("0")
+        await _seed(key, load_spent)
+
+    # Counter vanished right after seeding; the next request re-seeds it
+    return True, Decimal("0")
@@ -21,8 +21,16 @@ class Settings(BaseSettings):
     # CORS
     CORS_ORIGINS: list[str] = ["http://localhost:3000"]
 
+    # Rate limiting (token bucket per user / anonymous IP)
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_CAPACITY: int = 60
+    RATE_LIMIT_REFILL_PER_SECOND: float = 1.0
+
     # Kafka
     KAFKA_BROKER_URL: str = "localhost:9092"
+    # Partitions of the recommendation tasks topic: the most worker replicas
+    # that can share the nightly batch
+    RECOMMENDATIONS_TASK_PARTITIONS: int = 12
 
     # Redis
     REDIS_URL: str
@@ -31,6 +39,14 @@ class Settings(BaseSettings):
     GEMINI_API_KEYS: str
     GEMINI_MODEL: str = "gemini-2.0-flash-exp"
     GEMINI_MAX_REQUESTS_PER_KEY: int = 195
+    # Concurrent Gemini calls per key in the recommendations batch
+    GEMINI_MAX_IN_FLIGHT_PER_KEY: int = 2
+    # Override of the Gemini API endpoint (e.g. a local fake server for tests)
+    GEMINI_BASE_URL: str | None = None
+    # How long a Gemini result is reused for identical stats (0 disables)
+    GEMINI_RESULT_CACHE_TTL: int = 86400
+    # Users per packed request in the nightly batch (1 disables packing)
+    GEMINI_PACK_SIZE: int = 8
 
     model_config = {"env_file": ".env", "env_file_encoding": "utf-8", "extra": "ignore"}
 
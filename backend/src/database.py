@@ -1,4 +1,4 @@
-from collections.abc import AsyncGenerator
+from collections.abc import AsyncGenerator, Awaitable, Callable
 
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
@@ -9,6 +9,28 @@ engine = create_async_engine(settings.DATABASE_URL, echo=False)
 async_session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
 
+def after_commit(session: AsyncSession, callback: Callable[[], Awaitable[None]]) -> None:
+    """Schedule a coroutine to run once the request's transaction has been committed."""
+    session.info.setdefault("after_commit", []).append(callback)
+
+
+async def run_after_commit(session: AsyncSession) -> None:
+    session.info.pop("on_rollback", None)
+    for callback in session.info.pop("after_commit", []):
+        await callback()
+
+
+def on_rollback(session: AsyncSession, callback: Callable[[], Awaitable[None]]) -> None:
+    """Schedule a coroutine compensating external side effects if the transaction is rolled back."""
+    session.info.setdefault("on_rollback", []).append(callback)
+
+
+async def run_on_rollback(session: AsyncSession) -> None:
+    session.info.pop("after_commit", None)
+    for callback in session.info.pop("on_rollback", []):
+        await callback()
+
+
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     async with async_session_maker() as session:
         try:
@@ -16,4 +38,6 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
             await session.commit()
         except Exception:
             await session.rollback()
+            await run_on_rollback(session)
             raise
+        await run_after_commit(session)
@@ -0,0 +1,89 @@
+"""
+Conditional GET support (ETag / If-None-Match) for rarely changing resources.
+
+ETags are derived from the Redis version counters of the process-local
+caches, which every write already bumps. A matching If-None-Match is
+answered with 304 before the service loads or serializes anything. When
+Redis is unavailable no ETag is sent and requests are served as usual.
+"""
+
+import hashlib
+from typing import Annotated
+
+import structlog
+from fastapi import Depends, Request, Response, status
+from redis.exceptions import RedisError
+
+from .cache.local_cache import LocalCache
+
+logger = structlog.get_logger(__name__)
+
+# Clients may store the response but must revalidate it on every use
+CACHE_CONTROL = "private, no-cache"
+
+
+class ConditionalGet:
+    """Per-request ETag state for a GET endpoint."""
+
+    def __init__(self, request: Request, response: Response):
+        self.request = request
+        self.response = response
+        self.etag: str | None = None
+        self.version: int | None = None
+
+    async def matches(self, cache: LocalCache, key: int, *variant: object) -> bool:
+        """
+        Compute the ETag of a resource and compare it with If-None-Match.
+
+        Args:
+            cache: Local cache whose version counter tracks the resource
+            key: Cache key (cafe ID)
+            variant: Request parameters that change the representation
+
+        Returns:
+            True if the client's copy is current and 304 should be returned
+        """
+        try:
+            self.version = await cache.version(key)
+        except RedisError as e:
+            logger.warning("Resource version unavailable, skipping ETag", error=str(e))
+            return False
+
+        representation = ":".join(str(v) for v in (cache.namespace, key, self.version, *variant))
+        self.etag = '"' + hashlib.sha256(representation.encode()).hexdigest()[:32] + '"'
+
+        if_none_match = self.request.headers.get("if-none-match")
+        if not if_none_match:
+            return False
+        if if_none_match.strip() == "*":
+            return True
+        # Weak comparison, as required for If-None-Match
+        candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return self.etag in candidates
+
+    def not_modified(self) -> Response:
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED,
+            headers={"ETag": self.etag, "Cache-Control": CACHE_CONTROL},
+        )
+
+    def set_etag(self, served_from: LocalCache | None = None, key: int | None = None) -> None:
+        """
+        Attach the ETag to the response.
+
+        Args:
+            served_from: Local cache the response data was read from, if any. The
+                ETag is only sent if the cached entry has the version the ETag was
+                computed from, so stale local data never gets a newer ETag.
+            key: Cache key of the served entry
+        """
+        if self.etag is None:
+            return
+        if served_from is not None and served_from.entry_version(key) != self.version:
+            return
+        self.response.headers["ETag"] = self.etag
+        self.response.headers["Cache-Control"] = CACHE_CONTROL
+
+
+# Type alias for dependency injection
+Conditional = Annotated[ConditionalGet, Depends(ConditionalGet)]
@@ -6,8 +6,10 @@ Provides API key pool management and client wrapper for Gemini API.
 
 from .client import (
     GeminiRecommendationService,
+    close_recommendation_service,
     get_recommendation_service,
 )
+from .client_pool import GeminiClientPool
 from .key_pool import (
     AllKeysExhaustedException,
     GeminiAPIKeyPool,
@@ -20,4 +22,6 @@ __all__ = [
     "AllKeysExhaustedException",
     "GeminiRecommendationService",
     "get_recommendation_service",
+    "close_recommendation_service",
+    "GeminiClientPool",
 ]
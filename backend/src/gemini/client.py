@@ -10,9 +10,10 @@ from typing import Any
 
 import structlog
 from ..config import settings
+from .client_pool import GeminiClientPool
 from .key_pool import AllKeysExhaustedException, GeminiAPIKeyPool
-from .prompts import RECOMMENDATION_PROMPT
-from google import genai
+from .prompts import PACKED_RECOMMENDATION_PROMPT, PACKED_USER_BLOCK, RECOMMENDATION_PROMPT
+from .result_cache import RecommendationResultCache, result_fingerprint
 from google.genai import errors as genai_errors
 
 logger = structlog.get_logger(__name__)
@@ -27,6 +28,7 @@ class GeminiRecommendationService:
     - Invalid key handling (401)
     - Network error retry with exponential backoff
     - Robust JSON parsing with fallback
+    - Results cached by prompt fingerprint, so identical stats cost one call
 
     Error Handling:
     - 429 (Rate Limit) → automatic key rotation
@@ -34,19 +36,52 @@ class GeminiRecommendationService:
     - Network errors → retry with exponential delay
     """
 
-    def __init__(self, key_pool: GeminiAPIKeyPool):
+    def __init__(
+        self,
+        key_pool: GeminiAPIKeyPool,
+        max_in_flight_per_key: int | None = None,
+        client_pool: GeminiClientPool | None = None,
+        result_cache: RecommendationResultCache | None = None,
+    ):
         """
         Initialize recommendation service.
 
         Args:
             key_pool: GeminiAPIKeyPool instance for managing API keys
+            max_in_flight_per_key: Concurrent calls allowed per key
+                (default: settings.GEMINI_MAX_IN_FLIGHT_PER_KEY)
+            client_pool: Reusable SDK clients per key
+                (default: a new pool using settings.GEMINI_BASE_URL)
+            result_cache: Fingerprint → result cache
+                (default: TTL from settings.GEMINI_RESULT_CACHE_TTL)
         """
         self.key_pool = key_pool
+        self.clients = (
+            client_pool if client_pool is not None else GeminiClientPool(settings.GEMINI_BASE_URL)
+        )
+        self.max_in_flight_per_key = (
+            max_in_flight_per_key or settings.GEMINI_MAX_IN_FLIGHT_PER_KEY
+        )
+        self._key_slots: dict[str, asyncio.Semaphore] = {}
+        self.result_cache = (
+            result_cache
+            if result_cache is not None
+            else RecommendationResultCache(settings.GEMINI_RESULT_CACHE_TTL)
+        )
+
+    def _key_slot(self, api_key: str) -> asyncio.Semaphore:
+        """Semaphore limiting concurrent calls made with one API key."""
+        slot = self._key_slots.get(api_key)
+        if slot is None:
+            slot = self._key_slots[api_key] = asyncio.Semaphore(self.max_in_flight_per_key)
+        return slot
 
     async def generate_recommendations(self, user_stats: dict[str, Any]) -> dict[str, Any]:
         """
         Generate personalized recommendations based on user statistics.
 
+        Users whose stats format to the same prompt share one cached result.
+
         Args:
             user_stats: User order statistics from OrderStatsService
 
@@ -59,59 +94,162 @@ class GeminiRecommendationService:
         Raises:
             AllKeysExhaustedException: If all API keys are exhausted or invalid
         """
-        max_retries = len(self.key_pool.keys)
+        # Format prompt with user data
+        prompt = self._format_prompt(user_stats)
+        fingerprint = result_fingerprint(settings.GEMINI_MODEL, prompt)
+
+        cached = await self.result_cache.get(fingerprint)
+        if cached is not None:
+            logger.info(
+                "Recommendations served from result cache",
+                orders_count=user_stats.get("orders_count", 0),
+            )
+            return cached
 
-        for attempt in range(max_retries):
-            try:
-                # Get API key and create client
-                api_key = await self.key_pool.get_api_key()
-                client = genai.Client(api_key=api_key)
+        logger.info(
+            "Generating recommendations",
+            orders_count=user_stats.get("orders_count", 0),
+        )
+        text = await self._generate_text(prompt, timeout=30.0)
 
-                # Format prompt with user data
-                prompt = self._format_prompt(user_stats)
+        # Parse and return response
+        result = self._parse_response(text)
 
-                logger.info(
-                    "Generating recommendations",
-                    attempt=attempt + 1,
-                    orders_count=user_stats.get("orders_count", 0),
-                )
+        logger.info("Recommendations generated successfully")
 
-                # Call Gemini API with timeout
-                response = await asyncio.wait_for(
-                    client.aio.models.generate_content(
-                        model=settings.GEMINI_MODEL, contents=prompt
-                    ),
-                    timeout=30.0
-                )
+        # Unparseable responses are not cached, so the next user retries
+        if result["summary"] is not None:
+            await self.result_cache.set(fingerprint, result)
+
+        return result
+
+    async def generate_packed_recommendations(
+        self, users: dict[Any, dict[str, Any]]
+    ) -> dict[Any, dict[str, Any]]:
+        """
+        Generate recommendations for a group of users with one Gemini request.
+
+        Users are answered from the result cache where possible; the rest are
+        sent together (identical prompts once) under short ids and the reply
+        is parsed as a JSON array keyed by id. Each parsed result is cached
+        under the user's single-user fingerprint.
+
+        Args:
+            users: {user key: user_stats}, at most a few dozen users
+
+        Returns:
+            {user key: {"summary", "tips"}} for users with a usable result;
+            callers fall back to generate_recommendations for the rest
+
+        Raises:
+            AllKeysExhaustedException: If all API keys are exhausted or invalid
+        """
+        results: dict[Any, dict[str, Any]] = {}
+        # fingerprint -> (prompt fields, user keys sharing them)
+        pending: dict[str, tuple[dict[str, Any], list[Any]]] = {}
+        for user_key, user_stats in users.items():
+            fields = self._prompt_fields(user_stats)
+            fingerprint = result_fingerprint(
+                settings.GEMINI_MODEL, RECOMMENDATION_PROMPT.format(**fields)
+            )
+            if fingerprint in pending:
+                pending[fingerprint][1].append(user_key)
+                continue
+            cached = await self.result_cache.get(fingerprint)
+            if cached is not None:
+                results[user_key] = cached
+            else:
+                pending[fingerprint] = (fields, [user_key])
+
+        if not pending:
+            return results
+        if len(pending) == 1:
+            # Nothing to pack; the caller's single-user fallback handles it
+            return results
+
+        entries = list(pending.items())
+        prompt = PACKED_RECOMMENDATION_PROMPT.format(
+            users="\n\n".join(
+                PACKED_USER_BLOCK.format(id=i, **fields)
+                for i, (_, (fields, _)) in enumerate(entries, start=1)
+            )
+        )
+
+        logger.info("Generating packed recommendations", users_count=len(entries))
+        try:
+            text = await self._generate_text(prompt, timeout=30.0 + 5.0 * len(entries))
+        except AllKeysExhaustedException:
+            raise
+        except Exception as e:
+            logger.warning("Packed request failed, falling back", error=str(e))
+            return results
+
+        parsed = self._parse_packed_response(text)
+        for i, (fingerprint, (_, user_keys)) in enumerate(entries, start=1):
+            result = parsed.get(str(i))
+            if result is None:
+                continue
+            await self.result_cache.set(fingerprint, result)
+            for user_key in user_keys:
+                results[user_key] = result
+
+        logger.info(
+            "Packed recommendations generated",
+            users_count=len(entries),
+            parsed_count=len(parsed),
+        )
+        return results
 
-                # Parse and return response
-                result = self._parse_response(response.text)
+    async def _generate_text(self, prompt: str, timeout: float) -> str:
+        """
+        Send one prompt to Gemini, retrying on another key on rate limits,
+        invalid keys and network errors.
 
-                logger.info("Recommendations generated successfully")
+        Raises:
+            AllKeysExhaustedException: If all API keys are exhausted or invalid
+        """
+        max_retries = len(self.key_pool.keys)
 
-                return result
+        for attempt in range(max_retries):
+            try:
+                # Get API key and its pooled client
+                key_index, api_key = await self.key_pool.acquire_key()
+                client = self.clients.get(api_key)
+
+                # Call Gemini API with timeout, bounded per key
+                async with self._key_slot(api_key):
+                    response = await asyncio.wait_for(
+                        client.aio.models.generate_content(
+                            model=settings.GEMINI_MODEL, contents=prompt
+                        ),
+                        timeout=timeout
+                    )
+                return response.text
+
+            except AllKeysExhaustedException:
+                raise
 
             except genai_errors.ClientError as e:
                 # ClientError is the base class for API errors
                 error_code = getattr(e, "code", None)
 
                 if error_code == 429:  # Rate limit exceeded
+                    # The pool hands out the next key on the following attempt
                     logger.warning(
                         "Rate limit exceeded, rotating key",
+                        key_index=key_index,
                         attempt=attempt + 1,
                         max_retries=max_retries,
                     )
-                    await self.key_pool.rotate_key()
                     continue
 
                 elif error_code == 401:  # Invalid API key
                     logger.error(
                         "Invalid API key, rotating",
+                        key_index=key_index,
                         attempt=attempt + 1,
                     )
-                    current_index = await self.key_pool._get_current_key_index()
-                    await self.key_pool.mark_key_invalid(current_index)
-                    await self.key_pool.rotate_key()
+                    await self.key_pool.mark_key_invalid(key_index)
                     continue
 
                 else:
@@ -131,7 +269,6 @@ class GeminiRecommendationService:
                 )
                 # For network errors, try next key
                 if attempt < max_retries - 1:
-                    await self.key_pool.rotate_key()
                     continue
                 raise
 
@@ -141,6 +278,10 @@ class GeminiRecommendationService:
             "Failed to generate recommendations: all API keys exhausted"
         )
 
+    async def close(self) -> None:
+        """Close the pooled Gemini clients."""
+        await self.clients.close()
+
     def _format_prompt(self, user_stats: dict[str, Any]) -> str:
         """
         Format the recommendation prompt with user statistics.
@@ -151,26 +292,45 @@ class GeminiRecommendationService:
         Returns:
             Formatted prompt string
         """
-        # Format categories distribution
+        return RECOMMENDATION_PROMPT.format(**self._prompt_fields(user_stats))
+
+    def _prompt_fields(self, user_stats: dict[str, Any]) -> dict[str, Any]:
+        """Prompt placeholders for one user, shared by single and packed prompts."""
+        # Format categories distribution (sorted, so equal stats give an equal prompt)
         categories = user_stats.get("categories", {})
         categories_str = ", ".join(
-            [f"{cat}: {data['count']} ({data['percent']}%)" for cat, data in categories.items()]
+            [
+                f"{cat}: {data['count']} ({data['percent']}%)"
+                for cat, data in sorted(categories.items())
+            ]
         )
 
         # Format favorite dishes
-        favorite_dishes = user_stats.get("favorite_dishes", [])
-        favorite_str = ", ".join([f"{dish['name']} ({dish['count']}x)" for dish in favorite_dishes])
-
-        # Format prompt
-        prompt = RECOMMENDATION_PROMPT.format(
-            orders_count=user_stats.get("orders_count", 0),
-            categories=categories_str if categories_str else "нет данных",
-            unique_dishes=user_stats.get("unique_dishes", 0),
-            total_available=user_stats.get("total_dishes_available", 0),
-            favorite_dishes=favorite_str if favorite_str else "нет данных",
+        favorite_dishes = sorted(
+            user_stats.get("favorite_dishes", []), key=lambda d: (-d["count"], d["name"])
         )
+        favorite_str = ", ".join([f"{dish['name']} ({dish['count']}x)" for dish in favorite_dishes])
 
-        return prompt
+        return {
+            "orders_count": user_stats.get("orders_count", 0),
+            "categories": categories_str if categories_str else "нет данных",
+            "unique_dishes": user_stats.get("unique_dishes", 0),
+            "total_available": user_stats.get("total_dishes_available", 0),
+            "favorite_dishes": favorite_str if favorite_str else "нет данных",
+        }
+
+    @staticmethod
+    def _extract_json(text: str) -> str:
+        """JSON text of a response, unwrapped from a markdown code block if present."""
+        if "```json" in text:
+            json_start = text.find("```json") + 7
+            json_end = text.find("```", json_start)
+            return text[json_start:json_end].strip()
+        if "```" in text:
+            json_start = text.find("```") + 3
+            json_end = text.find("```", json_start)
+            return text[json_start:json_end].strip()
+        return text.strip()
 
     def _parse_response(self, text: str) -> dict[str, Any]:
         """
@@ -185,20 +345,8 @@ class GeminiRecommendationService:
             Parsed recommendations dict with fallback to empty structure
         """
         try:
-            # Try to extract JSON from markdown code blocks
-            if "```json" in text:
-                json_start = text.find("```json") + 7
-                json_end = text.find("```", json_start)
-                json_text = text[json_start:json_end].strip()
-            elif "```" in text:
-                json_start = text.find("```") + 3
-                json_end = text.find("```", json_start)
-                json_text = text[json_start:json_end].strip()
-            else:
-                json_text = text.strip()
-
-            # Parse JSON
-            parsed = json.loads(json_text)
+            # Parse JSON, unwrapping markdown code blocks
+            parsed = json.loads(self._extract_json(text))
 
             # Validate structure
             if not isinstance(parsed, dict):
@@ -229,6 +377,46 @@ class GeminiRecommendationService:
             )
             return {"summary": None, "tips": []}
 
+    def _parse_packed_response(self, text: str) -> dict[str, dict[str, Any]]:
+        """
+        Parse a packed response: a JSON array of {"id", "summary", "tips"}.
+
+        Entries without a known id, a non-empty string summary or a list of
+        string tips are dropped, so their users fall back to single requests.
+
+        Returns:
+            {id: {"summary", "tips"}} for the usable entries
+        """
+        try:
+            parsed = json.loads(self._extract_json(text))
+        except json.JSONDecodeError as e:
+            logger.warning(
+                "Failed to parse packed Gemini response as JSON",
+                error=str(e),
+                text_preview=text[:200],
+            )
+            return {}
+
+        if isinstance(parsed, dict):
+            # Tolerate {"results": [...]} or a single object
+            parsed = parsed.get("results", [parsed])
+        if not isinstance(parsed, list):
+            logger.warning("Packed Gemini response is not a list")
+            return {}
+
+        results: dict[str, dict[str, Any]] = {}
+        for entry in parsed:
+            if not isinstance(entry, dict) or entry.get("id") is None:
+                continue
+            summary = entry.get("summary")
+            tips = entry.get("tips", [])
+            if not isinstance(summary, str) or not summary.strip():
+                continue
+            if not isinstance(tips, list) or not all(isinstance(tip, str) for tip in tips):
+                continue
+            results[str(entry["id"])] = {"summary": summary, "tips": tips}
+        return results
+
 
 # Singleton instance
 _recommendation_service: GeminiRecommendationService | None = None
@@ -251,3 +439,12 @@ def get_recommendation_service() -> GeminiRecommendationService:
         _recommendation_service = GeminiRecommendationService(get_key_pool())
 
     return _recommendation_service
+
+
+async def close_recommendation_service() -> None:
+    """Close the singleton's pooled clients (call on shutdown)."""
+    global _recommendation_service
+
+    if _recommendation_service is not None:
+        await _recommendation_service.close()
+        _recommendation_service = None
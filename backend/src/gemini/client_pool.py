@@ -0,0 +1,53 @@
+"""
+Reusable Gemini SDK clients, one per API key.
+
+Each genai.Client owns its HTTP connection pool, so building a client per
+call throws away warm connections and TLS sessions. The pool creates a
+client lazily on the first call with a key and reuses it across calls and
+concurrent workers until close().
+"""
+
+import structlog
+from google import genai
+from google.genai import types
+
+logger = structlog.get_logger(__name__)
+
+
+class GeminiClientPool:
+    """Lazily created, shared genai.Client instances keyed by API key."""
+
+    def __init__(self, base_url: str | None = None):
+        """
+        Args:
+            base_url: Override of the Gemini API endpoint (e.g. a local fake
+                server); the SDK default is used when None
+        """
+        self.base_url = base_url
+        self._clients: dict[str, genai.Client] = {}
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    def get(self, api_key: str) -> genai.Client:
+        """Client for `api_key`, created on first use."""
+        client = self._clients.get(api_key)
+        if client is None:
+            http_options = types.HttpOptions(base_url=self.base_url) if self.base_url else None
+            client = self._clients[api_key] = genai.Client(
+                api_key=api_key, http_options=http_options
+            )
+            logger.debug("Gemini client created", clients_count=len(self._clients))
+        return client
+
+    async def close(self) -> None:
+        """Close all clients and their connection pools."""
+        clients, self._clients = list(self._clients.values()), {}
+        for client in clients:
+            try:
+                await client.aio.aclose()
+                client.close()
+            except Exception as e:
+                logger.warning("Failed to close Gemini client", error=str(e))
+        if clients:
+            logger.info("Gemini clients closed", clients_count=len(clients))
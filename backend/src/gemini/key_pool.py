@@ -2,12 +2,15 @@
 Gemini API Key Pool management.
 
 Manages a pool of Gemini API keys with automatic rotation when rate limits
-are reached. Persists usage counters in Redis for reliability across restarts.
+are reached. Persists usage counters in Redis for reliability across restarts;
+key selection runs as one atomic Redis script per request.
 """
 
+from datetime import datetime, timezone
+
 import structlog
 
-from ..cache.redis_client import get_int, get_redis_client, increment, set_cache
+from ..cache.redis_client import get_redis_client
 
 logger = structlog.get_logger(__name__)
 
@@ -18,21 +21,68 @@ class AllKeysExhaustedException(Exception):
     pass
 
 
+CURRENT_KEY_INDEX = "gemini:current_key_index"
+USAGE_KEY = "gemini:usage:{key_index}"
+INVALID_KEY = "gemini:invalid:{key_index}"
+ROTATION_LOG = "gemini:rotation_log"
+# Usage counters reset daily
+USAGE_TTL = 86400
+
+# KEYS: cursor, usage:0..n-1, invalid:0..n-1, rotation log
+# ARGV: n, max_requests, usage TTL, consume (1/0), timestamp
+# Takes the first healthy key starting at the cursor (after it when rotating
+# without consuming). When consuming, counts one request against the key and
+# moves the cursor past it, so concurrent callers spread over the keys.
+# Returns the key index, or -1 if every key is invalid or exhausted.
+_SELECT_SCRIPT = """
+local n = tonumber(ARGV[1])
+local max_requests = tonumber(ARGV[2])
+local consume = ARGV[4] == '1'
+local cursor = tonumber(redis.call('GET', KEYS[1]) or '0') % n
+local first = consume and 0 or 1
+for offset = first, first + n - 1 do
+    local index = (cursor + offset) % n
+    local usage_key = KEYS[2 + index]
+    if redis.call('GET', KEYS[2 + n + index]) ~= '1'
+        and tonumber(redis.call('GET', usage_key) or '0') < max_requests then
+        if offset > first then
+            local log_key = KEYS[2 + 2 * n]
+            redis.call('LPUSH', log_key, ARGV[5] .. ' key' .. cursor .. '->key' .. index)
+            redis.call('LTRIM', log_key, 0, 99)
+        end
+        if consume then
+            redis.call('INCR', usage_key)
+            if redis.call('TTL', usage_key) == -1 then
+                redis.call('EXPIRE', usage_key, ARGV[3])
+            end
+            redis.call('SET', KEYS[1], (index + 1) % n)
+        else
+            redis.call('SET', KEYS[1], index)
+        end
+        return index
+    end
+end
+return -1
+"""
+
+
 class GeminiAPIKeyPool:
     """
     Manages a pool of Gemini API keys with automatic rotation.
 
     Features:
-    - Automatic rotation when key reaches request limit (default: 195 requests)
+    - Round-robin over healthy keys, skipping keys that reached the request
+      limit (default: 195 requests) or are marked invalid
+    - Selection, quota accounting and rotation in one atomic Redis script,
+      so concurrent workers can never overshoot the limit
     - Persistent usage counters in Redis (TTL: 24 hours)
-    - Fallback to next key on errors
     - Usage monitoring and rotation history
 
     Redis Schema:
-    - gemini:current_key_index → "0" (current active key index)
+    - gemini:current_key_index → "0" (key to try first on the next request)
     - gemini:usage:{key_index} → "187" (usage count, TTL 24h)
     - gemini:invalid:{key_index} → "1" (invalid key flag)
-    - gemini:rotation_log → list (rotation history for monitoring)
+    - gemini:rotation_log → list (skipped-key history for monitoring)
     """
 
     def __init__(self, keys: list[str], max_requests_per_key: int = 195):
@@ -51,6 +101,12 @@ class GeminiAPIKeyPool:
 
         self.keys = keys
         self.max_requests = max_requests_per_key
+        self._script_keys = [
+            CURRENT_KEY_INDEX,
+            *(USAGE_KEY.format(key_index=i) for i in range(len(keys))),
+            *(INVALID_KEY.format(key_index=i) for i in range(len(keys))),
+            ROTATION_LOG,
+        ]
 
         logger.info(
             "Gemini API key pool initialized",
@@ -58,45 +114,31 @@ class GeminiAPIKeyPool:
             max_requests_per_key=max_requests_per_key,
         )
 
-    async def get_api_key(self) -> str:
+    async def acquire_key(self) -> tuple[int, str]:
         """
-        Get the current active API key.
-
-        Automatically rotates to the next key if the current one has reached
-        its request limit.
+        Reserve one request on the next healthy key.
 
         Returns:
-            Active API key string
+            (key_index, api_key) - the index is needed to mark the key invalid
 
         Raises:
             AllKeysExhaustedException: If all keys are exhausted or invalid
         """
-        current_index = await self._get_current_key_index()
-        usage_count = await self._get_usage_count(current_index)
-
-        # Check if current key needs rotation
-        if usage_count >= self.max_requests:
-            logger.info(
-                "Key usage limit reached, rotating",
-                current_index=current_index,
-                usage_count=usage_count,
-                max_requests=self.max_requests,
-            )
-            current_index = await self._rotate_to_next_available_key()
-
-        # Check if key is valid
-        is_invalid = await self._is_key_invalid(current_index)
-        if is_invalid:
-            logger.warning(
-                "Current key is marked invalid, rotating",
-                current_index=current_index,
-            )
-            current_index = await self._rotate_to_next_available_key()
+        key_index = await self._select(consume=True)
+        return key_index, self.keys[key_index]
 
-        # Increment usage counter
-        await self._increment_usage(current_index)
+    async def get_api_key(self) -> str:
+        """
+        Get the next healthy API key and count one request against it.
 
-        return self.keys[current_index]
+        Returns:
+            Active API key string
+
+        Raises:
+            AllKeysExhaustedException: If all keys are exhausted or invalid
+        """
+        _, api_key = await self.acquire_key()
+        return api_key
 
     async def rotate_key(self) -> str:
         """
@@ -108,7 +150,7 @@ class GeminiAPIKeyPool:
         Raises:
             AllKeysExhaustedException: If no valid keys available
         """
-        new_index = await self._rotate_to_next_available_key()
+        new_index = await self._select(consume=False)
         return self.keys[new_index]
 
     async def mark_key_invalid(self, key_index: int) -> None:
@@ -119,37 +161,33 @@ class GeminiAPIKeyPool:
             key_index: Index of the key to mark as invalid
         """
         redis = await get_redis_client()
-        await redis.set(f"gemini:invalid:{key_index}", "1")
+        await redis.set(INVALID_KEY.format(key_index=key_index), "1")
 
         logger.warning("Key marked as invalid", key_index=key_index)
 
     async def get_pool_status(self) -> dict:
         """
-        Get current status of the key pool.
+        Get current status of the key pool with a single MGET.
 
         Returns:
             Dictionary with pool status:
-            - current_key_index: Index of active key
+            - current_key_index: Index of the key tried first on the next request
             - usage_counts: Usage count for each key
             - invalid_keys: List of invalid key indices
         """
-        current_index = await self._get_current_key_index()
-
-        usage_counts = {}
-        invalid_keys = []
-
-        for i in range(len(self.keys)):
-            usage = await self._get_usage_count(i)
-            usage_counts[i] = usage
+        redis = await get_redis_client()
+        values = await redis.mget(self._script_keys[:-1])
 
-            if await self._is_key_invalid(i):
-                invalid_keys.append(i)
+        n = len(self.keys)
+        current_index = int(values[0]) % n if values[0] is not None else 0
+        usage_counts = {i: int(values[1 + i] or 0) for i in range(n)}
+        invalid_keys = [i for i in range(n) if values[1 + n + i] == "1"]
 
         status = {
             "current_key_index": current_index,
             "usage_counts": usage_counts,
             "invalid_keys": invalid_keys,
-            "total_keys": len(self.keys),
+            "total_keys": n,
             "max_requests_per_key": self.max_requests,
         }
 
@@ -157,151 +195,77 @@ class GeminiAPIKeyPool:
 
         return status
 
-    # Private methods
-
-    async def _get_current_key_index(self) -> int:
+    async def healthy_keys_count(self) -> int:
         """
-        Get the current active key index from Redis.
+        Count keys that can still serve requests (not invalid, not exhausted).
 
         Returns:
-            Current key index (defaults to 0 if not set)
+            Number of healthy keys
         """
-        index = await get_int("gemini:current_key_index")
-        return index if index is not None else 0
+        status = await self.get_pool_status()
+        return sum(
+            1
+            for i, usage in status["usage_counts"].items()
+            if usage < self.max_requests and i not in status["invalid_keys"]
+        )
 
-    async def _get_usage_count(self, key_index: int) -> int:
+    async def seconds_until_reset(self) -> int | None:
         """
-        Get usage count for a specific key.
-
-        Args:
-            key_index: Index of the key
+        Seconds until the first exhausted key's usage counter expires.
 
         Returns:
-            Usage count (0 if not set)
-        """
-        count = await get_int(f"gemini:usage:{key_index}")
-        return count if count is not None else 0
-
-    async def _increment_usage(self, key_index: int) -> None:
-        """
-        Increment usage counter for a specific key.
-
-        Sets TTL to 24 hours on first increment.
-
-        Args:
-            key_index: Index of the key
+            Seconds to wait, or None if no key is waiting for a reset
+            (none is exhausted, or only invalid keys are left)
         """
+        status = await self.get_pool_status()
         redis = await get_redis_client()
-        key = f"gemini:usage:{key_index}"
+        ttls = [
+            await redis.ttl(USAGE_KEY.format(key_index=i))
+            for i, usage in status["usage_counts"].items()
+            if usage >= self.max_requests and i not in status["invalid_keys"]
+        ]
+        ttls = [ttl for ttl in ttls if ttl >= 0]
+        return min(ttls) if ttls else None
 
-        # Increment and set TTL (24 hours)
-        new_count = await increment(key, 1)
-
-        # Set TTL only if this is the first increment or TTL is not set
-        ttl = await redis.ttl(key)
-        if ttl == -1:  # No TTL set
-            await redis.expire(key, 86400)  # 24 hours
-
-        logger.debug(
-            "Key usage incremented",
-            key_index=key_index,
-            new_count=new_count,
-        )
+    # Private methods
 
-    async def _rotate_to_next_available_key(self) -> int:
+    async def _select(self, consume: bool) -> int:
         """
-        Rotate to the next available (not exhausted, not invalid) key.
+        Run the selection script.
+
+        Args:
+            consume: Count a request against the selected key and move the
+                cursor past it; otherwise only move the cursor to the next key
 
         Returns:
-            Index of the new active key
+            Index of the selected key
 
         Raises:
             AllKeysExhaustedException: If no valid keys available
         """
-        current_index = await self._get_current_key_index()
-
-        # Try each key in sequence
-        for offset in range(1, len(self.keys) + 1):
-            candidate_index = (current_index + offset) % len(self.keys)
-
-            # Check if key is valid and not exhausted
-            if await self._is_key_invalid(candidate_index):
-                logger.debug(
-                    "Skipping invalid key",
-                    key_index=candidate_index,
-                )
-                continue
-
-            usage = await self._get_usage_count(candidate_index)
-            if usage >= self.max_requests:
-                logger.debug(
-                    "Skipping exhausted key",
-                    key_index=candidate_index,
-                    usage=usage,
-                )
-                continue
-
-            # Found a valid key
-            await self._set_current_key_index(candidate_index)
-            await self._log_rotation(current_index, candidate_index)
-
-            logger.info(
-                "Key rotated",
-                from_index=current_index,
-                to_index=candidate_index,
-                usage=usage,
+        redis = await get_redis_client()
+        key_index = int(
+            await redis.eval(
+                _SELECT_SCRIPT,
+                len(self._script_keys),
+                *self._script_keys,
+                len(self.keys),
+                self.max_requests,
+                USAGE_TTL,
+                1 if consume else 0,
+                datetime.now(timezone.utc).isoformat(),
             )
-
-            return candidate_index
-
-        # No valid keys found
-        logger.error("All API keys exhausted or invalid")
-        raise AllKeysExhaustedException(
-            "All API keys have been exhausted or marked invalid. "
-            "Please wait for counters to reset or add new keys."
         )
 
-    async def _set_current_key_index(self, key_index: int) -> None:
-        """
-        Set the current active key index in Redis.
-
-        Args:
-            key_index: Index to set as current
-        """
-        await set_cache("gemini:current_key_index", str(key_index))
-
-    async def _is_key_invalid(self, key_index: int) -> bool:
-        """
-        Check if a key is marked as invalid.
-
-        Args:
-            key_index: Index of the key to check
-
-        Returns:
-            True if key is invalid, False otherwise
-        """
-        redis = await get_redis_client()
-        invalid = await redis.get(f"gemini:invalid:{key_index}")
-        return invalid == "1"
-
-    async def _log_rotation(self, from_index: int, to_index: int) -> None:
-        """
-        Log key rotation event to Redis for monitoring.
-
-        Args:
-            from_index: Previous key index
-            to_index: New key index
-        """
-        from datetime import datetime, timezone
-
-        redis = await get_redis_client()
-        timestamp = datetime.now(timezone.utc).isoformat()
-        log_entry = f"{timestamp} key{from_index}->key{to_index}"
-
-        await redis.lpush("gemini:rotation_log", log_entry)
+        if key_index < 0:
+            logger.error("All API keys exhausted or invalid")
+            raise AllKeysExhaustedException(
+                "All API keys have been exhausted or marked invalid. "
+                "Please wait for counters to reset or add new keys."
+            )
 
-        # Keep only last 100 rotation events
-        await redis.ltrim("gemini:rotation_log", 0, 99)
+        logger.debug("Key selected", key_index=key_index, consumed=consume)
+        return key_index
 
 
 # Singleton instance
@@ -22,3 +22,26 @@ RECOMMENDATION_PROMPT = """
     "tips": ["совет 1", "совет 2", "совет 3"]
 }}
 """
+
+# Several users in one request; {users} is a list of PACKED_USER_BLOCK
+PACKED_RECOMMENDATION_PROMPT = """
+Проанализируй привычки питания нескольких пользователей и дай каждому персональные рекомендации.
+
+{users}
+
+Для каждого пользователя дай краткое резюме (1 предложение) и 2-3 совета:
+1. По сбалансированности питания
+2. По разнообразию рациона
+3. Новые блюда для пробы
+
+Ответ — JSON-массив с одним объектом на каждого пользователя, id как во входных данных:
+[
+    {{"id": "1", "summary": "краткое резюме", "tips": ["совет 1", "совет 2", "совет 3"]}}
+]
+"""
+
+PACKED_USER_BLOCK = """Пользователь id={id}, статистика за 30 дней:
+- Всего заказов: {orders_count}
+- Распределение по категориям: {categories}
+- Уникальных блюд: {unique_dishes} из {total_available}
+- Любимые блюда: {favorite_dishes}"""
@@ -0,0 +1,95 @@
+"""
+Content-addressed cache of Gemini recommendation results.
+
+Users with the same 30-day stats produce the same prompt, so a result is
+stored under a fingerprint of the model and the canonical prompt and served
+to every later request with that fingerprint without an API call or quota.
+
+Redis Schema:
+- gemini:result:{sha256(model, prompt)} → {"summary", "tips"} JSON
+  (TTL: GEMINI_RESULT_CACHE_TTL)
+"""
+
+import hashlib
+import json
+from typing import Any
+
+import structlog
+from redis.exceptions import RedisError
+
+from ..cache.redis_client import get_redis_client
+
+logger = structlog.get_logger(__name__)
+
+RESULT_KEY = "gemini:result:{fingerprint}"
+
+
+def result_fingerprint(model: str, prompt: str) -> str:
+    """Digest identifying a Gemini request by its model and prompt text."""
+    return hashlib.sha256(f"{model}\n{prompt}".encode()).hexdigest()
+
+
+class RecommendationResultCache:
+    """
+    Redis-backed fingerprint → result cache with hit/miss counters.
+
+    Redis errors are treated as misses: the cache never fails a request.
+    Counters are per process; callers log them as the hit rate.
+    """
+
+    def __init__(self, ttl: int):
+        """
+        Args:
+            ttl: Seconds a result is served; 0 disables the cache
+        """
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    def stats(self) -> dict[str, Any]:
+        """Hits, misses and hit rate since start (or the last reset)."""
+        lookups = self.hits + self.misses
+        return {
+            "cache_hits": self.hits,
+            "cache_misses": self.misses,
+            "cache_hit_rate": f"{self.hits / lookups * 100:.1f}%" if lookups else "0%",
+        }
+
+    def reset_stats(self) -> None:
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, fingerprint: str) -> dict[str, Any] | None:
+        """Cached result for `fingerprint`, or None."""
+        if not self.enabled:
+            return None
+        try:
+            redis = await get_redis_client()
+            value = await redis.get(RESULT_KEY.format(fingerprint=fingerprint))
+        except RedisError as e:
+            logger.warning("Result cache unavailable", error=str(e))
+            value = None
+
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(value)
+
+    async def set(self, fingerprint: str, result: dict[str, Any]) -> None:
+        """Store a generated result."""
+        if not self.enabled:
+            return
+        try:
+            redis = await get_redis_client()
+            await redis.set(
+                RESULT_KEY.format(fingerprint=fingerprint),
+                json.dumps(result, ensure_ascii=False),
+                ex=self.ttl,
+            )
+        except RedisError as e:
+            logger.warning("Failed to store result in cache", error=str(e))
@@ -0,0 +1,163 @@
+"""
+Idempotency-Key support for write endpoints.
+
+The first request with a given key claims it in Redis (SET NX) and runs the
+handler; its response is stored once the transaction has been committed,
+and the claim is released if the transaction is rolled back.
+Retries with the same key replay the stored response without calling the
+service, and concurrent duplicates wait for the first one to finish.
+Without the header, or when Redis is unavailable, requests run as usual.
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+from collections.abc import Awaitable, Callable
+from typing import Annotated, Any
+
+import structlog
+from fastapi import Depends, Header, HTTPException, Request, Response, status
+from fastapi.responses import JSONResponse
+from redis.exceptions import RedisError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .auth.dependencies import CurrentUser
+from .cache.redis_client import get_redis_client
+from .database import after_commit, get_db, on_rollback
+
+logger = structlog.get_logger(__name__)
+
+IDEMPOTENCY_KEY_PREFIX = "idempotency"
+# How long a completed response is replayed
+RESPONSE_TTL = 24 * 3600
+# How long an in-flight claim blocks duplicates if the worker dies
+LOCK_TTL = 30
+# How long a duplicate waits for the in-flight request before giving up
+WAIT_TIMEOUT = 10.0
+POLL_INTERVAL = 0.05
+
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+
+class IdempotentRequest:
+    """Runs a write handler at most once per Idempotency-Key."""
+
+    def __init__(self, session: AsyncSession, key: str | None, scope: str, fingerprint: str):
+        self.session = session
+        self.key = key
+        self.redis_key = f"{IDEMPOTENCY_KEY_PREFIX}:{scope}:{key}"
+        self.fingerprint = fingerprint
+
+    async def run(
+        self,
+        handler: Callable[[], Awaitable[Any]],
+        status_code: int = status.HTTP_200_OK,
+        serialize: Callable[[Any], Any] | None = None,
+    ) -> Any:
+        """
+        Run `handler` once for this key, or replay the response of the first run.
+
+        Args:
+            handler: Coroutine factory calling the service
+            status_code: Status code of a successful response
+            serialize: Converts the handler result to JSON-compatible content
+        """
+        if not self.key:
+            return await handler()
+
+        try:
+            redis = await get_redis_client()
+            deadline = time.monotonic() + WAIT_TIMEOUT
+            while True:
+                claim = json.dumps({"state": "pending", "fingerprint": self.fingerprint})
+                if await redis.set(self.redis_key, claim, nx=True, ex=LOCK_TTL):
+                    break
+                stored = await redis.get(self.redis_key)
+                if stored is not None:
+                    record = json.loads(stored)
+                    if record["fingerprint"] != self.fingerprint:
+                        raise HTTPException(
+                            status_code=422,  # Unprocessable Content
+                            detail="Idempotency-Key was already used for a different request",
+                        )
+                    if record["state"] == "done":
+                        return self._replay(record)
+                if time.monotonic() >= deadline:
+                    raise HTTPException(
+                        status_code=status.HTTP_409_CONFLICT,
+                        detail="A request with this Idempotency-Key is still in progress",
+                    )
+                await asyncio.sleep(POLL_INTERVAL)
+        except RedisError as e:
+            logger.warning("Idempotency store unavailable, running request directly", error=str(e))
+            return await handler()
+
+        try:
+            result = await handler()
+        except HTTPException as e:
+            if e.status_code < 500:
+                # Nothing was committed; a retry would fail the same way
+                await self._store(e.status_code, {"detail": e.detail})
+            else:
+                await self._release()
+            raise
+        except Exception:
+            await self._release()
+            raise
+
+        content = serialize(result) if serialize else None
+
+        async def store() -> None:
+            await self._store(status_code, content)
+
+        # Publish the response only if the transaction commits; a rolled back
+        # request took no effect, so its retries run again
+        after_commit(self.session, store)
+        on_rollback(self.session, self._release)
+        return result
+
+    def _replay(self, record: dict) -> Response:
+        headers = {REPLAYED_HEADER: "true"}
+        if record["content"] is None:
+            return Response(status_code=record["status_code"], headers=headers)
+        return JSONResponse(
+            content=record["content"], status_code=record["status_code"], headers=headers
+        )
+
+    async def _store(self, status_code: int, content: Any) -> None:
+        record = {
+            "state": "done",
+            "fingerprint": self.fingerprint,
+            "status_code": status_code,
+            "content": content,
+        }
+        try:
+            redis = await get_redis_client()
+            await redis.set(self.redis_key, json.dumps(record), ex=RESPONSE_TTL)
+        except RedisError as e:
+            logger.warning("Failed to store idempotent response", error=str(e))
+
+    async def _release(self) -> None:
+        try:
+            redis = await get_redis_client()
+            await redis.delete(self.redis_key)
+        except RedisError as e:
+            logger.warning("Failed to release idempotency key", error=str(e))
+
+
+async def get_idempotent_request(
+    request: Request,
+    current_user: CurrentUser,
+    db: Annotated[AsyncSession, Depends(get_db)],
+    idempotency_key: Annotated[str | None, Header(max_length=255)] = None,
+) -> IdempotentRequest:
+    """Idempotency-Key scoped to the user and endpoint, bound to the request body."""
+    body = await request.body()
+    fingerprint = hashlib.sha256(body).hexdigest()
+    scope = f"{current_user.tgid}:{request.method}:{request.url.path}"
+    return IdempotentRequest(db, idempotency_key, scope, fingerprint)
+
+
+# Type alias for dependency injection
+Idempotency = Annotated[IdempotentRequest, Depends(get_idempotent_request)]
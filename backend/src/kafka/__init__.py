@@ -1,6 +1,6 @@
 """Kafka integration module for event-driven architecture."""
 
-from .events import DailyTaskEvent, DeadlinePassedEvent
+from .events import DailyTaskEvent, DeadlinePassedEvent, RecommendationTaskEvent
 from .producer import get_kafka_broker, publish_daily_task, publish_deadline_passed
 
 __all__ = [
@@ -9,4 +9,5 @@ __all__ = [
     "publish_daily_task",
     "DeadlinePassedEvent",
     "DailyTaskEvent",
+    "RecommendationTaskEvent",
 ]
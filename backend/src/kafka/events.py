@@ -1,6 +1,7 @@
 """Pydantic schemas for Kafka events."""
 
 from datetime import datetime
+from typing import Any
 
 from pydantic import BaseModel, Field
 
@@ -26,3 +27,17 @@ class DailyTaskEvent(BaseModel):
 
     type: str = Field(description="Type of daily task (e.g., 'generate_recommendations')")
     timestamp: datetime = Field(default_factory=datetime.utcnow)
+
+
+class RecommendationTaskEvent(BaseModel):
+    """Event with one user's task of a recommendations batch run.
+
+    Published keyed by tgid, so the tasks of a run are spread over the
+    partitions and shared by the workers of one consumer group.
+    """
+
+    type: str = Field(default="recommendation.task", frozen=True)
+    run_id: str = Field(description="ID of the batch run")
+    tgid: int = Field(description="Telegram ID of the user")
+    stats: dict[str, Any] = Field(description="User's 30-day order stats")
+    timestamp: datetime = Field(default_factory=datetime.utcnow)
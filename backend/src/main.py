@@ -3,7 +3,12 @@ from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from .cache.local_cache import start_cache_listeners, stop_cache_listeners
+from .cache.redis_client import close_redis_client
 from .config import settings
+from .gemini import close_recommendation_service
+from .pagination import NEXT_CURSOR_HEADER
+from .rate_limit import RateLimitMiddleware
 from .routers import (
     auth_router,
     cafe_links_router,
@@ -22,7 +27,11 @@ from .routers import (
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    await start_cache_listeners()
     yield
+    await stop_cache_listeners()
+    await close_recommendation_service()
+    await close_redis_client()
 
 
 app = FastAPI(
@@ -32,12 +41,16 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+# Added before CORS so that 429 responses still carry CORS headers
+app.add_middleware(RateLimitMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.CORS_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "Retry-After"],
 )
 
 app.include_router(health_router)
@@ -1,7 +1,7 @@
 from .base import Base, TimestampMixin
 from .cafe import Cafe, CafeLinkRequest, Combo, MenuItem, MenuItemOption
 from .deadline import Deadline
-from .order import Order
+from .order import Order, OrderRollup, UserStatsDay, UserStatsTotal
 from .summary import Summary
 from .user import User, UserAccessRequest
 
@@ -17,5 +17,8 @@ __all__ = [
     "MenuItemOption",
     "Deadline",
     "Order",
+    "OrderRollup",
+    "UserStatsDay",
+    "UserStatsTotal",
     "Summary",
 ]
@@ -36,3 +36,57 @@ class Order(Base):
     def combo_items(self):
         """Deprecated (read-only). Use 'items' instead. Kept for backward compatibility."""
         return self.items
+
+
+class OrderRollup(Base):
+    """
+    Pre-aggregated order counts per cafe, date and dish, maintained by OrderService.
+
+    kind: "order" (item_id=0, quantity = orders count, amount = sum of total_price),
+    "combo" (item_id = combo_id), "combo_item", "standalone", "extra" (item_id = menu_item_id).
+    Dish amounts are priced on read, like summaries, so only "order" rows carry amount.
+    """
+
+    __tablename__ = "order_rollups"
+
+    cafe_id: Mapped[int] = mapped_column(Integer, ForeignKey("cafes.id"), primary_key=True)
+    order_date: Mapped[date] = mapped_column(Date, primary_key=True)
+    kind: Mapped[str] = mapped_column(String(20), primary_key=True)
+    item_id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    # Canonical JSON of options
+    options_key: Mapped[str] = mapped_column(Text, primary_key=True, default="")
+    quantity: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    amount: Mapped[Decimal] = mapped_column(Numeric(12, 2), default=0, nullable=False)
+
+
+class UserStatsDay(Base):
+    """
+    Per-user order statistics of one day (by order creation), maintained by OrderService.
+
+    kind: "order" (key "", count = orders), "category" (key = category),
+    "dish" (key = menu_item_id). Days leaving the 30-day window are
+    subtracted from UserStatsTotal and deleted by the nightly roll-off.
+    """
+
+    __tablename__ = "user_stats_days"
+
+    user_tgid: Mapped[int] = mapped_column(
+        BigInteger, ForeignKey("users.tgid", ondelete="CASCADE"), primary_key=True
+    )
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    kind: Mapped[str] = mapped_column(String(20), primary_key=True)
+    key: Mapped[str] = mapped_column(String(255), primary_key=True, default="")
+    count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+
+class UserStatsTotal(Base):
+    """Rolling 30-day totals of UserStatsDay per user, read by recommendations."""
+
+    __tablename__ = "user_stats_totals"
+
+    user_tgid: Mapped[int] = mapped_column(
+        BigInteger, ForeignKey("users.tgid", ondelete="CASCADE"), primary_key=True
+    )
+    kind: Mapped[str] = mapped_column(String(20), primary_key=True)
+    key: Mapped[str] = mapped_column(String(255), primary_key=True, default="")
+    count: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
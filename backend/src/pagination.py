@@ -0,0 +1,74 @@
+"""
+Keyset (cursor) pagination helpers.
+
+A cursor is the sort key of the last row of a page, encoded as opaque
+URL-safe base64. The next page continues strictly after that key, so the
+database seeks on the index instead of skipping OFFSET rows.
+"""
+
+import base64
+import json
+from collections.abc import Sequence
+from datetime import date, datetime
+from typing import Any
+
+from fastapi import HTTPException, status
+from sqlalchemy import ColumnElement, tuple_
+
+# Response header carrying the cursor of the next page for list endpoints
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if isinstance(value, date):
+        return {"d": value.isoformat()}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        if "dt" in value:
+            return datetime.fromisoformat(value["dt"])
+        if "d" in value:
+            return date.fromisoformat(value["d"])
+        raise ValueError("Unknown cursor value")
+    return value
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    payload = json.dumps([_encode_value(v) for v in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> tuple:
+    """Decode a cursor holding `size` sort key values (400 on malformed input)."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != size:
+            raise ValueError("Cursor size mismatch")
+        return tuple(_decode_value(v) for v in values)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor",
+        )
+
+
+def next_cursor(items: Sequence[Any], limit: int, keys: Sequence[str]) -> str | None:
+    """Cursor for the page after `items`, or None if this page is the last one."""
+    if len(items) < limit or not items:
+        return None
+    last = items[-1]
+    return encode_cursor([getattr(last, key) for key in keys])
+
+
+def keyset_after(
+    columns: Sequence[ColumnElement], values: Sequence[Any], descending: bool = True
+) -> ColumnElement[bool]:
+    """Row-value condition selecting rows strictly after `values` in sort order."""
+    if descending:
+        return tuple_(*columns) < tuple_(*values)
+    return tuple_(*columns) > tuple_(*values)
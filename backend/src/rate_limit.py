@@ -0,0 +1,176 @@
+"""
+Token-bucket rate limiting for the API.
+
+Every request takes tokens from a bucket of its client: the authenticated
+user (tgid from the Bearer token) or, for anonymous requests, the client IP.
+Expensive routes cost more tokens than ordinary reads. Buckets live in Redis
+and are updated by a single Lua script, so all API workers share them; when
+Redis is unavailable each process falls back to its own in-memory buckets.
+
+Redis Schema:
+- ratelimit:user:{tgid} / ratelimit:ip:{address} → hash {tokens, ts}
+"""
+
+import math
+import re
+import time
+from collections import OrderedDict
+
+import structlog
+from redis.exceptions import RedisError
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from .auth.jwt import JWTError, verify_token
+from .cache.redis_client import get_redis_client
+from .config import settings
+
+logger = structlog.get_logger(__name__)
+
+RATE_LIMIT_KEY = "ratelimit:{identity}"
+# After a Redis error, use the in-process buckets for this long before retrying Redis
+FALLBACK_PERIOD = 5.0
+# Upper bound on in-process buckets (least recently used are dropped)
+MAX_LOCAL_BUCKETS = 10_000
+
+# (method or None for any, path pattern, cost); first match wins, default cost 1
+ROUTE_COSTS: list[tuple[str | None, re.Pattern, int]] = [
+    (None, re.compile(r"^/health"), 0),
+    ("POST", re.compile(r"^/api/v1/users/\d+/recommendations/generate$"), 20),
+    ("GET", re.compile(r"^/api/v1/orders/export$"), 10),
+    ("POST", re.compile(r"^/api/v1/auth/telegram$"), 5),
+    ("POST", re.compile(r"^/api/v1/orders$"), 3),
+    ("PATCH", re.compile(r"^/api/v1/orders/\d+$"), 3),
+    ("DELETE", re.compile(r"^/api/v1/orders/\d+$"), 3),
+]
+
+# Returns {1, 0} if the tokens were taken, {0, retry_after_seconds} otherwise
+_TAKE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+if allowed == 1 then
+    return {1, 0}
+end
+return {0, math.ceil((cost - tokens) / rate)}
+"""
+
+
+def route_cost(method: str, path: str) -> int:
+    for route_method, pattern, cost in ROUTE_COSTS:
+        if (route_method is None or route_method == method) and pattern.match(path):
+            return cost
+    return 1
+
+
+def client_identity(scope: Scope) -> str:
+    """user:{tgid} for a valid Bearer token, otherwise ip:{address}."""
+    headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope["headers"]}
+    authorization = headers.get("authorization", "")
+    if authorization.lower().startswith("bearer "):
+        try:
+            tgid = verify_token(authorization[7:]).get("tgid")
+            if tgid is not None:
+                return f"user:{tgid}"
+        except JWTError:
+            pass
+    # Set by nginx in front of the API
+    address = headers.get("x-real-ip")
+    if not address and scope.get("client"):
+        address = scope["client"][0]
+    return f"ip:{address or 'unknown'}"
+
+
+class LocalTokenBuckets:
+    """In-process token buckets used while Redis is unavailable."""
+
+    def __init__(self, max_size: int = MAX_LOCAL_BUCKETS):
+        self.max_size = max_size
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    def take(self, key: str, cost: int, capacity: int, rate: float) -> tuple[bool, int]:
+        """Same algorithm as the Redis script; returns (allowed, retry_after_seconds)."""
+        now = time.monotonic()
+        tokens, ts = self._buckets.pop(key, (capacity, now))
+        tokens = min(capacity, tokens + max(0.0, now - ts) * rate)
+        allowed = tokens >= cost
+        if allowed:
+            tokens -= cost
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_size:
+            self._buckets.popitem(last=False)
+        if allowed:
+            return True, 0
+        return False, math.ceil((cost - tokens) / rate)
+
+    def clear(self) -> None:
+        self._buckets.clear()
+
+
+class RateLimitMiddleware:
+    """ASGI middleware answering 429 with Retry-After once a client's bucket is empty."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.local_buckets = LocalTokenBuckets()
+        self._redis_retry_at = 0.0
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or not settings.RATE_LIMIT_ENABLED
+            or scope["method"] == "OPTIONS"
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        cost = route_cost(scope["method"], scope["path"])
+        if cost == 0:
+            await self.app(scope, receive, send)
+            return
+
+        identity = client_identity(scope)
+        allowed, retry_after = await self.take(identity, cost)
+        if not allowed:
+            logger.info("Rate limit exceeded", identity=identity, path=scope["path"])
+            response = JSONResponse(
+                {"detail": "Too many requests"},
+                status_code=429,
+                headers={"Retry-After": str(retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+
+        await self.app(scope, receive, send)
+
+    async def take(self, identity: str, cost: int) -> tuple[bool, int]:
+        """Take `cost` tokens from the identity's bucket."""
+        capacity = settings.RATE_LIMIT_CAPACITY
+        rate = settings.RATE_LIMIT_REFILL_PER_SECOND
+        # A request costing more than the bucket holds must still be possible
+        cost = min(cost, capacity)
+        key = RATE_LIMIT_KEY.format(identity=identity)
+
+        if time.monotonic() >= self._redis_retry_at:
+            try:
+                redis = await get_redis_client()
+                allowed, retry_after = await redis.eval(_TAKE_SCRIPT, 1, key, capacity, rate, cost)
+                return bool(allowed), int(retry_after)
+            except RedisError as e:
+                logger.warning("Rate limiter falling back to local buckets", error=str(e))
+                self._redis_retry_at = time.monotonic() + FALLBACK_PERIOD
+
+        return self.local_buckets.take(key, cost, capacity, rate)
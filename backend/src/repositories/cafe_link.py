@@ -5,6 +5,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..models import Cafe, CafeLinkRequest
 from ..models.cafe import LinkRequestStatus
+from ..pagination import keyset_after
 
 # Whitelist of fields that can be updated via repository
 ALLOWED_UPDATE_FIELDS = {"status", "processed_at"}
@@ -27,20 +28,33 @@ class CafeLinkRepository:
         skip: int = 0,
         limit: int = 100,
         status: LinkRequestStatus | None = None,
-    ) -> tuple[list[CafeLinkRequest], int]:
+        after: tuple | None = None,
+        with_total: bool = True,
+    ) -> tuple[list[CafeLinkRequest], int | None]:
         """List link requests with pagination and optional status filter."""
         query = select(CafeLinkRequest)
 
         if status:
             query = query.where(CafeLinkRequest.status == status)
 
-        # Get total count
-        count_query = select(func.count()).select_from(query.subquery())
-        total_result = await self.session.execute(count_query)
-        total = total_result.scalar_one()
+        # Get total count (only when requested: it scans every matching row)
+        total = None
+        if with_total:
+            count_query = select(func.count()).select_from(query.subquery())
+            total_result = await self.session.execute(count_query)
+            total = total_result.scalar_one()
+
+        if after:
+            query = query.where(
+                keyset_after((CafeLinkRequest.created_at, CafeLinkRequest.id), after)
+            )
 
         # Get paginated results
-        query = query.offset(skip).limit(limit).order_by(CafeLinkRequest.created_at.desc())
+        query = (
+            query.order_by(CafeLinkRequest.created_at.desc(), CafeLinkRequest.id.desc())
+            .offset(skip)
+            .limit(limit)
+        )
         result = await self.session.execute(query)
         items = list(result.scalars().all())
 
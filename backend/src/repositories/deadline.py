@@ -1,7 +1,7 @@
 from sqlalchemy import delete, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..models import Deadline
+from ..models import Cafe, Deadline
 
 
 class DeadlineRepository:
@@ -22,6 +22,27 @@ class DeadlineRepository:
         )
         return result.scalar_one_or_none()
 
+    async def get_for_active_cafes(
+        self, cafe_ids: list[int] | None = None
+    ) -> dict[int, list[Deadline]]:
+        """Deadlines of all active cafes (or the given subset) in one query, keyed by cafe ID."""
+        query = (
+            select(Cafe.id, Deadline)
+            .outerjoin(Deadline, Deadline.cafe_id == Cafe.id)
+            .where(Cafe.is_active == True)
+            .order_by(Cafe.id)
+        )
+        if cafe_ids:
+            query = query.where(Cafe.id.in_(cafe_ids))
+        result = await self.session.execute(query)
+
+        deadlines_by_cafe: dict[int, list[Deadline]] = {}
+        for cafe_id, deadline in result.all():
+            deadlines = deadlines_by_cafe.setdefault(cafe_id, [])
+            if deadline is not None:
+                deadlines.append(deadline)
+        return deadlines_by_cafe
+
     async def delete_for_cafe(self, cafe_id: int) -> None:
         await self.session.execute(
             delete(Deadline).where(Deadline.cafe_id == cafe_id)
@@ -1,3 +1,5 @@
+from collections.abc import Iterable
+
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
@@ -61,6 +63,16 @@ class MenuItemRepository:
         )
         return result.scalar_one_or_none()
 
+    async def get_many(self, item_ids: Iterable[int]) -> dict[int, MenuItem]:
+        """Load several menu items (with options) in one round trip, keyed by ID."""
+        ids = set(item_ids)
+        if not ids:
+            return {}
+        result = await self.session.execute(
+            select(MenuItem).options(selectinload(MenuItem.options)).where(MenuItem.id.in_(ids))
+        )
+        return {item.id: item for item in result.scalars().all()}
+
     async def list_by_cafe(
         self,
         cafe_id: int,
@@ -1,9 +1,11 @@
+from collections.abc import AsyncIterator, Sequence
 from datetime import date
 
-from sqlalchemy import select
+from sqlalchemy import Row, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..models import Order
+from ..models import Cafe, Order, User
+from ..pagination import keyset_after
 
 # Whitelist of fields that can be updated via repository
 ALLOWED_UPDATE_FIELDS: set[str] = {"combo_id", "items", "combo_items", "extras", "notes", "total_price", "status"}
@@ -24,14 +26,15 @@ class OrderRepository:
         user_tgid: int,
         skip: int = 0,
         limit: int = 100,
+        after: tuple | None = None,
     ) -> list[Order]:
-        result = await self.session.execute(
-            select(Order)
-            .where(Order.user_tgid == user_tgid)
-            .order_by(Order.order_date.desc())
-            .offset(skip)
-            .limit(limit)
-        )
+        query = select(Order).where(Order.user_tgid == user_tgid)
+
+        if after:
+            query = query.where(keyset_after((Order.order_date, Order.id), after))
+
+        query = query.order_by(Order.order_date.desc(), Order.id.desc()).offset(skip).limit(limit)
+        result = await self.session.execute(query)
         return list(result.scalars().all())
 
     async def list_by_cafe_and_date(
@@ -52,6 +55,7 @@ class OrderRepository:
         limit: int = 100,
         cafe_id: int | None = None,
         order_date: date | None = None,
+        after: tuple | None = None,
     ) -> list[Order]:
         query = select(Order)
 
@@ -61,10 +65,60 @@ class OrderRepository:
         if order_date:
             query = query.where(Order.order_date == order_date)
 
-        query = query.order_by(Order.order_date.desc()).offset(skip).limit(limit)
+        if after:
+            query = query.where(keyset_after((Order.order_date, Order.id), after))
+
+        query = query.order_by(Order.order_date.desc(), Order.id.desc()).offset(skip).limit(limit)
         result = await self.session.execute(query)
         return list(result.scalars().all())
 
+    async def stream_for_export(
+        self,
+        date_from: date,
+        date_to: date,
+        cafe_id: int | None = None,
+        office: str | None = None,
+        batch_size: int = 1000,
+    ) -> AsyncIterator[Sequence[Row]]:
+        """
+        Stream flat order rows (with cafe and user names) in batches.
+
+        Uses a server-side cursor, so memory does not depend on the range size.
+        """
+        query = (
+            select(
+                Order.id,
+                Order.order_date,
+                Order.cafe_id,
+                Cafe.name.label("cafe_name"),
+                Order.user_tgid,
+                User.name.label("user_name"),
+                User.office,
+                Order.status,
+                Order.combo_id,
+                Order.items,
+                Order.extras,
+                Order.notes,
+                Order.total_price,
+                Order.created_at,
+            )
+            .join(Cafe, Cafe.id == Order.cafe_id)
+            .join(User, User.tgid == Order.user_tgid)
+            .where(Order.order_date >= date_from)
+            .where(Order.order_date <= date_to)
+        )
+
+        if cafe_id:
+            query = query.where(Order.cafe_id == cafe_id)
+
+        if office:
+            query = query.where(User.office == office)
+
+        query = query.order_by(Order.order_date, Order.id).execution_options(yield_per=batch_size)
+        result = await self.session.stream(query)
+        async for batch in result.partitions():
+            yield batch
+
     async def create(self, **kwargs) -> Order:
         order = Order(**kwargs)
         self.session.add(order)
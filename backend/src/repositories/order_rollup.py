@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+import json
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+
+from sqlalchemy import JSON, Row, and_, column, delete, func, literal, null, select, true
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import Combo, MenuItem, Order, OrderRollup
+
+RollupKey = tuple[int, date, str, int, str]  # cafe_id, order_date, kind, item_id, options_key
+
+
+def options_key(options: dict | None) -> str:
+    """Canonical representation of an option set, independent of key order."""
+    if not options:
+        return ""
+    return json.dumps(options, sort_keys=True, ensure_ascii=False)
+
+
+def order_contributions(order: Order) -> dict[RollupKey, list]:
+    """Rollup rows affected by a single order: key -> [quantity, amount]."""
+    rows: dict[RollupKey, list] = defaultdict(lambda: [0, Decimal("0")])
+    if order.status == "cancelled":
+        return rows
+
+    def add(
+        kind: str, item_id: int, quantity: int, amount: Decimal = Decimal("0"), options: str = ""
+    ):
+        row = rows[(order.cafe_id, order.order_date, kind, item_id, options)]
+        row[0] += quantity
+        row[1] += amount
+
+    add("order", 0, 1, order.total_price)
+    if order.combo_id:
+        add("combo", order.combo_id, 1)
+    for item in order.items:
+        if item.get("type") == "standalone":
+            add("standalone", item["menu_item_id"], item.get("quantity", 1),
+                options=options_key(item.get("options")))
+        else:
+            add("combo_item", item["menu_item_id"], 1)
+    for extra in order.extras:
+        add("extra", extra["menu_item_id"], extra.get("quantity", 1))
+    return rows
+
+
+class OrderRollupRepository:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    @property
+    def _dialect(self) -> str:
+        return self.session.get_bind().dialect.name
+
+    async def add(self, order: Order) -> None:
+        await self._apply(order_contributions(order), 1)
+
+    async def remove(self, order: Order) -> None:
+        await self._apply(order_contributions(order), -1)
+
+    async def list_for_date(self, cafe_id: int, order_date: date) -> list[Row]:
+        """
+        Rollup rows for a cafe and date with current names and prices.
+
+        Returns rows of (kind, item_id, options_key, quantity, amount, name, price).
+        """
+        result = await self.session.execute(
+            select(
+                OrderRollup.kind,
+                OrderRollup.item_id,
+                OrderRollup.options_key,
+                OrderRollup.quantity,
+                OrderRollup.amount,
+                func.coalesce(Combo.name, MenuItem.name),
+                func.coalesce(Combo.price, MenuItem.price),
+            )
+            .outerjoin(
+                Combo,
+                and_(OrderRollup.kind == "combo", Combo.id == OrderRollup.item_id),
+            )
+            .outerjoin(
+                MenuItem,
+                and_(
+                    OrderRollup.kind.in_(("combo_item", "standalone", "extra")),
+                    MenuItem.id == OrderRollup.item_id,
+                ),
+            )
+            .where(OrderRollup.cafe_id == cafe_id)
+            .where(OrderRollup.order_date == order_date)
+            .where(OrderRollup.quantity > 0)
+            .order_by(OrderRollup.kind, OrderRollup.item_id, OrderRollup.options_key)
+        )
+        return list(result.all())
+
+    async def rebuild(self, cafe_id: int | None = None, order_date: date | None = None) -> int:
+        """
+        Recompute rollups from the orders table with set-based aggregation.
+
+        Returns:
+            Number of rollup rows written
+        """
+        filters = []
+        rollup_filters = []
+        if cafe_id is not None:
+            filters.append(Order.cafe_id == cafe_id)
+            rollup_filters.append(OrderRollup.cafe_id == cafe_id)
+        if order_date is not None:
+            filters.append(Order.order_date == order_date)
+            rollup_filters.append(OrderRollup.order_date == order_date)
+        filters.append(Order.status != "cancelled")
+
+        rows: dict[RollupKey, list] = defaultdict(lambda: [0, Decimal("0")])
+        aggregated = await self._aggregate(filters)
+        for key_cafe, key_date, kind, item_id, options, quantity, amount in aggregated:
+            # Option sets stored with a different key order collapse into one row
+            canonical = options_key(json.loads(options)) if options else ""
+            row = rows[(key_cafe, key_date, kind, item_id, canonical)]
+            row[0] += quantity
+            row[1] += Decimal(amount or 0)
+
+        await self.session.execute(delete(OrderRollup).where(*rollup_filters))
+        if rows:
+            await self.session.execute(
+                OrderRollup.__table__.insert(),
+                [
+                    self._row_values(key, quantity, amount)
+                    for key, (quantity, amount) in rows.items()
+                ],
+            )
+        await self.session.flush()
+        return len(rows)
+
+    async def _apply(self, contributions: dict[RollupKey, list], sign: int) -> None:
+        if not contributions:
+            return
+        insert = sqlite.insert if self._dialect == "sqlite" else postgresql.insert
+        stmt = insert(OrderRollup).values([
+            self._row_values(key, sign * quantity, sign * amount)
+            for key, (quantity, amount) in contributions.items()
+        ])
+        # Atomic increments: concurrent orders for the same dish never lose updates
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["cafe_id", "order_date", "kind", "item_id", "options_key"],
+            set_={
+                "quantity": OrderRollup.quantity + stmt.excluded.quantity,
+                "amount": OrderRollup.amount + stmt.excluded.amount,
+            },
+        )
+        await self.session.execute(stmt)
+
+    @staticmethod
+    def _row_values(key: RollupKey, quantity: int, amount: Decimal) -> dict:
+        cafe_id, order_date, kind, item_id, options = key
+        return {
+            "cafe_id": cafe_id,
+            "order_date": order_date,
+            "kind": kind,
+            "item_id": item_id,
+            "options_key": options,
+            "quantity": quantity,
+            "amount": amount,
+        }
+
+    def _json_elements(self, array_column):
+        """Table-valued function yielding the elements of a JSON array column as `value`."""
+        if self._dialect == "sqlite":
+            return func.json_each(array_column).table_valued(column("value", JSON))
+        return (
+            func.json_array_elements(array_column)
+            .table_valued(column("value", JSON))
+            .render_derived()
+        )
+
+    async def _aggregate(self, filters: list) -> list[Row]:
+        """(cafe_id, order_date, kind, item_id, options, quantity, amount) grouped in SQL."""
+        group = (Order.cafe_id, Order.order_date)
+
+        orders = (
+            select(*group, literal("order"), literal(0), null(), func.count(Order.id),
+                   func.sum(Order.total_price))
+            .where(*filters)
+            .group_by(*group)
+        )
+        combos = (
+            select(*group, literal("combo"), Order.combo_id, null(), func.count(Order.id),
+                   literal(0))
+            .where(*filters, Order.combo_id.is_not(None))
+            .group_by(*group, Order.combo_id)
+        )
+
+        item = self._json_elements(Order.items)
+        item_id = item.c.value["menu_item_id"].as_integer()
+        item_type = item.c.value["type"].as_string()
+        options = item.c.value["options"].as_string()
+        quantity = func.coalesce(item.c.value["quantity"].as_integer(), 1)
+        combo_items = (
+            select(*group, literal("combo_item"), item_id, null(), func.count(), literal(0))
+            .select_from(Order)
+            .join(item, true())
+            .where(*filters, func.coalesce(item_type, "combo") != "standalone")
+            .group_by(*group, item_id)
+        )
+        standalone = (
+            select(*group, literal("standalone"), item_id, options, func.sum(quantity), literal(0))
+            .select_from(Order)
+            .join(item, true())
+            .where(*filters, item_type == "standalone")
+            .group_by(*group, item_id, options)
+        )
+
+        extra = self._json_elements(Order.extras)
+        extra_id = extra.c.value["menu_item_id"].as_integer()
+        extras = (
+            select(*group, literal("extra"), extra_id, null(),
+                   func.sum(func.coalesce(extra.c.value["quantity"].as_integer(), 1)), literal(0))
+            .select_from(Order)
+            .join(extra, true())
+            .where(*filters)
+            .group_by(*group, extra_id)
+        )
+
+        rows: list[Row] = []
+        for query in (orders, combos, combo_items, standalone, extras):
+            rows.extend((await self.session.execute(query)).all())
+        return rows
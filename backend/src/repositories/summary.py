@@ -1,12 +1,10 @@
 from __future__ import annotations
 
-from datetime import date
-from decimal import Decimal
-
-from sqlalchemy import func, select
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..models import Combo, MenuItem, Order, Summary
+from ..models import Summary
+from ..pagination import keyset_after
 
 
 class SummaryRepository:
@@ -24,13 +22,17 @@ class SummaryRepository:
         cafe_id: int | None = None,
         skip: int = 0,
         limit: int = 100,
+        after: tuple | None = None,
     ) -> list[Summary]:
         query = select(Summary)
 
         if cafe_id:
             query = query.where(Summary.cafe_id == cafe_id)
 
-        query = query.order_by(Summary.date.desc()).offset(skip).limit(limit)
+        if after:
+            query = query.where(keyset_after((Summary.date, Summary.id), after))
+
+        query = query.order_by(Summary.date.desc(), Summary.id.desc()).offset(skip).limit(limit)
         result = await self.session.execute(query)
         return list(result.scalars().all())
 
@@ -43,26 +45,3 @@ class SummaryRepository:
     async def delete(self, summary: Summary) -> None:
         await self.session.delete(summary)
         await self.session.flush()
-
-    async def get_orders_for_date(
-        self, cafe_id: int, order_date: date
-    ) -> list[Order]:
-        result = await self.session.execute(
-            select(Order)
-            .where(Order.cafe_id == cafe_id)
-            .where(Order.order_date == order_date)
-            .where(Order.status != "cancelled")
-        )
-        return list(result.scalars().all())
-
-    async def get_combo(self, combo_id: int) -> Combo | None:
-        result = await self.session.execute(
-            select(Combo).where(Combo.id == combo_id)
-        )
-        return result.scalar_one_or_none()
-
-    async def get_menu_item(self, item_id: int) -> MenuItem | None:
-        result = await self.session.execute(
-            select(MenuItem).where(MenuItem.id == item_id)
-        )
-        return result.scalar_one_or_none()
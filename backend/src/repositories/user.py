@@ -5,6 +5,7 @@ from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..models import Order, User
+from ..pagination import keyset_after
 
 # Whitelist of fields that can be updated via repository
 ALLOWED_UPDATE_FIELDS = {"name", "office", "role", "is_active", "weekly_limit"}
@@ -26,6 +27,7 @@ class UserRepository:
         limit: int = 100,
         search: str | None = None,
         role: str | None = None,
+        after: tuple | None = None,
     ) -> list[User]:
         query = select(User)
 
@@ -37,7 +39,10 @@ class UserRepository:
         if role:
             query = query.where(User.role == role)
 
-        query = query.offset(skip).limit(limit)
+        if after:
+            query = query.where(keyset_after((User.tgid,), after, descending=False))
+
+        query = query.order_by(User.tgid).offset(skip).limit(limit)
         result = await self.session.execute(query)
         return list(result.scalars().all())
 
@@ -62,8 +67,11 @@ class UserRepository:
 
     async def get_spent_this_week(self, tgid: int) -> Decimal:
         """Calculate total spent by user this week (Monday to Sunday)."""
-        today = date.today()
-        monday = today - timedelta(days=today.weekday())
+        return await self.get_spent_for_week(tgid, date.today())
+
+    async def get_spent_for_week(self, tgid: int, day: date) -> Decimal:
+        """Calculate total spent by user in the week (Monday to Sunday) containing `day`."""
+        monday = day - timedelta(days=day.weekday())
         sunday = monday + timedelta(days=6)
 
         result = await self.session.execute(
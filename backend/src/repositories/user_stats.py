@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from collections.abc import Iterable
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import Row, and_, delete, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import Order, UserStatsDay, UserStatsTotal
+
+# Days covered by the projection, including today
+STATS_WINDOW_DAYS = 30
+# Postgres advisory lock serializing roll-offs of concurrent worker replicas
+ROLL_OFF_LOCK_ID = 0x75737473
+
+StatKey = tuple[str, str]  # kind, key
+
+
+def window_start(today: date) -> date:
+    """First day still inside the rolling window."""
+    return today - timedelta(days=STATS_WINDOW_DAYS - 1)
+
+
+def local_day(moment: datetime) -> date:
+    """Server-local calendar day of a timestamp (naive timestamps are taken as local)."""
+    return moment.astimezone().date() if moment.tzinfo else moment.date()
+
+
+def stats_contributions(items: list, extras: list) -> dict[StatKey, int]:
+    """
+    Counters affected by a single order.
+
+    Same rules as OrderRowStats: every item counts once for its category and
+    dish, extras count with their quantity.
+    """
+    counts: dict[StatKey, int] = defaultdict(int)
+    counts[("order", "")] += 1
+    for item in items:
+        if item.get("category"):
+            counts[("category", item["category"])] += 1
+        if item.get("menu_item_id"):
+            counts[("dish", str(item["menu_item_id"]))] += 1
+    for extra in extras or []:
+        if extra.get("menu_item_id"):
+            counts[("dish", str(extra["menu_item_id"]))] += extra.get("quantity", 1)
+    return counts
+
+
+class UserStatsRepository:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    @property
+    def _dialect(self) -> str:
+        return self.session.get_bind().dialect.name
+
+    async def add(self, order: Order, day: date) -> None:
+        await self._apply(order.user_tgid, day, stats_contributions(order.items, order.extras), 1)
+
+    async def remove(self, order: Order, day: date) -> None:
+        await self._apply(order.user_tgid, day, stats_contributions(order.items, order.extras), -1)
+
+    async def list_totals(self, user_tgid: int) -> list[Row]:
+        """
+        Totals of a user with the date of their last order (all time).
+
+        Returns rows of (last_order_date, kind, key, count); a single row with
+        kind None if the user has no orders in the window.
+        """
+        last_order = (
+            select(func.max(Order.created_at).label("last_order_date"))
+            .where(Order.user_tgid == user_tgid)
+            .subquery()
+        )
+        result = await self.session.execute(
+            select(
+                last_order.c.last_order_date,
+                UserStatsTotal.kind,
+                UserStatsTotal.key,
+                UserStatsTotal.count,
+            )
+            .select_from(last_order)
+            .outerjoin(
+                UserStatsTotal,
+                and_(UserStatsTotal.user_tgid == user_tgid, UserStatsTotal.count > 0),
+            )
+        )
+        return list(result.all())
+
+    async def list_active_totals(self, min_orders: int) -> list[Row]:
+        """Rows of (user_tgid, kind, key, count) of users with >= min_orders orders in window."""
+        active_users = (
+            select(UserStatsTotal.user_tgid)
+            .where(UserStatsTotal.kind == "order", UserStatsTotal.count >= min_orders)
+        )
+        result = await self.session.execute(
+            select(
+                UserStatsTotal.user_tgid,
+                UserStatsTotal.kind,
+                UserStatsTotal.key,
+                UserStatsTotal.count,
+            )
+            .where(UserStatsTotal.user_tgid.in_(active_users), UserStatsTotal.count > 0)
+            .order_by(UserStatsTotal.user_tgid)
+        )
+        return list(result.all())
+
+    async def last_order_dates(self, user_tgids: Iterable[int]) -> dict[int, datetime]:
+        result = await self.session.execute(
+            select(Order.user_tgid, func.max(Order.created_at))
+            .where(Order.user_tgid.in_(list(user_tgids)))
+            .group_by(Order.user_tgid)
+        )
+        return {user_tgid: last for user_tgid, last in result.all()}
+
+    async def roll_off(self, today: date) -> int:
+        """
+        Subtract days that left the window from the totals and delete them.
+
+        Safe to run concurrently (every worker replica schedules it).
+
+        Returns:
+            Number of daily rows removed
+        """
+        cutoff = window_start(today)
+        if self._dialect == "postgresql":
+            # Held until commit: a concurrent roll-off waits, then (READ COMMITTED)
+            # finds the expired days already gone instead of subtracting them twice
+            await self.session.execute(select(func.pg_advisory_xact_lock(ROLL_OFF_LOCK_ID)))
+        result = await self.session.execute(
+            select(
+                UserStatsDay.user_tgid,
+                UserStatsDay.kind,
+                UserStatsDay.key,
+                func.sum(UserStatsDay.count),
+            )
+            .where(UserStatsDay.day < cutoff)
+            .group_by(UserStatsDay.user_tgid, UserStatsDay.kind, UserStatsDay.key)
+        )
+        expired = [
+            {"user_tgid": user_tgid, "kind": kind, "key": key, "count": -count}
+            for user_tgid, kind, key, count in result.all()
+        ]
+        if expired:
+            await self._upsert(UserStatsTotal, expired, ["user_tgid", "kind", "key"])
+
+        removed = await self.session.execute(delete(UserStatsDay).where(UserStatsDay.day < cutoff))
+        await self.session.execute(delete(UserStatsTotal).where(UserStatsTotal.count <= 0))
+        await self.session.flush()
+        return removed.rowcount or 0
+
+    async def rebuild(self, today: date | None = None) -> int:
+        """
+        Recompute the projection from the orders of the current window.
+
+        Returns:
+            Number of daily rows written
+        """
+        cutoff = window_start(today or date.today())
+        since = datetime.combine(cutoff, time()).astimezone()
+
+        days: dict[tuple[int, date], dict[StatKey, int]] = defaultdict(lambda: defaultdict(int))
+        result = await self.session.stream(
+            select(Order.user_tgid, Order.created_at, Order.items, Order.extras)
+            .where(Order.created_at >= since)
+            .execution_options(yield_per=1000)
+        )
+        async for partition in result.partitions():
+            for user_tgid, created_at, items, extras in partition:
+                counts = days[(user_tgid, local_day(created_at))]
+                for stat_key, count in stats_contributions(items, extras).items():
+                    counts[stat_key] += count
+
+        totals: dict[tuple[int, str, str], int] = defaultdict(int)
+        day_rows = []
+        for (user_tgid, day), counts in days.items():
+            for (kind, key), count in counts.items():
+                day_rows.append(
+                    {"user_tgid": user_tgid, "day": day, "kind": kind, "key": key, "count": count}
+                )
+                totals[(user_tgid, kind, key)] += count
+
+        await self.session.execute(delete(UserStatsDay))
+        await self.session.execute(delete(UserStatsTotal))
+        if day_rows:
+            await self.session.execute(UserStatsDay.__table__.insert(), day_rows)
+            await self.session.execute(
+                UserStatsTotal.__table__.insert(),
+                [
+                    {"user_tgid": user_tgid, "kind": kind, "key": key, "count": count}
+                    for (user_tgid, kind, key), count in totals.items()
+                ],
+            )
+        await self.session.flush()
+        return len(day_rows)
+
+    async def _apply(
+        self, user_tgid: int, day: date, contributions: dict[StatKey, int], sign: int
+    ) -> None:
+        # Orders created before the window were already rolled off
+        if day < window_start(date.today()):
+            return
+        rows = [
+            {"user_tgid": user_tgid, "kind": kind, "key": key, "count": sign * count}
+            for (kind, key), count in contributions.items()
+        ]
+        await self._upsert(
+            UserStatsDay, [{**row, "day": day} for row in rows], ["user_tgid", "day", "kind", "key"]
+        )
+        await self._upsert(UserStatsTotal, rows, ["user_tgid", "kind", "key"])
+
+    async def _upsert(self, model, rows: list[dict], index_elements: list[str]) -> None:
+        insert = sqlite.insert if self._dialect == "sqlite" else postgresql.insert
+        stmt = insert(model).values(rows)
+        # Atomic increments, like order rollups
+        stmt = stmt.on_conflict_do_update(
+            index_elements=index_elements,
+            set_={"count": model.count + stmt.excluded.count},
+        )
+        await self.session.execute(stmt)
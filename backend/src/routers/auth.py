@@ -1,17 +1,28 @@
+import time
 from typing import Annotated
 
+import structlog
 from fastapi import APIRouter, Depends, HTTPException, status
+from redis.exceptions import RedisError
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..auth.jwt import create_access_token
 from ..auth.schemas import AuthResponse, TelegramAuthRequest, UserResponse
-from ..auth.telegram import TelegramAuthError, validate_telegram_init_data
+from ..auth.telegram import (
+    INIT_DATA_MAX_AGE,
+    TelegramAuthError,
+    validate_telegram_init_data,
+)
+from ..cache.login_cache import cache_login, get_cached_login
+from ..cache.principal import invalidate_principal
 from ..config import settings
-from ..database import get_db
+from ..database import after_commit, get_db
 from ..models import User, UserAccessRequest
 from ..models.user import UserAccessRequestStatus
 
+logger = structlog.get_logger(__name__)
+
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 
@@ -26,7 +37,17 @@ async def authenticate_telegram(
     - Validates initData using HMAC-SHA256
     - For existing users: returns JWT access token
     - For new users: creates access request and returns 403
+
+    A repeated login with the same initData and office is answered from the
+    replay cache with the previously issued token.
     """
+    try:
+        cached = await get_cached_login(request.init_data, request.office)
+        if cached is not None:
+            return AuthResponse.model_validate_json(cached)
+    except RedisError as e:
+        logger.warning("Login cache unavailable", error=str(e))
+
     # Validate Telegram initData
     try:
         tg_user = validate_telegram_init_data(
@@ -61,6 +82,9 @@ async def authenticate_telegram(
         if request.office and user.office != request.office:
             user.office = request.office
 
+        if db.is_modified(user):
+            after_commit(db, lambda: invalidate_principal(tgid))
+
         # Check if user is active
         if not user.is_active:
             raise HTTPException(
@@ -73,12 +97,25 @@ async def authenticate_telegram(
             data={"tgid": user.tgid, "role": user.role}
         )
 
-        return AuthResponse(
+        response = AuthResponse(
             access_token=access_token,
             token_type="bearer",
             user=UserResponse.model_validate(user),
         )
 
+        # Replays are valid for as long as the initData itself
+        ttl = tg_user["auth_date"] + INIT_DATA_MAX_AGE - int(time.time())
+        payload = response.model_dump_json()
+
+        async def remember_login() -> None:
+            try:
+                await cache_login(request.init_data, request.office, payload, ttl)
+            except RedisError as e:
+                logger.warning("Failed to cache login", error=str(e))
+
+        after_commit(db, remember_login)
+        return response
+
     # User doesn't exist - check for access request
     request_result = await db.execute(
         select(UserAccessRequest).where(UserAccessRequest.tgid == tgid)
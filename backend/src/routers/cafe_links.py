@@ -48,13 +48,18 @@ async def list_cafe_requests(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     status: LinkRequestStatus | None = Query(None),
+    cursor: str | None = Query(None),
+    include_total: bool = Query(True),
 ):
     """
     List all cafe link requests (manager only).
 
-    Supports pagination and filtering by status.
+    Supports pagination (offset or `cursor` = previous `next_cursor`) and
+    filtering by status. `total` is only counted on the first page.
     """
-    return await service.list_requests(skip=skip, limit=limit, status=status)
+    return await service.list_requests(
+        skip=skip, limit=limit, status=status, cursor=cursor, include_total=include_total
+    )
 
 
 @cafe_requests_router.post("/cafe-requests/{request_id}/approve", response_model=LinkRequestSchema)
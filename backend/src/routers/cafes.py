@@ -4,7 +4,9 @@ from fastapi import APIRouter, Depends, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..auth.dependencies import CurrentUser, ManagerUser
+from ..cache.local_cache import cafes_cache
 from ..database import get_db
+from ..etag import Conditional
 from ..schemas.cafe import CafeCreate, CafeResponse, CafeStatusUpdate, CafeUpdate
 from ..services.cafe import CafeService
 
@@ -19,6 +21,7 @@ def get_cafe_service(db: Annotated[AsyncSession, Depends(get_db)]) -> CafeServic
 async def list_cafes(
     current_user: CurrentUser,
     service: Annotated[CafeService, Depends(get_cafe_service)],
+    conditional: Conditional,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     active_only: bool = Query(True),
@@ -27,7 +30,11 @@ async def list_cafes(
     # Non-managers only see active cafes
     if current_user.role != "manager":
         active_only = True
-    return await service.list_cafes(skip=skip, limit=limit, active_only=active_only)
+    if await conditional.matches(cafes_cache, 0, skip, limit, active_only):
+        return conditional.not_modified()
+    cafes = await service.list_cafes(skip=skip, limit=limit, active_only=active_only)
+    conditional.set_etag()
+    return cafes
 
 
 @router.post("", response_model=CafeResponse, status_code=201)
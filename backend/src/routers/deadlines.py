@@ -4,7 +4,9 @@ from fastapi import APIRouter, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..auth.dependencies import ManagerUser
+from ..cache.local_cache import deadline_cache
 from ..database import get_db
+from ..etag import Conditional
 from ..schemas.deadline import DeadlineSchedule, DeadlineScheduleUpdate
 from ..services.deadline import DeadlineService
 
@@ -20,9 +22,14 @@ async def get_deadlines(
     cafe_id: int,
     manager: ManagerUser,
     service: Annotated[DeadlineService, Depends(get_deadline_service)],
+    conditional: Conditional,
 ):
     """Get deadline schedule for a cafe (manager only)."""
-    return await service.get_schedule(cafe_id)
+    if await conditional.matches(deadline_cache, cafe_id):
+        return conditional.not_modified()
+    schedule = await service.get_schedule(cafe_id)
+    conditional.set_etag()
+    return schedule
 
 
 @router.put("/cafes/{cafe_id}/deadlines", response_model=DeadlineSchedule)
@@ -4,7 +4,9 @@ from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..auth.dependencies import CurrentUser, ManagerUser
+from ..cache.local_cache import menu_cache
 from ..database import get_db
+from ..etag import Conditional
 from ..schemas.menu import (
     ComboCreate, ComboResponse, ComboUpdate,
     MenuItemCreate, MenuItemResponse, MenuItemUpdate,
@@ -24,11 +26,16 @@ async def list_combos(
     cafe_id: int,
     current_user: CurrentUser,
     service: Annotated[MenuService, Depends(get_menu_service)],
+    conditional: Conditional,
     available_only: bool = Query(True),
 ):
     if current_user.role != "manager":
         available_only = True
-    return await service.list_combos(cafe_id, available_only=available_only)
+    if await conditional.matches(menu_cache, cafe_id, "combos", available_only):
+        return conditional.not_modified()
+    combos = await service.list_combos(cafe_id, available_only=available_only)
+    conditional.set_etag(menu_cache, cafe_id)
+    return combos
 
 
 @router.post("/cafes/{cafe_id}/combos", response_model=ComboResponse, status_code=201)
@@ -60,12 +67,17 @@ async def list_menu_items(
     cafe_id: int,
     current_user: CurrentUser,
     service: Annotated[MenuService, Depends(get_menu_service)],
+    conditional: Conditional,
     category: str | None = None,
     available_only: bool = Query(True),
 ):
     if current_user.role != "manager":
         available_only = True
-    return await service.list_menu_items(cafe_id, category=category, available_only=available_only)
+    if await conditional.matches(menu_cache, cafe_id, "menu", category, available_only):
+        return conditional.not_modified()
+    items = await service.list_menu_items(cafe_id, category=category, available_only=available_only)
+    conditional.set_etag(menu_cache, cafe_id)
+    return items
 
 
 @router.post("/cafes/{cafe_id}/menu", response_model=MenuItemResponse, status_code=201)
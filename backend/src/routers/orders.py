@@ -1,12 +1,19 @@
 from datetime import date
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..auth.dependencies import CurrentUser
+from ..auth.dependencies import CurrentUser, ManagerUser
 from ..database import get_db
-from ..schemas.deadline import AvailabilityResponse, WeekAvailabilityResponse
+from ..idempotency import Idempotency
+from ..pagination import NEXT_CURSOR_HEADER, next_cursor
+from ..schemas.deadline import (
+    AvailabilityResponse,
+    BulkAvailabilityResponse,
+    WeekAvailabilityResponse,
+)
 from ..schemas.order import OrderCreate, OrderResponse, OrderUpdate
 from ..services.order import OrderService
 
@@ -17,6 +24,21 @@ def get_order_service(db: Annotated[AsyncSession, Depends(get_db)]) -> OrderServ
     return OrderService(db)
 
 
+def _serialize_order(order) -> dict:
+    return OrderResponse.model_validate(order).model_dump(mode="json")
+
+
+@router.get("/availability", response_model=BulkAvailabilityResponse)
+async def get_bulk_availability(
+    current_user: CurrentUser,
+    service: Annotated[OrderService, Depends(get_order_service)],
+    cafe_ids: list[int] | None = Query(None),
+    days: int = Query(14, ge=1, le=31),
+):
+    """Get availability for all active cafes (or the given ones) for the next N days."""
+    return await service.get_bulk_availability(cafe_ids, days)
+
+
 @router.get("/availability/week", response_model=WeekAvailabilityResponse)
 async def get_week_availability(
     cafe_id: int,
@@ -38,25 +60,58 @@ async def check_availability(
     return await service.check_availability(cafe_id, order_date)
 
 
+@router.get("/export")
+async def export_orders(
+    manager: ManagerUser,
+    service: Annotated[OrderService, Depends(get_order_service)],
+    date_from: date,
+    date_to: date,
+    cafe_id: int | None = None,
+    office: str | None = None,
+    format: str = Query("csv", pattern=r"^(csv|ndjson)$"),
+):
+    """Stream orders for a date range as CSV or NDJSON (manager only)."""
+    chunks = service.export_orders(
+        date_from, date_to, cafe_id=cafe_id, office=office, format=format
+    )
+    media_type = "application/x-ndjson" if format == "ndjson" else "text/csv"
+    filename = f"orders_{date_from}_{date_to}.{format}"
+    return StreamingResponse(
+        chunks,
+        media_type=media_type,
+        headers={"Content-Disposition": f"attachment; filename={filename}"},
+    )
+
+
 @router.get("", response_model=list[OrderResponse])
 async def list_orders(
     current_user: CurrentUser,
     service: Annotated[OrderService, Depends(get_order_service)],
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     cafe_id: int | None = None,
     order_date: date | None = None,
+    cursor: str | None = None,
 ):
-    """List orders (own orders for users, all orders for managers)."""
+    """
+    List orders (own orders for users, all orders for managers).
+
+    Pass the X-Next-Cursor response header back as `cursor` to get the next page.
+    """
     is_manager = current_user.role == "manager"
-    return await service.list_orders(
+    orders = await service.list_orders(
         user_tgid=current_user.tgid,
         is_manager=is_manager,
         skip=skip,
         limit=limit,
         cafe_id=cafe_id,
         order_date=order_date,
+        cursor=cursor,
     )
+    if cursor_value := next_cursor(orders, limit, service.CURSOR_KEYS):
+        response.headers[NEXT_CURSOR_HEADER] = cursor_value
+    return orders
 
 
 @router.post("", response_model=OrderResponse, status_code=201)
@@ -64,9 +119,14 @@ async def create_order(
     data: OrderCreate,
     current_user: CurrentUser,
     service: Annotated[OrderService, Depends(get_order_service)],
+    idempotency: Idempotency,
 ):
-    """Create a new order."""
-    return await service.create_order(current_user.tgid, data)
+    """Create a new order. Retries with the same Idempotency-Key return the first result."""
+    return await idempotency.run(
+        lambda: service.create_order(current_user.tgid, data),
+        status_code=status.HTTP_201_CREATED,
+        serialize=_serialize_order,
+    )
 
 
 @router.get("/{order_id}", response_model=OrderResponse)
@@ -93,13 +153,17 @@ async def update_order(
     data: OrderUpdate,
     current_user: CurrentUser,
     service: Annotated[OrderService, Depends(get_order_service)],
+    idempotency: Idempotency,
 ):
     """Update order (owner before deadline, or manager)."""
-    return await service.update_order(
-        order_id=order_id,
-        user_tgid=current_user.tgid,
-        is_manager=current_user.role == "manager",
-        data=data,
+    return await idempotency.run(
+        lambda: service.update_order(
+            order_id=order_id,
+            user_tgid=current_user.tgid,
+            is_manager=current_user.role == "manager",
+            data=data,
+        ),
+        serialize=_serialize_order,
     )
 
 
@@ -108,10 +172,14 @@ async def delete_order(
     order_id: int,
     current_user: CurrentUser,
     service: Annotated[OrderService, Depends(get_order_service)],
+    idempotency: Idempotency,
 ):
     """Delete order (owner before deadline, or manager)."""
-    await service.delete_order(
-        order_id=order_id,
-        user_tgid=current_user.tgid,
-        is_manager=current_user.role == "manager",
+    return await idempotency.run(
+        lambda: service.delete_order(
+            order_id=order_id,
+            user_tgid=current_user.tgid,
+            is_manager=current_user.role == "manager",
+        ),
+        status_code=status.HTTP_204_NO_CONTENT,
     )
@@ -6,11 +6,12 @@ import structlog
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..auth.dependencies import CurrentUser, get_current_user
+from ..auth.dependencies import CurrentUser, ManagerUser, get_current_user
+from ..cache.batch_run import get_batch_status
 from ..cache.redis_client import get_cache, set_cache
 from ..database import get_db
 from ..gemini import AllKeysExhaustedException, get_recommendation_service
-from ..schemas.recommendations import OrderStats, RecommendationsResponse
+from ..schemas.recommendations import BatchRunStatus, OrderStats, RecommendationsResponse
 from ..services.order_stats import OrderStatsService
 
 logger = structlog.get_logger(__name__)
@@ -24,6 +25,28 @@ def get_order_stats_service(
     return OrderStatsService(db)
 
 
+@router.get("/recommendations/batch", response_model=BatchRunStatus)
+async def get_recommendations_batch_status(manager: ManagerUser) -> BatchRunStatus:
+    """
+    Status of the latest nightly recommendations batch run.
+
+    Auth: manager
+
+    Returns:
+        BatchRunStatus with progress counters and ETA
+
+    Raises:
+        HTTPException: 404 Not Found if no batch run is recorded
+    """
+    status = await get_batch_status()
+    if status is None:
+        raise HTTPException(status_code=404, detail="No recommendations batch run found")
+
+    return BatchRunStatus(
+        **{**status, "started_at": datetime.fromtimestamp(status["started_at"], timezone.utc)}
+    )
+
+
 @router.get("/{tgid}/recommendations", response_model=RecommendationsResponse)
 async def get_user_recommendations(
     tgid: int,
@@ -53,8 +76,8 @@ async def get_user_recommendations(
     # Попытка получить из кэша
     cached = await get_cache(cache_key)
 
-    # Получить текущую статистику (всегда свежие данные)
-    stats = await service.get_user_stats(tgid)
+    # Текущая статистика из проекции (обновляется при каждом изменении заказа)
+    stats = await service.get_projected_stats(tgid)
 
     if cached:
         # Парсим кэшированные рекомендации
@@ -132,7 +155,7 @@ async def generate_user_recommendations(
         raise HTTPException(status_code=403, detail="Access denied")
 
     # Get user statistics for last 30 days
-    stats = await service.get_user_stats(tgid, days=30)
+    stats = await service.get_projected_stats(tgid)
 
     # Validate minimum orders requirement
     if stats["orders_count"] < 5:
@@ -173,6 +196,7 @@ async def generate_user_recommendations(
             tgid=tgid,
             has_summary=bool(result.get("summary")),
             tips_count=len(result.get("tips", [])),
+            **gemini_service.result_cache.stats(),
         )
 
         # Return response
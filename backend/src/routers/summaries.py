@@ -5,6 +5,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..auth.dependencies import ManagerUser
 from ..database import get_db
+from ..pagination import NEXT_CURSOR_HEADER, next_cursor
 from ..schemas.summary import SummaryCreate, SummaryResponse
 from ..services.summary import SummaryService
 
@@ -19,12 +20,19 @@ def get_summary_service(db: Annotated[AsyncSession, Depends(get_db)]) -> Summary
 async def list_summaries(
     manager: ManagerUser,
     service: Annotated[SummaryService, Depends(get_summary_service)],
+    response: Response,
     cafe_id: int | None = None,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
+    cursor: str | None = None,
 ):
-    """List summaries (manager only)."""
-    return await service.list_summaries(cafe_id=cafe_id, skip=skip, limit=limit)
+    """List summaries (manager only). Next page cursor is returned in X-Next-Cursor."""
+    summaries = await service.list_summaries(
+        cafe_id=cafe_id, skip=skip, limit=limit, cursor=cursor
+    )
+    if cursor_value := next_cursor(summaries, limit, service.CURSOR_KEYS):
+        response.headers[NEXT_CURSOR_HEADER] = cursor_value
+    return summaries
 
 
 @router.post("", response_model=SummaryResponse, status_code=201)
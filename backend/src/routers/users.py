@@ -1,10 +1,11 @@
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..auth.dependencies import CurrentUser, ManagerUser
 from ..database import get_db
+from ..pagination import NEXT_CURSOR_HEADER, next_cursor
 from ..schemas.user import (
     BalanceLimitUpdate,
     BalanceResponse,
@@ -26,13 +27,20 @@ def get_user_service(db: Annotated[AsyncSession, Depends(get_db)]) -> UserServic
 async def list_users(
     manager: ManagerUser,
     service: Annotated[UserService, Depends(get_user_service)],
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     search: str | None = None,
     role: str | None = None,
+    cursor: str | None = None,
 ):
-    """List all users (manager only)."""
-    return await service.list_users(skip=skip, limit=limit, search=search, role=role)
+    """List all users (manager only). Next page cursor is returned in X-Next-Cursor."""
+    users = await service.list_users(
+        skip=skip, limit=limit, search=search, role=role, cursor=cursor
+    )
+    if cursor_value := next_cursor(users, limit, service.CURSOR_KEYS):
+        response.headers[NEXT_CURSOR_HEADER] = cursor_value
+    return users
 
 
 @router.post("", response_model=UserResponse, status_code=201)
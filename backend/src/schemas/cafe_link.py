@@ -30,9 +30,10 @@ class LinkRequestListSchema(BaseModel):
     """Schema for paginated list of link requests."""
 
     items: list[LinkRequestSchema]
-    total: int
+    total: int | None
     skip: int
     limit: int
+    next_cursor: str | None = None
 
 
 class UpdateNotificationsSchema(BaseModel):
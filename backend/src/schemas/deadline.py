@@ -31,3 +31,14 @@ class AvailabilityResponse(BaseModel):
 class WeekAvailabilityResponse(BaseModel):
     cafe_id: int
     availability: list[AvailabilityResponse]
+
+
+class CafeAvailability(BaseModel):
+    cafe_id: int
+    availability: list[AvailabilityResponse]
+
+
+class BulkAvailabilityResponse(BaseModel):
+    start_date: date
+    days: int
+    cafes: list[CafeAvailability]
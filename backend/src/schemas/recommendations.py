@@ -19,3 +19,17 @@ class RecommendationsResponse(BaseModel):
     tips: list[str]
     stats: OrderStats
     generated_at: datetime | None
+
+
+class BatchRunStatus(BaseModel):
+    """Статус последнего запуска ночной генерации рекомендаций."""
+
+    run_id: str
+    status: str  # running | stopped | completed
+    started_at: datetime
+    total: int
+    done: int
+    failed: int
+    remaining: int
+    cursor: int | None  # tgid последнего взятого в работу пользователя
+    eta_seconds: int | None
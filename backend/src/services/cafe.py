@@ -1,14 +1,24 @@
 from fastapi import HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from ..cache.local_cache import availability_cache, cafes_cache
+from ..database import after_commit
 from ..repositories.cafe import CafeRepository
 from ..schemas.cafe import CafeCreate, CafeUpdate
 
 
 class CafeService:
     def __init__(self, session: AsyncSession):
+        self.session = session
         self.repo = CafeRepository(session)
 
+    def _invalidate_availability(self) -> None:
+        # The bulk availability matrix lists active cafes only
+        after_commit(self.session, lambda: availability_cache.invalidate(0))
+
+    def _invalidate_cafes(self) -> None:
+        after_commit(self.session, lambda: cafes_cache.invalidate(0))
+
     async def list_cafes(
         self,
         skip: int = 0,
@@ -27,6 +37,8 @@ class CafeService:
         return cafe
 
     async def create_cafe(self, data: CafeCreate):
+        self._invalidate_cafes()
+        self._invalidate_availability()
         return await self.repo.create(
             name=data.name,
             description=data.description,
@@ -35,12 +47,17 @@ class CafeService:
     async def update_cafe(self, cafe_id: int, data: CafeUpdate):
         cafe = await self.get_cafe(cafe_id)
         update_data = data.model_dump(exclude_unset=True)
+        self._invalidate_cafes()
         return await self.repo.update(cafe, **update_data)
 
     async def delete_cafe(self, cafe_id: int):
         cafe = await self.get_cafe(cafe_id)
+        self._invalidate_cafes()
+        self._invalidate_availability()
         await self.repo.delete(cafe)
 
     async def update_status(self, cafe_id: int, is_active: bool):
         cafe = await self.get_cafe(cafe_id)
+        self._invalidate_cafes()
+        self._invalidate_availability()
         return await self.repo.update(cafe, is_active=is_active)
@@ -4,11 +4,15 @@ from fastapi import HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..models.cafe import LinkRequestStatus
+from ..pagination import decode_cursor, next_cursor
 from ..repositories.cafe_link import CafeLinkRepository
 from ..schemas.cafe_link import CreateLinkRequestSchema
 
 
 class CafeLinkService:
+    # Sort key of link request listings, encoded into pagination cursors
+    CURSOR_KEYS = ("created_at", "id")
+
     def __init__(self, session: AsyncSession):
         self.repo = CafeLinkRepository(session)
 
@@ -49,14 +53,29 @@ class CafeLinkService:
         skip: int = 0,
         limit: int = 100,
         status: str | None = None,
+        cursor: str | None = None,
+        include_total: bool = True,
     ):
-        """List link requests with pagination."""
-        items, total = await self.repo.list_requests(skip=skip, limit=limit, status=status)
+        """
+        List link requests with pagination.
+
+        Total is counted only for the first page (no cursor) when requested;
+        cursor pages return total=None.
+        """
+        after = decode_cursor(cursor, len(self.CURSOR_KEYS)) if cursor else None
+        items, total = await self.repo.list_requests(
+            skip=skip,
+            limit=limit,
+            status=status,
+            after=after,
+            with_total=include_total and after is None,
+        )
         return {
             "items": items,
             "total": total,
             "skip": skip,
             "limit": limit,
+            "next_cursor": next_cursor(items, limit, self.CURSOR_KEYS),
         }
 
     async def get_request(self, request_id: int):
@@ -3,9 +3,14 @@ from datetime import date, datetime, time, timedelta, timezone
 from fastapi import HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from ..cache.local_cache import availability_cache, availability_matrices, deadline_cache
+from ..database import after_commit
+from ..models import Deadline
 from ..repositories.deadline import DeadlineRepository
 from ..schemas.deadline import (
     AvailabilityResponse,
+    BulkAvailabilityResponse,
+    CafeAvailability,
     DeadlineItem,
     DeadlineSchedule,
     DeadlineScheduleUpdate,
@@ -13,40 +18,36 @@ from ..schemas.deadline import (
 )
 
 
-class DeadlineService:
-    def __init__(self, session: AsyncSession):
-        self.repo = DeadlineRepository(session)
+class DeadlineSlot:
+    """Parsed deadline for one weekday."""
 
-    async def get_schedule(self, cafe_id: int) -> DeadlineSchedule:
-        deadlines = await self.repo.get_for_cafe(cafe_id)
-        return DeadlineSchedule(
-            cafe_id=cafe_id,
-            schedule=[
-                DeadlineItem(
-                    weekday=d.weekday,
-                    deadline_time=d.deadline_time,
-                    is_enabled=d.is_enabled,
-                    advance_days=d.advance_days,
-                )
-                for d in deadlines
-            ],
-        )
+    def __init__(self, deadline_time: time, is_enabled: bool, advance_days: int):
+        self.deadline_time = deadline_time
+        self.is_enabled = is_enabled
+        self.advance_days = advance_days
 
-    async def update_schedule(
-        self, cafe_id: int, data: DeadlineScheduleUpdate
-    ) -> DeadlineSchedule:
-        # Delete existing deadlines
-        await self.repo.delete_for_cafe(cafe_id)
 
-        # Create new deadlines
-        items = [item.model_dump() for item in data.schedule]
-        await self.repo.bulk_create(cafe_id, items)
+class CompiledSchedule:
+    """
+    Deadline schedule of a cafe compiled into a 7-slot array (Monday-Sunday).
 
-        return await self.get_schedule(cafe_id)
+    Deadline times are parsed once at compile time, so availability for any
+    date or date range is answered in memory.
+    """
 
-    async def check_availability(
-        self, cafe_id: int, order_date: date
-    ) -> AvailabilityResponse:
+    def __init__(self, cafe_id: int, slots: list[DeadlineSlot | None]):
+        self.cafe_id = cafe_id
+        self.slots = slots
+
+    @classmethod
+    def compile(cls, cafe_id: int, deadlines: list[Deadline]) -> "CompiledSchedule":
+        slots: list[DeadlineSlot | None] = [None] * 7
+        for d in deadlines:
+            hour, minute = map(int, d.deadline_time.split(":"))
+            slots[d.weekday] = DeadlineSlot(time(hour, minute), d.is_enabled, d.advance_days)
+        return cls(cafe_id, slots)
+
+    def check(self, order_date: date, now: datetime | None = None) -> AvailabilityResponse:
         """
         Check if ordering is available for a specific date.
 
@@ -56,36 +57,32 @@ class DeadlineService:
         3. Calculate actual deadline datetime considering advance_days
         4. Compare with current time
         """
-        weekday = order_date.weekday()
-        deadline = await self.repo.get_for_weekday(cafe_id, weekday)
+        slot = self.slots[order_date.weekday()]
 
-        if not deadline:
+        if slot is None:
             return AvailabilityResponse(
                 date=order_date,
                 can_order=False,
                 reason="No delivery on this day",
             )
 
-        if not deadline.is_enabled:
+        if not slot.is_enabled:
             return AvailabilityResponse(
                 date=order_date,
                 can_order=False,
                 reason="Ordering disabled for this day",
             )
 
-        # Parse deadline time (stored without timezone) and evaluate in server local tz
-        hour, minute = map(int, deadline.deadline_time.split(":"))
-        deadline_time = time(hour, minute)
-
         # Use server local timezone to avoid premature cut-offs when server runs not in UTC
         local_tz = datetime.now().astimezone().tzinfo or timezone.utc
 
         # Calculate deadline datetime
         # If advance_days > 0, deadline is advance_days before order_date
-        deadline_date = order_date - timedelta(days=deadline.advance_days)
-        deadline_dt = datetime.combine(deadline_date, deadline_time, tzinfo=local_tz)
+        deadline_date = order_date - timedelta(days=slot.advance_days)
+        deadline_dt = datetime.combine(deadline_date, slot.deadline_time, tzinfo=local_tz)
 
-        now = datetime.now(local_tz)
+        if now is None:
+            now = datetime.now(local_tz)
 
         if now > deadline_dt:
             return AvailabilityResponse(
@@ -101,20 +98,153 @@ class DeadlineService:
             deadline=deadline_dt,
         )
 
+    def check_range(
+        self, start: date, days: int, now: datetime | None = None
+    ) -> list[AvailabilityResponse]:
+        """Availability for `days` consecutive dates starting at `start`."""
+        if now is None:
+            now = datetime.now().astimezone()
+        return [self.check(start + timedelta(days=i), now) for i in range(days)]
+
+    def next_cutoff(self, after: datetime) -> tuple[datetime, list[date]] | None:
+        """
+        Earliest deadline strictly after `after`, with the order dates it closes.
+
+        Takes advance_days into account: the cutoff for order_date is
+        deadline_time on (order_date - advance_days), so one cutoff may close
+        several order dates. Returns None when no weekday is enabled.
+        """
+        enabled = [slot for slot in self.slots if slot is not None and slot.is_enabled]
+        if not enabled:
+            return None
+
+        tz = after.tzinfo or datetime.now().astimezone().tzinfo
+        max_advance = max(slot.advance_days for slot in enabled)
+        best: datetime | None = None
+        order_dates: list[date] = []
+        # Every weekday recurs within 7 days, so this window always contains the next cutoff
+        for offset in range(max_advance + 8):
+            order_date = after.date() + timedelta(days=offset)
+            slot = self.slots[order_date.weekday()]
+            if slot is None or not slot.is_enabled:
+                continue
+            cutoff = datetime.combine(
+                order_date - timedelta(days=slot.advance_days), slot.deadline_time, tzinfo=tz
+            )
+            if cutoff <= after:
+                continue
+            if best is None or cutoff < best:
+                best = cutoff
+                order_dates = [order_date]
+            elif cutoff == best:
+                order_dates.append(order_date)
+
+        if best is None:
+            return None
+        return best, order_dates
+
+
+class DeadlineService:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self.repo = DeadlineRepository(session)
+
+    async def get_compiled_schedule(self, cafe_id: int) -> CompiledSchedule:
+        """Compiled schedule from the process-local cache, loaded on miss."""
+        return await deadline_cache.get(cafe_id, lambda: self._compile_schedule(cafe_id))
+
+    async def _compile_schedule(self, cafe_id: int) -> CompiledSchedule:
+        deadlines = await self.repo.get_for_cafe(cafe_id)
+        return CompiledSchedule.compile(cafe_id, deadlines)
+
+    async def get_schedule(self, cafe_id: int) -> DeadlineSchedule:
+        deadlines = await self.repo.get_for_cafe(cafe_id)
+        return DeadlineSchedule(
+            cafe_id=cafe_id,
+            schedule=[
+                DeadlineItem(
+                    weekday=d.weekday,
+                    deadline_time=d.deadline_time,
+                    is_enabled=d.is_enabled,
+                    advance_days=d.advance_days,
+                )
+                for d in deadlines
+            ],
+        )
+
+    async def update_schedule(
+        self, cafe_id: int, data: DeadlineScheduleUpdate
+    ) -> DeadlineSchedule:
+        # Delete existing deadlines
+        await self.repo.delete_for_cafe(cafe_id)
+
+        # Create new deadlines
+        items = [item.model_dump() for item in data.schedule]
+        await self.repo.bulk_create(cafe_id, items)
+        after_commit(self.session, lambda: deadline_cache.invalidate(cafe_id))
+        after_commit(self.session, lambda: availability_cache.invalidate(0))
+
+        return await self.get_schedule(cafe_id)
+
+    async def check_availability(
+        self, cafe_id: int, order_date: date
+    ) -> AvailabilityResponse:
+        schedule = await self.get_compiled_schedule(cafe_id)
+        return schedule.check(order_date)
+
     async def get_week_availability(self, cafe_id: int) -> WeekAvailabilityResponse:
         """Get availability for the next 7 days."""
+        schedule = await self.get_compiled_schedule(cafe_id)
+        return WeekAvailabilityResponse(
+            cafe_id=cafe_id,
+            availability=schedule.check_range(date.today(), 7),
+        )
+
+    async def get_bulk_availability(
+        self, cafe_ids: list[int] | None = None, days: int = 14
+    ) -> BulkAvailabilityResponse:
+        """
+        Availability matrix for all active cafes (or a subset) over `days` days.
+
+        Computed from a single deadline query and cached in process until the
+        earliest upcoming deadline in the matrix (or local midnight), after
+        which at least one cell may change. Schedule and cafe changes
+        invalidate the cache across processes.
+        """
         today = date.today()
-        availability = []
+        now = datetime.now().astimezone()
+        key = (tuple(sorted(set(cafe_ids))) if cafe_ids else None, days, today)
+        return await availability_matrices.get(
+            key, lambda: self._compute_bulk_availability(cafe_ids, days, today, now), now
+        )
 
-        for i in range(7):
-            day = today + timedelta(days=i)
-            avail = await self.check_availability(cafe_id, day)
-            availability.append(avail)
+    async def _compute_bulk_availability(
+        self, cafe_ids: list[int] | None, days: int, today: date, now: datetime
+    ) -> tuple[BulkAvailabilityResponse, datetime]:
+        """Availability matrix and the time until which it is valid."""
+        deadlines_by_cafe = await self.repo.get_for_active_cafes(cafe_ids)
+        cafes = [
+            CafeAvailability(
+                cafe_id=cafe_id,
+                availability=CompiledSchedule.compile(cafe_id, deadlines).check_range(
+                    today, days, now
+                ),
+            )
+            for cafe_id, deadlines in deadlines_by_cafe.items()
+        ]
+        response = BulkAvailabilityResponse(start_date=today, days=days, cafes=cafes)
 
-        return WeekAvailabilityResponse(
-            cafe_id=cafe_id,
-            availability=availability,
+        next_midnight = datetime.combine(today + timedelta(days=1), time(), tzinfo=now.tzinfo)
+        expires_at = min(
+            (
+                a.deadline
+                for cafe in cafes
+                for a in cafe.availability
+                if a.can_order and a.deadline is not None
+            ),
+            default=next_midnight,
         )
+        return response, min(expires_at, next_midnight)
 
     async def validate_order_deadline(self, cafe_id: int, order_date: date) -> None:
         """
@@ -3,18 +3,69 @@ from decimal import Decimal
 from fastapi import HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from ..cache.local_cache import menu_cache
+from ..database import after_commit
+from ..models import Combo, MenuItem
 from ..repositories.menu import ComboRepository, MenuItemRepository, MenuItemOptionRepository
-from ..schemas.menu import ComboCreate, ComboUpdate, MenuItemCreate, MenuItemUpdate, MenuItemOptionCreate, MenuItemOptionUpdate
+from ..schemas.menu import (
+    ComboCreate, ComboResponse, ComboUpdate,
+    MenuItemCreate, MenuItemResponse, MenuItemUpdate,
+    MenuItemOptionCreate, MenuItemOptionUpdate,
+)
+
+
+class CafeMenu:
+    """Full menu of a cafe (including unavailable entries) as held by the menu cache."""
+
+    def __init__(self, combos: list[ComboResponse], items: list[MenuItemResponse]):
+        self.combos = combos
+        self.items = items
+        self.combos_by_id = {combo.id: combo for combo in combos}
+        self.items_by_id = {item.id: item for item in items}
+
+
+class MenuSnapshot:
+    """Menu rows referenced by a single order, loaded once per request."""
+
+    def __init__(
+        self,
+        combo: Combo | ComboResponse | None,
+        menu_items: dict[int, MenuItem | MenuItemResponse],
+    ):
+        self.combo = combo
+        self.menu_items = menu_items
+
+    def get_combo(self, combo_id: int) -> Combo | ComboResponse:
+        if self.combo is None or self.combo.id != combo_id:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Combo not found")
+        return self.combo
 
 
 class MenuService:
     def __init__(self, session: AsyncSession):
+        self.session = session
         self.combo_repo = ComboRepository(session)
         self.item_repo = MenuItemRepository(session)
         self.option_repo = MenuItemOptionRepository(session)
 
+    async def get_cafe_menu(self, cafe_id: int) -> CafeMenu:
+        """Cafe menu from the process-local cache, loaded from the database on miss."""
+        return await menu_cache.get(cafe_id, lambda: self._load_cafe_menu(cafe_id))
+
+    async def _load_cafe_menu(self, cafe_id: int) -> CafeMenu:
+        combos = await self.combo_repo.list_by_cafe(cafe_id)
+        items = await self.item_repo.list_by_cafe(cafe_id)
+        return CafeMenu(
+            combos=[ComboResponse.model_validate(combo) for combo in combos],
+            items=[MenuItemResponse.model_validate(item) for item in items],
+        )
+
+    def _invalidate_menu(self, cafe_id: int) -> None:
+        after_commit(self.session, lambda: menu_cache.invalidate(cafe_id))
+
     async def list_combos(self, cafe_id: int, available_only: bool = False):
-        return await self.combo_repo.list_by_cafe(cafe_id, available_only=available_only)
+        menu = await self.get_cafe_menu(cafe_id)
+        return [combo for combo in menu.combos if combo.is_available or not available_only]
 
     async def get_combo(self, combo_id: int):
         combo = await self.combo_repo.get(combo_id)
@@ -23,6 +74,7 @@ class MenuService:
         return combo
 
     async def create_combo(self, cafe_id: int, data: ComboCreate):
+        self._invalidate_menu(cafe_id)
         return await self.combo_repo.create(
             cafe_id=cafe_id, name=data.name, categories=data.categories, price=data.price
         )
@@ -31,16 +83,23 @@ class MenuService:
         combo = await self.get_combo(combo_id)
         if combo.cafe_id != cafe_id:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Combo not found in this cafe")
+        self._invalidate_menu(cafe_id)
         return await self.combo_repo.update(combo, **data.model_dump(exclude_unset=True))
 
     async def delete_combo(self, cafe_id: int, combo_id: int):
         combo = await self.get_combo(combo_id)
         if combo.cafe_id != cafe_id:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Combo not found in this cafe")
+        self._invalidate_menu(cafe_id)
         await self.combo_repo.delete(combo)
 
     async def list_menu_items(self, cafe_id: int, category: str | None = None, available_only: bool = False):
-        return await self.item_repo.list_by_cafe(cafe_id, category=category, available_only=available_only)
+        menu = await self.get_cafe_menu(cafe_id)
+        return [
+            item for item in menu.items
+            if (not category or item.category == category)
+            and (item.is_available or not available_only)
+        ]
 
     async def get_menu_item(self, item_id: int):
         item = await self.item_repo.get(item_id)
@@ -49,6 +108,7 @@ class MenuService:
         return item
 
     async def create_menu_item(self, cafe_id: int, data: MenuItemCreate):
+        self._invalidate_menu(cafe_id)
         return await self.item_repo.create(
             cafe_id=cafe_id, name=data.name, description=data.description,
             category=data.category, price=data.price
@@ -58,23 +118,65 @@ class MenuService:
         item = await self.get_menu_item(item_id)
         if item.cafe_id != cafe_id:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Menu item not found in this cafe")
+        self._invalidate_menu(cafe_id)
         return await self.item_repo.update(item, **data.model_dump(exclude_unset=True))
 
     async def delete_menu_item(self, cafe_id: int, item_id: int):
         item = await self.get_menu_item(item_id)
         if item.cafe_id != cafe_id:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Menu item not found in this cafe")
+        self._invalidate_menu(cafe_id)
         await self.item_repo.delete(item)
 
-    async def validate_combo_items(self, combo_id: int, combo_items: list[dict]) -> bool:
-        combo = await self.get_combo(combo_id)
+    async def load_snapshot(
+        self,
+        combo_id: int | None = None,
+        items: list[dict] | None = None,
+        extras: list[dict] | None = None,
+        cafe_id: int | None = None,
+    ) -> MenuSnapshot:
+        """
+        Load everything an order references in a fixed number of queries.
+
+        When cafe_id is given, rows are taken from the cached cafe menu first.
+        Anything not found there is fetched from the database: the combo by
+        primary key and the remaining menu items (with options) in one batched
+        query. Validation and pricing then run in memory regardless of order size.
+        """
+        item_ids = {item["menu_item_id"] for item in (items or []) if item.get("menu_item_id")}
+        item_ids |= {extra["menu_item_id"] for extra in (extras or [])}
+
+        combo = None
+        menu_items: dict[int, MenuItem | MenuItemResponse] = {}
+        if cafe_id is not None:
+            menu = await self.get_cafe_menu(cafe_id)
+            combo = menu.combos_by_id.get(combo_id) if combo_id else None
+            menu_items = {
+                item_id: menu.items_by_id[item_id]
+                for item_id in item_ids
+                if item_id in menu.items_by_id
+            }
+
+        if combo_id and combo is None:
+            combo = await self.combo_repo.get(combo_id)
+        missing_ids = item_ids - menu_items.keys()
+        if missing_ids:
+            menu_items.update(await self.item_repo.get_many(missing_ids))
+        return MenuSnapshot(combo=combo, menu_items=menu_items)
+
+    async def validate_combo_items(
+        self, combo_id: int, combo_items: list[dict], snapshot: MenuSnapshot | None = None
+    ) -> bool:
+        if snapshot is None:
+            snapshot = await self.load_snapshot(combo_id=combo_id, items=combo_items)
+        combo = snapshot.get_combo(combo_id)
         required = set(combo.categories)
         provided = {item["category"] for item in combo_items}
         if required != provided:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Combo requires categories: {combo.categories}")
         for item in combo_items:
-            menu_item = await self.item_repo.get(item["menu_item_id"])
+            menu_item = snapshot.menu_items.get(item["menu_item_id"])
             if not menu_item:
                 raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                     detail=f"Menu item {item['menu_item_id']} not found")
@@ -83,10 +185,14 @@ class MenuService:
                     detail=f"Item {item['menu_item_id']} is not in category {item['category']}")
         return True
 
-    async def calculate_extras_price(self, extras: list[dict]) -> Decimal:
+    async def calculate_extras_price(
+        self, extras: list[dict], snapshot: MenuSnapshot | None = None
+    ) -> Decimal:
+        if snapshot is None:
+            snapshot = await self.load_snapshot(extras=extras)
         total = Decimal("0")
         for extra in extras:
-            item = await self.item_repo.get(extra["menu_item_id"])
+            item = snapshot.menu_items.get(extra["menu_item_id"])
             if not item:
                 raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                     detail=f"Extra {extra['menu_item_id']} not found")
@@ -115,6 +221,7 @@ class MenuService:
         item = await self.get_menu_item(item_id)
         if item.cafe_id != cafe_id:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Menu item not found in this cafe")
+        self._invalidate_menu(cafe_id)
         return await self.option_repo.create(
             menu_item_id=item.id,
             name=data.name,
@@ -131,6 +238,7 @@ class MenuService:
         option = await self.get_menu_item_option(option_id)
         if option.menu_item_id != item_id:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Option not found for this menu item")
+        self._invalidate_menu(cafe_id)
         return await self.option_repo.update(option, **data.model_dump(exclude_unset=True))
 
     async def delete_menu_item_option(self, cafe_id: int, item_id: int, option_id: int):
@@ -141,22 +249,28 @@ class MenuService:
         option = await self.get_menu_item_option(option_id)
         if option.menu_item_id != item_id:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Option not found for this menu item")
+        self._invalidate_menu(cafe_id)
         await self.option_repo.delete(option)
 
     # Standalone items validation
-    async def validate_standalone_items(self, items: list[dict]) -> None:
+    async def validate_standalone_items(
+        self, items: list[dict], snapshot: MenuSnapshot | None = None
+    ) -> None:
         """
         Валидация standalone items:
         - Проверить что у каждого menu_item есть price
         - Проверить обязательные опции (is_required=True)
         - Проверить корректность значений опций
         """
+        if snapshot is None:
+            snapshot = await self.load_snapshot(items=items)
+
         for item in items:
             if item.get("type") != "standalone":
                 continue
 
             menu_item_id = item.get("menu_item_id")
-            menu_item = await self.item_repo.get(menu_item_id)
+            menu_item = snapshot.menu_items.get(menu_item_id)
 
             if not menu_item:
                 raise HTTPException(
@@ -176,8 +290,8 @@ class MenuService:
                     detail=f"Menu item '{menu_item.name}' is not available"
                 )
 
-            # Валидация опций
-            options = await self.option_repo.list_by_menu_item(menu_item_id)
+            # Валидация опций (уже загружены через selectinload)
+            options = menu_item.options
             selected_options = item.get("options", {})
 
             for option in options:
@@ -197,8 +311,13 @@ class MenuService:
                             detail=f"Invalid value '{selected_value}' for option '{option.name}'"
                         )
 
-    async def calculate_standalone_price(self, items: list[dict]) -> Decimal:
+    async def calculate_standalone_price(
+        self, items: list[dict], snapshot: MenuSnapshot | None = None
+    ) -> Decimal:
         """Сумма: menu_item.price * quantity для каждого standalone item"""
+        if snapshot is None:
+            snapshot = await self.load_snapshot(items=items)
+
         total = Decimal("0")
         for item in items:
             if item.get("type") != "standalone":
@@ -207,7 +326,7 @@ class MenuService:
             menu_item_id = item.get("menu_item_id")
             quantity = item.get("quantity", 1)
 
-            menu_item = await self.item_repo.get(menu_item_id)
+            menu_item = snapshot.menu_items.get(menu_item_id)
             if menu_item and menu_item.price:
                 total += menu_item.price * quantity
 
@@ -1,18 +1,65 @@
-from datetime import date
+import csv
+import io
+import json
+from collections.abc import AsyncIterator
+from datetime import date, datetime
 from decimal import Decimal
 
 from fastapi import HTTPException, status
+from redis.exceptions import RedisError
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from ..cache.spend_counter import adjust_spent
+from ..database import on_rollback
+from ..pagination import decode_cursor
 from ..repositories.order import OrderRepository
+from ..repositories.order_rollup import OrderRollupRepository
+from ..repositories.user import UserRepository
+from ..repositories.user_stats import UserStatsRepository, local_day
 from ..schemas.order import OrderCreate, OrderUpdate
 from .deadline import DeadlineService
-from .menu import MenuService
+from .menu import MenuService, MenuSnapshot
+
+
+EXPORT_COLUMNS = (
+    "id",
+    "order_date",
+    "cafe_id",
+    "cafe_name",
+    "user_tgid",
+    "user_name",
+    "office",
+    "status",
+    "combo_id",
+    "items",
+    "extras",
+    "notes",
+    "total_price",
+    "created_at",
+)
+
+# Longest range a single export may cover
+MAX_EXPORT_DAYS = 366
+
+
+def _export_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
 
 
 class OrderService:
+    # Sort key of order listings, encoded into pagination cursors
+    CURSOR_KEYS = ("order_date", "id")
+
     def __init__(self, session: AsyncSession):
+        self.session = session
         self.repo = OrderRepository(session)
+        self.user_repo = UserRepository(session)
+        self.rollup_repo = OrderRollupRepository(session)
+        self.stats_repo = UserStatsRepository(session)
         self.deadline_service = DeadlineService(session)
         self.menu_service = MenuService(session)
 
@@ -24,13 +71,15 @@ class OrderService:
         limit: int = 100,
         cafe_id: int | None = None,
         order_date: date | None = None,
+        cursor: str | None = None,
     ):
+        after = decode_cursor(cursor, len(self.CURSOR_KEYS)) if cursor else None
         if is_manager:
             return await self.repo.list_all(
-                skip=skip, limit=limit, cafe_id=cafe_id, order_date=order_date
+                skip=skip, limit=limit, cafe_id=cafe_id, order_date=order_date, after=after
             )
         else:
-            return await self.repo.list_by_user(user_tgid, skip=skip, limit=limit)
+            return await self.repo.list_by_user(user_tgid, skip=skip, limit=limit, after=after)
 
     async def get_order(self, order_id: int):
         order = await self.repo.get(order_id)
@@ -48,6 +97,11 @@ class OrderService:
         items_dict = [item.model_dump() for item in data.items]
         extras_dict = [extra.model_dump() for extra in data.extras]
 
+        # Load combo, items and options once; validation and pricing run in memory
+        snapshot = await self.menu_service.load_snapshot(
+            combo_id=data.combo_id, items=items_dict, extras=extras_dict, cafe_id=data.cafe_id
+        )
+
         # 2. Validate items based on combo_id
         if data.combo_id:
             # Combo order - validate combo items
@@ -57,12 +111,12 @@ class OrderService:
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail="Combo order requires at least one combo item"
                 )
-            await self.menu_service.validate_combo_items(data.combo_id, combo_items)
+            await self.menu_service.validate_combo_items(data.combo_id, combo_items, snapshot)
 
             # Also validate any standalone items
             standalone_items = [item for item in items_dict if item.get("type") == "standalone"]
             if standalone_items:
-                await self.menu_service.validate_standalone_items(standalone_items)
+                await self.menu_service.validate_standalone_items(standalone_items, snapshot)
         else:
             # Standalone order - all items must be standalone
             for item in items_dict:
@@ -71,22 +125,18 @@ class OrderService:
                         status_code=status.HTTP_400_BAD_REQUEST,
                         detail="Combo items require combo_id to be set"
                     )
-            await self.menu_service.validate_standalone_items(items_dict)
+            await self.menu_service.validate_standalone_items(items_dict, snapshot)
 
         # 3. Calculate total price
-        combo_price = Decimal("0")
-        if data.combo_id:
-            combo = await self.menu_service.get_combo(data.combo_id)
-            combo_price = combo.price
-
-        standalone_items = [item for item in items_dict if item.get("type") == "standalone"]
-        standalone_price = await self.menu_service.calculate_standalone_price(standalone_items)
+        total_price = await self._calculate_total_price(
+            snapshot, data.combo_id, items_dict, extras_dict
+        )
 
-        extras_price = await self.menu_service.calculate_extras_price(extras_dict)
-        total_price = combo_price + standalone_price + extras_price
+        # 4. Reserve weekly budget (atomic limit check)
+        await self._charge_weekly_spend(user_tgid, data.order_date, total_price, enforce_limit=True)
 
-        # 4. Create order
-        return await self.repo.create(
+        # 5. Create order
+        order = await self.repo.create(
             user_tgid=user_tgid,
             cafe_id=data.cafe_id,
             order_date=data.order_date,
@@ -96,6 +146,9 @@ class OrderService:
             notes=data.notes,
             total_price=total_price,
         )
+        await self.rollup_repo.add(order)
+        await self.stats_repo.add(order, date.today())
+        return order
 
     async def update_order(
         self,
@@ -120,6 +173,20 @@ class OrderService:
             )
 
         update_data = {}
+        snapshot = None
+
+        if data.combo_id is not None or data.items is not None or data.extras is not None:
+            # Load everything the updated order will reference in one pass
+            snapshot = await self.menu_service.load_snapshot(
+                combo_id=data.combo_id if data.combo_id is not None else order.combo_id,
+                items=[item.model_dump() for item in data.items]
+                if data.items is not None
+                else order.items,
+                extras=[extra.model_dump() for extra in data.extras]
+                if data.extras is not None
+                else order.extras,
+                cafe_id=order.cafe_id,
+            )
 
         # Update combo if changed
         if data.combo_id is not None:
@@ -134,12 +201,12 @@ class OrderService:
             if combo_id:
                 # Combo order - validate combo items
                 combo_items = [item for item in items_dict if item.get("type") == "combo"]
-                await self.menu_service.validate_combo_items(combo_id, combo_items)
+                await self.menu_service.validate_combo_items(combo_id, combo_items, snapshot)
 
                 # Also validate any standalone items
                 standalone_items = [item for item in items_dict if item.get("type") == "standalone"]
                 if standalone_items:
-                    await self.menu_service.validate_standalone_items(standalone_items)
+                    await self.menu_service.validate_standalone_items(standalone_items, snapshot)
             else:
                 # Standalone order - all items must be standalone
                 for item in items_dict:
@@ -148,7 +215,7 @@ class OrderService:
                             status_code=status.HTTP_400_BAD_REQUEST,
                             detail="Combo items require combo_id to be set"
                         )
-                await self.menu_service.validate_standalone_items(items_dict)
+                await self.menu_service.validate_standalone_items(items_dict, snapshot)
 
             update_data["items"] = items_dict
 
@@ -167,22 +234,27 @@ class OrderService:
             items = update_data.get("items", order.items)
             extras = update_data.get("extras", order.extras)
 
-            # Calculate combo price
-            combo_price = Decimal("0")
-            if combo_id:
-                combo = await self.menu_service.get_combo(combo_id)
-                combo_price = combo.price
-
-            # Calculate standalone price
-            standalone_items = [item for item in items if item.get("type") == "standalone"]
-            standalone_price = await self.menu_service.calculate_standalone_price(standalone_items)
-
-            # Calculate extras price
-            extras_price = await self.menu_service.calculate_extras_price(extras)
+            update_data["total_price"] = await self._calculate_total_price(
+                snapshot, combo_id, items, extras
+            )
 
-            update_data["total_price"] = combo_price + standalone_price + extras_price
+        if "total_price" not in update_data:
+            # Notes only - rollups are unaffected
+            return await self.repo.update(order, **update_data)
 
-        return await self.repo.update(order, **update_data)
+        await self._charge_weekly_spend(
+            order.user_tgid,
+            order.order_date,
+            update_data["total_price"] - order.total_price,
+            enforce_limit=not is_manager,
+        )
+        created_day = local_day(order.created_at)
+        await self.rollup_repo.remove(order)
+        await self.stats_repo.remove(order, created_day)
+        order = await self.repo.update(order, **update_data)
+        await self.rollup_repo.add(order)
+        await self.stats_repo.add(order, created_day)
+        return order
 
     async def delete_order(
         self,
@@ -205,10 +277,144 @@ class OrderService:
                 order.cafe_id, order.order_date
             )
 
+        await self._charge_weekly_spend(order.user_tgid, order.order_date, -order.total_price)
+        await self.rollup_repo.remove(order)
+        await self.stats_repo.remove(order, local_day(order.created_at))
         await self.repo.delete(order)
 
+    def export_orders(
+        self,
+        date_from: date,
+        date_to: date,
+        cafe_id: int | None = None,
+        office: str | None = None,
+        format: str = "csv",
+    ) -> AsyncIterator[str]:
+        """
+        Validate export parameters and return a stream of CSV or NDJSON chunks.
+
+        Rows are read in batches from a server-side cursor, one chunk per batch.
+        """
+        if date_from > date_to:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="date_from must not be after date_to",
+            )
+        if (date_to - date_from).days >= MAX_EXPORT_DAYS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Export range must not exceed {MAX_EXPORT_DAYS} days",
+            )
+
+        batches = self.repo.stream_for_export(date_from, date_to, cafe_id=cafe_id, office=office)
+        if format == "ndjson":
+            return self._export_ndjson(batches)
+        return self._export_csv(batches)
+
+    @staticmethod
+    async def _export_csv(batches) -> AsyncIterator[str]:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_COLUMNS)
+        yield buffer.getvalue()
+
+        async for batch in batches:
+            buffer.seek(0)
+            buffer.truncate()
+            for row in batch:
+                writer.writerow([
+                    json.dumps(value, ensure_ascii=False)
+                    if isinstance(value, list)
+                    else _export_value(value)
+                    for value in row
+                ])
+            yield buffer.getvalue()
+
+    @staticmethod
+    async def _export_ndjson(batches) -> AsyncIterator[str]:
+        async for batch in batches:
+            yield "".join(
+                json.dumps(
+                    {key: _export_value(value) for key, value in zip(EXPORT_COLUMNS, row)},
+                    ensure_ascii=False,
+                ) + "\n"
+                for row in batch
+            )
+
+    async def _charge_weekly_spend(
+        self,
+        user_tgid: int,
+        order_date: date,
+        delta: Decimal,
+        enforce_limit: bool = False,
+    ) -> None:
+        """
+        Apply an order's price change to the user's weekly spend counter.
+
+        With enforce_limit, an increase that would exceed the user's weekly
+        limit is rejected. The change is reverted if the transaction rolls back.
+        """
+        if not delta:
+            return
+
+        limit = None
+        if enforce_limit and delta > 0:
+            user = await self.user_repo.get_by_tgid(user_tgid)
+            limit = user.weekly_limit if user else None
+
+        async def load_spent() -> Decimal:
+            return await self.user_repo.get_spent_for_week(user_tgid, order_date)
+
+        try:
+            applied, spent = await adjust_spent(user_tgid, order_date, delta, limit, load_spent)
+        except RedisError:
+            # Counter unavailable: check against Postgres instead (not atomic)
+            if limit is None:
+                return
+            spent = await load_spent()
+            applied = spent + delta <= limit
+        else:
+            if applied:
+                on_rollback(
+                    self.session, lambda: self._refund_weekly_spend(user_tgid, order_date, delta)
+                )
+
+        if not applied:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Weekly limit exceeded: {max(limit - spent, Decimal('0'))} remaining",
+            )
+
+    @staticmethod
+    async def _refund_weekly_spend(user_tgid: int, order_date: date, delta: Decimal) -> None:
+        try:
+            await adjust_spent(user_tgid, order_date, -delta)
+        except RedisError:
+            pass  # counter expires and is re-seeded from Postgres
+
+    async def _calculate_total_price(
+        self,
+        snapshot: MenuSnapshot,
+        combo_id: int | None,
+        items: list[dict],
+        extras: list[dict],
+    ) -> Decimal:
+        combo_price = Decimal("0")
+        if combo_id:
+            combo_price = snapshot.get_combo(combo_id).price
+
+        standalone_items = [item for item in items if item.get("type") == "standalone"]
+        standalone_price = await self.menu_service.calculate_standalone_price(
+            standalone_items, snapshot
+        )
+        extras_price = await self.menu_service.calculate_extras_price(extras, snapshot)
+        return combo_price + standalone_price + extras_price
+
     async def check_availability(self, cafe_id: int, order_date: date):
         return await self.deadline_service.check_availability(cafe_id, order_date)
 
     async def get_week_availability(self, cafe_id: int):
         return await self.deadline_service.get_week_availability(cafe_id)
+
+    async def get_bulk_availability(self, cafe_ids: list[int] | None = None, days: int = 14):
+        return await self.deadline_service.get_bulk_availability(cafe_ids, days)
@@ -1,10 +1,92 @@
-from datetime import datetime, timedelta
+import time
+from collections.abc import Iterable
+from datetime import date, datetime, timedelta
 from typing import Any
 
-from sqlalchemy import func, select
+from sqlalchemy import and_, func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..models import MenuItem, Order
+from ..repositories.user_stats import UserStatsRepository, local_day, window_start
+
+# Как долго кэшируется общее количество доступных блюд (секунды)
+TOTAL_DISHES_TTL = 600
+
+_total_dishes_cache: tuple[float, int] | None = None
+
+
+class OrderRowStats:
+    """Статистика, собранная за один проход по (items, extras) заказов."""
+
+    def __init__(self):
+        self.orders_count = 0
+        self.category_counts: dict[str, int] = {}
+        # Частота блюд: позиции заказа считаются по 1, extras - с учетом quantity
+        self.dish_counts: dict[int, int] = {}
+
+    def add(self, items: list, extras: list) -> None:
+        self.orders_count += 1
+        for item in items:
+            category = item.get("category")
+            if category:
+                self.category_counts[category] = self.category_counts.get(category, 0) + 1
+            menu_item_id = item.get("menu_item_id")
+            if menu_item_id:
+                self.dish_counts[menu_item_id] = self.dish_counts.get(menu_item_id, 0) + 1
+
+        for extra in extras:
+            menu_item_id = extra.get("menu_item_id")
+            if menu_item_id:
+                quantity = extra.get("quantity", 1)
+                self.dish_counts[menu_item_id] = self.dish_counts.get(menu_item_id, 0) + quantity
+
+    @classmethod
+    def from_totals(cls, rows: Iterable[tuple[str, str, int]]) -> "OrderRowStats":
+        """Статистика из счетчиков проекции: строки (kind, key, count)."""
+        stats = cls()
+        for kind, key, count in rows:
+            if kind == "order":
+                stats.orders_count = count
+            elif kind == "category":
+                stats.category_counts[key] = count
+            elif kind == "dish":
+                stats.dish_counts[int(key)] = count
+        return stats
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "orders_count": self.orders_count,
+            "categories": self.categories_distribution(),
+            "unique_dishes": len(self.dish_counts),
+        }
+
+    def categories_distribution(self) -> dict[str, dict[str, Any]]:
+        """
+        Распределение позиций заказов по категориям.
+
+        Returns:
+            {
+                "soup": {"count": 10, "percent": 33.3},
+                "salad": {"count": 8, "percent": 26.7},
+                "main": {"count": 12, "percent": 40.0},
+            }
+        """
+        total_items = sum(self.category_counts.values())
+        return {
+            category: {
+                "count": count,
+                "percent": round(count / total_items * 100, 1) if total_items > 0 else 0,
+            }
+            for category, count in self.category_counts.items()
+        }
+
+
+def reduce_order_rows(rows: Iterable[tuple[list, list]]) -> OrderRowStats:
+    """Свертка строк (items, extras) заказов в статистику за один проход."""
+    stats = OrderRowStats()
+    for items, extras in rows:
+        stats.add(items, extras or [])
+    return stats
 
 
 class OrderStatsService:
@@ -14,6 +96,7 @@ class OrderStatsService:
 
     def __init__(self, session: AsyncSession):
         self.session = session
+        self.stats_repo = UserStatsRepository(session)
 
     async def get_user_stats(self, user_tgid: int, days: int = 30) -> dict[str, Any]:
         """
@@ -43,19 +126,25 @@ class OrderStatsService:
         """
         since = datetime.now() - timedelta(days=days)
 
-        orders_count = await self._count_orders(user_tgid, since)
-        categories = await self._get_categories_distribution(user_tgid, since)
-        unique_dishes = await self._count_unique_dishes(user_tgid, since)
-        total_dishes = await self._get_total_dishes_count()
-        favorite_dishes = await self._get_favorite_dishes(user_tgid, since)
-        last_order_date = await self._get_last_order_date(user_tgid)
+        # Одна выборка: заказы за период + дата последнего заказа за всё время
+        last_order = (
+            select(func.max(Order.created_at).label("last_order_date"))
+            .where(Order.user_tgid == user_tgid)
+            .subquery()
+        )
+        result = await self.session.execute(
+            select(last_order.c.last_order_date, Order.items, Order.extras)
+            .select_from(last_order)
+            .outerjoin(Order, and_(Order.user_tgid == user_tgid, Order.created_at >= since))
+        )
+        rows = result.all()
+        last_order_date = rows[0].last_order_date
+        stats = reduce_order_rows((items, extras) for _, items, extras in rows if items is not None)
 
         return {
-            "orders_count": orders_count,
-            "categories": categories,
-            "unique_dishes": unique_dishes,
-            "total_dishes_available": total_dishes,
-            "favorite_dishes": favorite_dishes,
+            **stats.to_dict(),
+            "total_dishes_available": await self._get_total_dishes_count(),
+            "favorite_dishes": await self._get_favorite_dishes(stats.dish_counts),
             "last_order_date": last_order_date,
         }
 
@@ -82,95 +171,93 @@ class OrderStatsService:
 
         return [row.user_tgid for row in result.all()]
 
-    async def _count_orders(self, user_tgid: int, since: datetime) -> int:
+    async def get_projected_stats(self, user_tgid: int) -> dict[str, Any]:
         """
-        Подсчет заказов пользователя с указанной даты.
+        Статистика пользователя за 30 дней из проекции user_stats_totals.
+
+        Проекция обновляется при каждом изменении заказа, поэтому чтение не
+        зависит от количества заказов. Формат как у get_user_stats.
         """
-        result = await self.session.execute(
-            select(func.count(Order.id)).where(
-                Order.user_tgid == user_tgid, Order.created_at >= since
-            )
+        rows = await self.stats_repo.list_totals(user_tgid)
+        last_order_date = rows[0].last_order_date
+        if (
+            all(row.kind is None for row in rows)
+            and last_order_date is not None
+            and local_day(last_order_date) >= window_start(date.today())
+        ):
+            # Заказы в окне есть, а проекция пуста (ещё не было rebuild) — считаем по заказам
+            return await self.get_user_stats(user_tgid)
+
+        stats = OrderRowStats.from_totals(
+            (kind, key, count) for _, kind, key, count in rows if kind is not None
         )
-        return result.scalar() or 0
+        return {
+            **stats.to_dict(),
+            "total_dishes_available": await self._get_total_dishes_count(),
+            "favorite_dishes": await self._get_favorite_dishes(stats.dish_counts),
+            "last_order_date": last_order_date,
+        }
 
-    async def _get_categories_distribution(
-        self, user_tgid: int, since: datetime
-    ) -> dict[str, dict[str, Any]]:
+    async def get_batch_user_stats(self, min_orders: int = 5) -> dict[int, dict[str, Any]]:
         """
-        Распределение заказов по категориям блюд.
+        Статистика всех активных пользователей (>= min_orders заказов за 30 дней).
 
-        Анализирует combo_items каждого заказа для подсчета категорий.
+        Читается из проекции одним запросом; названия любимых блюд и даты
+        последних заказов загружаются одним запросом на всех.
 
         Returns:
-            {
-                "soup": {"count": 10, "percent": 33.3},
-                "salad": {"count": 8, "percent": 26.7},
-                "main": {"count": 12, "percent": 40.0},
-            }
+            {tgid: stats} в формате get_user_stats
         """
-        # Получаем все заказы пользователя за период
-        result = await self.session.execute(
-            select(Order.items).where(Order.user_tgid == user_tgid, Order.created_at >= since)
-        )
-
-        # Подсчитываем категории из combo_items
-        category_counts: dict[str, int] = {}
-        total_items = 0
-
-        for (combo_items,) in result.all():
-            for item in combo_items:
-                category = item.get("category")
-                if category:
-                    category_counts[category] = category_counts.get(category, 0) + 1
-                    total_items += 1
-
-        # Вычисляем проценты
-        categories_distribution: dict[str, dict[str, Any]] = {}
-        for category, count in category_counts.items():
-            percent = (count / total_items * 100) if total_items > 0 else 0
-            categories_distribution[category] = {"count": count, "percent": round(percent, 1)}
+        totals: dict[int, list[tuple[str, str, int]]] = {}
+        for user_tgid, kind, key, count in await self.stats_repo.list_active_totals(min_orders):
+            totals.setdefault(user_tgid, []).append((kind, key, count))
+        if not totals:
+            return {}
+
+        stats_by_user = {
+            user_tgid: OrderRowStats.from_totals(rows) for user_tgid, rows in totals.items()
+        }
+        top_dishes = {
+            user_tgid: _top_dishes(stats.dish_counts, 5)
+            for user_tgid, stats in stats_by_user.items()
+        }
+        dish_ids = {dish_id for top in top_dishes.values() for dish_id, _ in top}
+        dish_names = await self._get_dish_names(dish_ids) if dish_ids else {}
+        last_orders = await self.stats_repo.last_order_dates(stats_by_user)
+        total_dishes = await self._get_total_dishes_count()
 
-        return categories_distribution
+        return {
+            user_tgid: {
+                **stats.to_dict(),
+                "total_dishes_available": total_dishes,
+                "favorite_dishes": _favorites(top_dishes[user_tgid], dish_names),
+                "last_order_date": last_orders.get(user_tgid),
+            }
+            for user_tgid, stats in stats_by_user.items()
+        }
 
-    async def _count_unique_dishes(self, user_tgid: int, since: datetime) -> int:
-        """
-        Количество уникальных блюд, которые пользователь заказывал.
+    async def _get_total_dishes_count(self) -> int:
         """
-        # Получаем все заказы с combo_items и extras
-        result = await self.session.execute(
-            select(Order.items, Order.extras).where(
-                Order.user_tgid == user_tgid, Order.created_at >= since
-            )
-        )
-
-        unique_dish_ids: set[int] = set()
+        Общее количество доступных блюд в меню (всех кафе).
 
-        for combo_items, extras in result.all():
-            # Собираем ID из combo_items
-            for item in combo_items:
-                menu_item_id = item.get("menu_item_id")
-                if menu_item_id:
-                    unique_dish_ids.add(menu_item_id)
-
-            # Собираем ID из extras
-            for extra in extras:
-                menu_item_id = extra.get("menu_item_id")
-                if menu_item_id:
-                    unique_dish_ids.add(menu_item_id)
+        Кэшируется в процессе на TOTAL_DISHES_TTL секунд: значение нужно
+        только как контекст для рекомендаций.
+        """
+        global _total_dishes_cache
 
-        return len(unique_dish_ids)
+        now = time.monotonic()
+        if _total_dishes_cache is not None and _total_dishes_cache[0] > now:
+            return _total_dishes_cache[1]
 
-    async def _get_total_dishes_count(self) -> int:
-        """
-        Общее количество блюд в меню (всех кафе).
-        """
         result = await self.session.execute(
             select(func.count(MenuItem.id)).where(MenuItem.is_available == True)  # noqa: E712
         )
-        return result.scalar() or 0
+        total = result.scalar() or 0
+        _total_dishes_cache = (now + TOTAL_DISHES_TTL, total)
+        return total
 
     async def _get_favorite_dishes(
-        self, user_tgid: int, since: datetime, limit: int = 5
+        self, dish_counts: dict[int, int], limit: int = 5
     ) -> list[dict[str, Any]]:
         """
         Топ N любимых блюд пользователя.
@@ -182,62 +269,30 @@ class OrderStatsService:
                 ...
             ]
         """
-        # Получаем все заказы
-        result = await self.session.execute(
-            select(Order.items, Order.extras).where(
-                Order.user_tgid == user_tgid, Order.created_at >= since
-            )
-        )
-
-        # Подсчитываем частоту блюд
-        dish_counts: dict[int, int] = {}
-
-        for combo_items, extras in result.all():
-            # Считаем из combo_items
-            for item in combo_items:
-                menu_item_id = item.get("menu_item_id")
-                if menu_item_id:
-                    dish_counts[menu_item_id] = dish_counts.get(menu_item_id, 0) + 1
-
-            # Считаем из extras (с учетом quantity)
-            for extra in extras:
-                menu_item_id = extra.get("menu_item_id")
-                quantity = extra.get("quantity", 1)
-                if menu_item_id:
-                    dish_counts[menu_item_id] = dish_counts.get(menu_item_id, 0) + quantity
-
-        # Сортируем по убыванию частоты
-        top_dish_ids = sorted(dish_counts.items(), key=lambda x: x[1], reverse=True)[:limit]
-
-        if not top_dish_ids:
+        top_dishes = _top_dishes(dish_counts, limit)
+        if not top_dishes:
             return []
+        dish_names = await self._get_dish_names({dish_id for dish_id, _ in top_dishes})
+        return _favorites(top_dishes, dish_names)
 
-        # Получаем названия блюд
-        dish_ids = [dish_id for dish_id, _ in top_dish_ids]
+    async def _get_dish_names(self, dish_ids: set[int]) -> dict[int, str]:
         result = await self.session.execute(
             select(MenuItem.id, MenuItem.name).where(MenuItem.id.in_(dish_ids))
         )
+        return {row.id: row.name for row in result.all()}
 
-        dish_names = {row.id: row.name for row in result.all()}
 
-        # Формируем результат
-        favorite_dishes = []
-        for dish_id, count in top_dish_ids:
-            name = dish_names.get(dish_id)
-            if name:
-                favorite_dishes.append({"name": name, "count": count})
+def _top_dishes(dish_counts: dict[int, int], limit: int) -> list[tuple[int, int]]:
+    """(menu_item_id, count) по убыванию частоты."""
+    return sorted(dish_counts.items(), key=lambda x: x[1], reverse=True)[:limit]
 
-        return favorite_dishes
 
-    async def _get_last_order_date(self, user_tgid: int) -> datetime | None:
-        """
-        Получить дату последнего заказа пользователя.
-        """
-        result = await self.session.execute(
-            select(Order.created_at)
-            .where(Order.user_tgid == user_tgid)
-            .order_by(Order.created_at.desc())
-            .limit(1)
-        )
-        row = result.scalar_one_or_none()
-        return row
+def _favorites(
+    top_dishes: list[tuple[int, int]], dish_names: dict[int, str]
+) -> list[dict[str, Any]]:
+    # Удаленные блюда пропускаются
+    return [
+        {"name": dish_names[dish_id], "count": count}
+        for dish_id, count in top_dishes
+        if dish_id in dish_names
+    ]
@@ -1,24 +1,42 @@
-from datetime import date
+import json
 from decimal import Decimal
 
 from fastapi import HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from ..pagination import decode_cursor
+from ..repositories.order_rollup import OrderRollupRepository
 from ..repositories.summary import SummaryRepository
 from ..schemas.summary import SummaryCreate
 
 
+def _breakdown_entry(entry_id: int, name: str, price: Decimal | None, quantity: int) -> dict:
+    # Amounts are stored as strings: breakdown is a JSON column
+    return {
+        "id": entry_id,
+        "name": name,
+        "quantity": quantity,
+        "amount": str((price or Decimal("0")) * quantity),
+    }
+
+
 class SummaryService:
+    # Sort key of summary listings, encoded into pagination cursors
+    CURSOR_KEYS = ("date", "id")
+
     def __init__(self, session: AsyncSession):
         self.repo = SummaryRepository(session)
+        self.rollup_repo = OrderRollupRepository(session)
 
     async def list_summaries(
         self,
         cafe_id: int | None = None,
         skip: int = 0,
         limit: int = 100,
+        cursor: str | None = None,
     ):
-        return await self.repo.list(cafe_id=cafe_id, skip=skip, limit=limit)
+        after = decode_cursor(cursor, len(self.CURSOR_KEYS)) if cursor else None
+        return await self.repo.list(cafe_id=cafe_id, skip=skip, limit=limit, after=after)
 
     async def get_summary(self, summary_id: int):
         summary = await self.repo.get(summary_id)
@@ -32,63 +50,45 @@ class SummaryService:
     async def create_summary(self, data: SummaryCreate):
         """
         Generate a summary report for a specific cafe and date.
-        Aggregates all orders and creates breakdown by combos and extras.
+        Reads the pre-aggregated order rollups and creates breakdown by combos,
+        combo dishes, standalone items (per option set) and extras.
         """
-        orders = await self.repo.get_orders_for_date(data.cafe_id, data.date)
+        rollups = await self.rollup_repo.list_for_date(data.cafe_id, data.date)
+
+        total_orders = 0
+        total_amount = Decimal("0")
+        breakdown: dict[str, list[dict]] = {
+            "combos": [],
+            "combo_items": [],
+            "standalone": [],
+            "extras": [],
+        }
+        sections = {
+            "combo": "combos",
+            "combo_item": "combo_items",
+            "standalone": "standalone",
+            "extra": "extras",
+        }
 
-        if not orders:
+        for kind, item_id, options, quantity, amount, name, price in rollups:
+            if kind == "order":
+                total_orders, total_amount = quantity, amount
+                continue
+            default_name = f"Combo {item_id}" if kind == "combo" else f"Item {item_id}"
+            entry = _breakdown_entry(item_id, name or default_name, price, quantity)
+            if kind == "combo_item":
+                # Included in the combo price
+                del entry["amount"]
+            if kind == "standalone":
+                entry["options"] = json.loads(options) if options else {}
+            breakdown[sections[kind]].append(entry)
+
+        if not total_orders:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="No orders found for this date",
             )
 
-        # Aggregate data
-        total_orders = len(orders)
-        total_amount = sum(order.total_price for order in orders)
-
-        # Build breakdown
-        combo_counts: dict[int, dict] = {}
-        extra_counts: dict[int, dict] = {}
-
-        for order in orders:
-            # Count combos
-            combo_id = order.combo_id
-            if combo_id not in combo_counts:
-                combo = await self.repo.get_combo(combo_id)
-                combo_counts[combo_id] = {
-                    "name": combo.name if combo else f"Combo {combo_id}",
-                    "quantity": 0,
-                    "amount": Decimal("0"),
-                }
-            combo_counts[combo_id]["quantity"] += 1
-            if combo:
-                combo_counts[combo_id]["amount"] += combo.price
-
-            # Count extras
-            for extra in order.extras:
-                item_id = extra["menu_item_id"]
-                quantity = extra.get("quantity", 1)
-
-                if item_id not in extra_counts:
-                    item = await self.repo.get_menu_item(item_id)
-                    extra_counts[item_id] = {
-                        "name": item.name if item else f"Item {item_id}",
-                        "quantity": 0,
-                        "amount": Decimal("0"),
-                    }
-                extra_counts[item_id]["quantity"] += quantity
-                if item and item.price:
-                    extra_counts[item_id]["amount"] += item.price * quantity
-
-        breakdown = {
-            "combos": [
-                {"id": k, **v} for k, v in combo_counts.items()
-            ],
-            "extras": [
-                {"id": k, **v} for k, v in extra_counts.items()
-            ],
-        }
-
         # Create summary
         return await self.repo.create(
             cafe_id=data.cafe_id,
@@ -117,6 +117,25 @@ class SummaryService:
         for combo in summary.breakdown.get("combos", []):
             lines.append(f"{combo['name']},{combo['quantity']},{combo['amount']}")
 
+        if summary.breakdown.get("combo_items"):
+            lines.extend([
+                "",
+                "Combo dishes:",
+                "Name,Quantity",
+            ])
+            for item in summary.breakdown["combo_items"]:
+                lines.append(f"{item['name']},{item['quantity']}")
+
+        if summary.breakdown.get("standalone"):
+            lines.extend([
+                "",
+                "Items:",
+                "Name,Options,Quantity,Amount",
+            ])
+            for item in summary.breakdown["standalone"]:
+                options = "; ".join(f"{k}: {v}" for k, v in item.get("options", {}).items())
+                lines.append(f"{item['name']},{options},{item['quantity']},{item['amount']}")
+
         lines.extend([
             "",
             "Extras:",
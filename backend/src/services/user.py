@@ -1,14 +1,24 @@
+from datetime import date
 from decimal import Decimal
 
 from fastapi import HTTPException, status
+from redis.exceptions import RedisError
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from ..cache.principal import invalidate_principal
+from ..cache.spend_counter import get_spent
+from ..database import after_commit
+from ..pagination import decode_cursor
 from ..repositories.user import UserRepository
 from ..schemas.user import BalanceResponse, UserCreate, UserUpdate
 
 
 class UserService:
+    # Sort key of user listings, encoded into pagination cursors
+    CURSOR_KEYS = ("tgid",)
+
     def __init__(self, session: AsyncSession):
+        self.session = session
         self.repo = UserRepository(session)
 
     async def list_users(
@@ -17,8 +27,12 @@ class UserService:
         limit: int = 100,
         search: str | None = None,
         role: str | None = None,
+        cursor: str | None = None,
     ):
-        return await self.repo.list(skip=skip, limit=limit, search=search, role=role)
+        after = decode_cursor(cursor, len(self.CURSOR_KEYS)) if cursor else None
+        return await self.repo.list(
+            skip=skip, limit=limit, search=search, role=role, after=after
+        )
 
     async def get_user(self, tgid: int):
         user = await self.repo.get_by_tgid(tgid)
@@ -46,19 +60,27 @@ class UserService:
     async def update_user(self, tgid: int, data: UserUpdate):
         user = await self.get_user(tgid)
         update_data = data.model_dump(exclude_unset=True)
+        self._invalidate_principal(tgid)
         return await self.repo.update(user, **update_data)
 
     async def delete_user(self, tgid: int):
         user = await self.get_user(tgid)
+        self._invalidate_principal(tgid)
         await self.repo.delete(user)
 
     async def update_access(self, tgid: int, is_active: bool):
         user = await self.get_user(tgid)
+        self._invalidate_principal(tgid)
         return await self.repo.update(user, is_active=is_active)
 
     async def get_balance(self, tgid: int) -> BalanceResponse:
         user = await self.get_user(tgid)
-        spent = await self.repo.get_spent_this_week(tgid)
+        try:
+            spent = await get_spent(
+                tgid, date.today(), lambda: self.repo.get_spent_this_week(tgid)
+            )
+        except RedisError:
+            spent = await self.repo.get_spent_this_week(tgid)
 
         remaining = None
         if user.weekly_limit is not None:
@@ -73,4 +95,9 @@ class UserService:
 
     async def update_balance_limit(self, tgid: int, weekly_limit: Decimal | None):
         user = await self.get_user(tgid)
+        self._invalidate_principal(tgid)
         return await self.repo.update(user, weekly_limit=weekly_limit)
+
+    def _invalidate_principal(self, tgid: int) -> None:
+        """Drop the cached auth principal once the change is committed."""
+        after_commit(self.session, lambda: invalidate_principal(tgid))
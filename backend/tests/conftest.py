@@ -12,24 +12,110 @@ os.environ["REDIS_URL"] = "redis://localhost:6379"
 os.environ["GEMINI_API_KEYS"] = "test_key_1,test_key_2,test_key_3"
 os.environ["GEMINI_MODEL"] = "gemini-2.0-flash-exp"
 os.environ["GEMINI_MAX_REQUESTS_PER_KEY"] = "195"
+os.environ["RATE_LIMIT_ENABLED"] = "false"
 
 from collections.abc import AsyncGenerator
 from datetime import date, datetime, time
 from decimal import Decimal
+from time import monotonic
 
 import pytest
 from httpx import ASGITransport, AsyncClient
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
 from src.auth.jwt import create_access_token
-from src.database import get_db
+from src.database import get_db, run_after_commit
 from src.main import app
 from src.models.base import Base
 from src.models.cafe import Cafe, CafeLinkRequest, Combo, MenuItem
 from src.models.deadline import Deadline
-from src.models.order import Order
+from src.models.order import Order, OrderRollup, UserStatsDay, UserStatsTotal
 from src.models.user import User
 
+class FakeRedis:
+    """Minimal in-memory stand-in for the Redis commands used by the app (string expiry only)."""
+
+    def __init__(self):
+        self.data: dict[str, str] = {}
+        self.hashes: dict[str, dict[str, str]] = {}
+        self.sets: dict[str, set[str]] = {}
+        self.expires_at: dict[str, float] = {}
+
+    def _purge(self):
+        now = monotonic()
+        for key in [key for key, at in self.expires_at.items() if at <= now]:
+            self.data.pop(key, None)
+            del self.expires_at[key]
+
+    async def get(self, key):
+        self._purge()
+        return self.data.get(key)
+
+    async def mget(self, keys):
+        self._purge()
+        return [self.data.get(key) for key in keys]
+
+    async def set(self, key, value, nx=False, ex=None):
+        self._purge()
+        if nx and key in self.data:
+            return None
+        self.data[key] = str(value)
+        self.expires_at.pop(key, None)
+        if ex is not None:
+            self.expires_at[key] = monotonic() + ex
+        return True
+
+    async def delete(self, *keys):
+        return sum(self.data.pop(key, None) is not None for key in keys)
+
+    async def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, 0)) + 1)
+        return int(self.data[key])
+
+    async def publish(self, channel, message):
+        return 0
+
+    async def expire(self, key, seconds):
+        self._purge()
+        if key in self.data:
+            self.expires_at[key] = monotonic() + seconds
+        return True
+
+    async def hset(self, key, mapping):
+        self.hashes.setdefault(key, {}).update({k: str(v) for k, v in mapping.items()})
+        return len(mapping)
+
+    async def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    async def sadd(self, key, *members):
+        members = {str(member) for member in members}
+        added = members - self.sets.get(key, set())
+        self.sets.setdefault(key, set()).update(members)
+        return len(added)
+
+    async def srem(self, key, *members):
+        members = {str(member) for member in members}
+        removed = members & self.sets.get(key, set())
+        self.sets.get(key, set()).difference_update(members)
+        return len(removed)
+
+    async def sismember(self, key, member):
+        return str(member) in self.sets.get(key, set())
+
+    async def smembers(self, key):
+        return set(self.sets.get(key, set()))
+
+    async def scard(self, key):
+        return len(self.sets.get(key, set()))
+
+
+@pytest.fixture
+def fake_redis() -> FakeRedis:
+    """In-memory Redis; patch the module's get_redis_client to return it."""
+    return FakeRedis()
+
+
 # Use in-memory SQLite for tests
 TEST_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
 
@@ -71,6 +157,9 @@ async def db_session(test_engine, setup_database) -> AsyncGenerator[AsyncSession
             from src.models.cafe import MenuItemOption
             from src.models.user import UserAccessRequest
 
+            await session.execute(OrderRollup.__table__.delete())
+            await session.execute(UserStatsDay.__table__.delete())
+            await session.execute(UserStatsTotal.__table__.delete())
             await session.execute(Order.__table__.delete())
             await session.execute(CafeLinkRequest.__table__.delete())
             await session.execute(Deadline.__table__.delete())
@@ -88,7 +177,10 @@ async def client(db_session: AsyncSession) -> AsyncGenerator[AsyncClient, None]:
     """Create test HTTP client with database session override."""
 
     async def override_get_db():
+        # Same lifecycle as get_db: commit, then run after-commit callbacks
         yield db_session
+        await db_session.commit()
+        await run_after_commit(db_session)
 
     app.dependency_overrides[get_db] = override_get_db
 
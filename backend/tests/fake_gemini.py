@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Local fake of the Gemini generateContent endpoint.
+
+Speaks just enough HTTP/1.1 (keep-alive, Content-Length bodies) for the
+google-genai SDK and counts TCP connections and requests, so tests and
+benchmarks can check connection reuse offline. Point the SDK at it with
+GEMINI_BASE_URL=http://127.0.0.1:<port>.
+
+Usage:
+    python tests/fake_gemini.py --requests 200 --latency 0.02
+
+The benchmark sends the same calls through GeminiRecommendationService
+with a fresh client per call and with the pooled clients, and prints the
+wall time and number of connections opened in each mode.
+"""
+
+import asyncio
+import json
+import os
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Any
+
+DEFAULT_RESPONSE = {
+    "summary": "Вы предпочитаете супы и салаты.",
+    "tips": ["Попробуйте новое горячее блюдо"],
+}
+
+_PATH_RE = re.compile(r"^/[^/]+/models/(?P<model>[^:/]+):generateContent")
+
+
+class FakeGeminiServer:
+    """
+    Minimal HTTP server answering generateContent with a canned JSON text.
+
+    `response` is the object returned as the model's JSON text, or a callable
+    building it from the prompt.
+    """
+
+    def __init__(self, response: Any = None, latency: float = 0.0):
+        self.response = response if response is not None else DEFAULT_RESPONSE
+        self.latency = latency
+        self.connections = 0
+        self.requests = 0
+        self.api_keys: list[str] = []
+        self.prompts: list[str] = []
+        self._server: asyncio.Server | None = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    async def start(self) -> "FakeGeminiServer":
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return self
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self) -> "FakeGeminiServer":
+        return await self.start()
+
+    async def __aexit__(self, *exc) -> None:
+        await self.stop()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.connections += 1
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                _, path, _ = request_line.decode().split(" ", 2)
+
+                headers: dict[str, str] = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    name, _, value = line.decode().partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                self.requests += 1
+                self.api_keys.append(headers.get("x-goog-api-key", ""))
+                prompt = self._prompt(body)
+                self.prompts.append(prompt)
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+
+                if _PATH_RE.match(path):
+                    status, body = "200 OK", self._generate_content_body(prompt)
+                else:
+                    status, body = "404 Not Found", json.dumps(
+                        {"error": {"code": 404, "message": "Not found", "status": "NOT_FOUND"}}
+                    )
+
+                payload = body.encode()
+                writer.write(
+                    f"HTTP/1.1 {status}\r\n"
+                    "Content-Type: application/json; charset=UTF-8\r\n"
+                    f"Content-Length: {len(payload)}\r\n"
+                    "\r\n".encode()
+                    + payload
+                )
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _prompt(body: bytes) -> str:
+        try:
+            contents = json.loads(body)["contents"]
+            return "".join(part.get("text", "") for c in contents for part in c["parts"])
+        except (ValueError, KeyError, TypeError):
+            return ""
+
+    def _generate_content_body(self, prompt: str) -> str:
+        response = self.response(prompt) if callable(self.response) else self.response
+        text = json.dumps(response, ensure_ascii=False)
+        return json.dumps({
+            "candidates": [
+                {
+                    "content": {"role": "model", "parts": [{"text": text}]},
+                    "finishReason": "STOP",
+                    "index": 0,
+                }
+            ],
+            "modelVersion": "fake",
+        })
+
+
+async def _benchmark(requests: int, latency: float, concurrency: int) -> None:
+    from unittest.mock import AsyncMock
+
+    from src.gemini.client import GeminiRecommendationService
+    from src.gemini.client_pool import GeminiClientPool
+
+    user_stats = {"orders_count": 10, "categories": {}, "favorite_dishes": []}
+    key_pool = AsyncMock()
+    key_pool.keys = ["bench-key-1", "bench-key-2", "bench-key-3"]
+    key_pool.acquire_key.side_effect = lambda: (0, key_pool.keys[0])
+
+    async with FakeGeminiServer(latency=latency) as server:
+        for mode in ("fresh", "pooled"):
+            server.connections = server.requests = 0
+            clients = GeminiClientPool(base_url=server.base_url)
+            service = GeminiRecommendationService(key_pool, client_pool=clients)
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def call():
+                async with semaphore:
+                    if mode == "pooled":
+                        await service.generate_recommendations(user_stats)
+                        return
+                    # Pre-pooling behaviour: a new client for every call
+                    fresh = GeminiClientPool(base_url=server.base_url)
+                    await GeminiRecommendationService(
+                        key_pool, client_pool=fresh
+                    ).generate_recommendations(user_stats)
+                    await fresh.close()
+
+            started = time.perf_counter()
+            await asyncio.gather(*(call() for _ in range(requests)))
+            elapsed = time.perf_counter() - started
+            await clients.close()
+
+            print(
+                f"{mode:>6}: {requests} calls in {elapsed:.2f}s "
+                f"({requests / elapsed:.0f}/s), {server.connections} connections"
+            )
+
+
+if __name__ == "__main__":
+    import argparse
+
+    sys.path.insert(0, str(Path(__file__).parent.parent))
+    # Settings required by src.config; the benchmark touches neither of them
+    for name, value in {
+        "TELEGRAM_BOT_TOKEN": "123456789:benchmark",
+        "JWT_SECRET_KEY": "benchmark_jwt_secret_key_at_least_32_chars",
+        "DATABASE_URL": "sqlite+aiosqlite:///:memory:",
+        "REDIS_URL": "redis://localhost:6379",
+        "GEMINI_API_KEYS": "bench-key",
+    }.items():
+        os.environ.setdefault(name, value)
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds per response")
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    asyncio.run(_benchmark(args.requests, args.latency, args.concurrency))
@@ -4,10 +4,13 @@ import hashlib
 import hmac
 import json
 import time
+from unittest.mock import AsyncMock, patch
 from urllib.parse import urlencode
 
 import pytest
 
+from src.auth.telegram import validate_telegram_init_data
+
 
 def generate_telegram_init_data(user_data: dict, bot_token: str) -> str:
     """Generate valid Telegram WebApp initData."""
@@ -245,3 +248,30 @@ async def test_approved_user_can_authenticate(client, manager_auth_headers):
 
     assert response.status_code == 200
     assert "access_token" in response.json()
+
+
+@pytest.mark.asyncio
+async def test_telegram_auth_replay_served_from_cache(
+    client, db_session, test_user, fake_redis
+):
+    """Test a repeated login with the same initData reuses the issued token."""
+    user_data = {"id": test_user.tgid, "first_name": "Test", "last_name": "User"}
+    init_data = generate_telegram_init_data(
+        user_data, "123456789:ABCdefGHIjklMNOpqrsTUVwxyz1234567890"
+    )
+    body = {"init_data": init_data, "office": test_user.office}
+
+    with (
+        patch("src.cache.login_cache.get_redis_client", AsyncMock(return_value=fake_redis)),
+        patch(
+            "src.routers.auth.validate_telegram_init_data",
+            wraps=validate_telegram_init_data,
+        ) as validate,
+    ):
+        first = await client.post("/api/v1/auth/telegram", json=body)
+        second = await client.post("/api/v1/auth/telegram", json=body)
+
+    assert first.status_code == 200
+    assert second.status_code == 200
+    assert second.json() == first.json()
+    validate.assert_called_once()
@@ -1,5 +1,7 @@
 """Integration tests for Cafes API."""
 
+from unittest.mock import AsyncMock, patch
+
 import pytest
 
 
@@ -101,3 +103,33 @@ async def test_delete_cafe_manager(client, manager_auth_headers, test_cafe):
     )
 
     assert response.status_code == 204
+
+
+@pytest.mark.asyncio
+async def test_get_cafes_conditional(
+    client, test_cafe, auth_headers, manager_auth_headers, fake_redis
+):
+    """Test If-None-Match returns 304 until the cafe list changes."""
+    with patch("src.cache.local_cache.get_redis_client", AsyncMock(return_value=fake_redis)):
+        response = await client.get("/api/v1/cafes", headers=auth_headers)
+        etag = response.headers["ETag"]
+
+        cached = await client.get(
+            "/api/v1/cafes", headers={**auth_headers, "If-None-Match": etag}
+        )
+        assert cached.status_code == 304
+        assert cached.headers["ETag"] == etag
+        assert cached.content == b""
+
+        await client.patch(
+            f"/api/v1/cafes/{test_cafe.id}",
+            headers=manager_auth_headers,
+            json={"name": "Renamed Cafe"},
+        )
+        changed = await client.get(
+            "/api/v1/cafes", headers={**auth_headers, "If-None-Match": etag}
+        )
+
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert changed.json()[0]["name"] == "Renamed Cafe"
@@ -1,6 +1,7 @@
 """Integration tests for MenuItemOption CRUD API."""
 
 from decimal import Decimal
+from unittest.mock import AsyncMock, patch
 
 import pytest
 
@@ -207,3 +208,32 @@ async def test_cascade_delete_options_when_menu_item_deleted(
         select(MenuItemOption).where(MenuItemOption.id == option_id)
     )
     assert result.scalar_one_or_none() is None
+
+
+@pytest.mark.asyncio
+async def test_menu_etag_changes_with_options(
+    client, auth_headers, manager_auth_headers, test_cafe, test_menu_items, fake_redis
+):
+    """Test the menu ETag is revalidated and changes after an option is added."""
+    url = f"/api/v1/cafes/{test_cafe.id}/menu"
+    with patch("src.cache.local_cache.get_redis_client", AsyncMock(return_value=fake_redis)):
+        etag = (await client.get(url, headers=auth_headers)).headers["ETag"]
+
+        cached = await client.get(url, headers={**auth_headers, "If-None-Match": etag})
+        assert cached.status_code == 304
+
+        # Other query parameters are a different representation
+        soups = await client.get(
+            url, headers={**auth_headers, "If-None-Match": etag}, params={"category": "soup"}
+        )
+        assert soups.status_code == 200
+
+        await client.post(
+            f"{url}/{test_menu_items[0].id}/options",
+            headers=manager_auth_headers,
+            json={"name": "Size", "values": ["S", "L"], "is_required": False},
+        )
+        changed = await client.get(url, headers={**auth_headers, "If-None-Match": etag})
+
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
@@ -129,3 +129,205 @@ async def test_get_week_availability(client, auth_headers, test_cafe, test_deadl
     assert "cafe_id" in data
     assert "availability" in data
     assert len(data["availability"]) == 7
+
+
+@pytest.mark.asyncio
+async def test_get_bulk_availability(
+    client, auth_headers, db_session, test_cafe, test_deadline
+):
+    """Test availability matrix for all active cafes."""
+    from src.models.cafe import Cafe
+
+    inactive = Cafe(name="Closed Cafe", is_active=False)
+    db_session.add(inactive)
+    await db_session.commit()
+
+    response = await client.get(
+        "/api/v1/orders/availability", headers=auth_headers, params={"days": 14}
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["days"] == 14
+    assert data["start_date"] == str(date.today())
+    assert [cafe["cafe_id"] for cafe in data["cafes"]] == [test_cafe.id]
+
+    availability = data["cafes"][0]["availability"]
+    assert len(availability) == 14
+    assert availability[0]["date"] == str(date.today())
+    # Only Mondays have a deadline configured
+    for day in availability:
+        if date.fromisoformat(day["date"]).weekday() != 0:
+            assert day["can_order"] is False
+            assert "No delivery" in day["reason"]
+
+
+@pytest.mark.asyncio
+async def test_get_bulk_availability_selected_cafes(client, auth_headers, test_cafe):
+    """Test availability matrix restricted to chosen cafes."""
+    response = await client.get(
+        "/api/v1/orders/availability",
+        headers=auth_headers,
+        params={"cafe_ids": [test_cafe.id, 999999], "days": 3},
+    )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data["cafes"]) == 1
+    assert data["cafes"][0]["cafe_id"] == test_cafe.id
+    assert len(data["cafes"][0]["availability"]) == 3
+
+
+@pytest.mark.asyncio
+async def test_get_orders_cursor_pagination(
+    client, db_session, manager_auth_headers, test_user, test_cafe, test_combo
+):
+    """Test orders can be paged with next cursor until exhausted."""
+    from decimal import Decimal
+
+    from src.models.order import Order
+
+    base_date = date(2030, 3, 4)
+    db_session.add_all([
+        Order(
+            user_tgid=test_user.tgid,
+            cafe_id=test_cafe.id,
+            order_date=base_date + timedelta(days=i // 2),  # two orders per date
+            combo_id=test_combo.id,
+            items=[],
+            extras=[],
+            total_price=Decimal("15.00"),
+        )
+        for i in range(5)
+    ])
+    await db_session.commit()
+
+    seen: list[int] = []
+    cursor = None
+    for _ in range(5):
+        params = {"limit": 2, "cafe_id": test_cafe.id}
+        if cursor:
+            params["cursor"] = cursor
+        response = await client.get("/api/v1/orders", headers=manager_auth_headers, params=params)
+        assert response.status_code == 200
+        seen.extend(order["id"] for order in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    assert cursor is None
+    assert len(seen) == len(set(seen)) == 5
+
+    response = await client.get(
+        "/api/v1/orders", headers=manager_auth_headers, params={"cursor": "not-a-cursor"}
+    )
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_export_orders_csv_and_ndjson(
+    client, db_session, auth_headers, manager_auth_headers, test_user, test_manager, test_cafe,
+    test_combo,
+):
+    """Test manager export streams orders for a range, filtered by office."""
+    import csv
+    import io
+    import json
+    from decimal import Decimal
+
+    from src.models.order import Order
+
+    test_manager.office = "Office B"
+    db_session.add_all([
+        Order(
+            user_tgid=user.tgid,
+            cafe_id=test_cafe.id,
+            order_date=date(2030, 5, day),
+            combo_id=test_combo.id,
+            items=[{"type": "combo", "category": "soup", "menu_item_id": 1}],
+            extras=[],
+            notes="Без лука, \"острое\"",
+            total_price=Decimal("15.00"),
+        )
+        for user, day in [(test_user, 1), (test_manager, 2), (test_user, 31)]
+    ])
+    await db_session.commit()
+
+    params = {"date_from": "2030-05-01", "date_to": "2030-05-30"}
+    response = await client.get(
+        "/api/v1/orders/export", headers=manager_auth_headers, params=params
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [r["order_date"] for r in rows] == ["2030-05-01", "2030-05-02"]
+    assert rows[0]["cafe_name"] == test_cafe.name
+    assert rows[0]["notes"] == "Без лука, \"острое\""
+    assert json.loads(rows[0]["items"])[0]["category"] == "soup"
+
+    response = await client.get(
+        "/api/v1/orders/export",
+        headers=manager_auth_headers,
+        params={**params, "format": "ndjson", "office": "Office B"},
+    )
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert len(lines) == 1
+    assert lines[0]["user_tgid"] == test_manager.tgid
+    assert lines[0]["total_price"] == "15.00"
+
+    response = await client.get(
+        "/api/v1/orders/export",
+        headers=manager_auth_headers,
+        params={"date_from": "2030-05-30", "date_to": "2030-05-01"},
+    )
+    assert response.status_code == 400
+
+    response = await client.get("/api/v1/orders/export", headers=auth_headers, params=params)
+    assert response.status_code == 403
+
+
+@pytest.mark.asyncio
+async def test_create_order_idempotency_key(
+    client, db_session, auth_headers, fake_redis, test_cafe, test_combo, test_menu_items,
+    test_deadline,
+):
+    """Test retries with the same Idempotency-Key create a single order."""
+    import asyncio
+    from unittest.mock import AsyncMock, patch
+
+    from sqlalchemy import func, select
+
+    from src.models.order import Order
+
+    today = date.today()
+    order_date = today + timedelta(days=(0 - today.weekday()) % 7 + 7)  # Monday in 1-2 weeks
+    order_data = {
+        "cafe_id": test_cafe.id,
+        "order_date": str(order_date),
+        "combo_id": test_combo.id,
+        "items": [
+            {"type": "combo", "category": "soup", "menu_item_id": test_menu_items[0].id},
+            {"type": "combo", "category": "main", "menu_item_id": test_menu_items[1].id},
+            {"type": "combo", "category": "salad", "menu_item_id": test_menu_items[2].id},
+        ],
+    }
+    headers = {**auth_headers, "Idempotency-Key": "order-1"}
+
+    with patch("src.idempotency.get_redis_client", AsyncMock(return_value=fake_redis)):
+        first, second = await asyncio.gather(
+            client.post("/api/v1/orders", headers=headers, json=order_data),
+            client.post("/api/v1/orders", headers=headers, json=order_data),
+        )
+        retry = await client.post("/api/v1/orders", headers=headers, json=order_data)
+        conflict = await client.post(
+            "/api/v1/orders", headers=headers, json={**order_data, "notes": "changed"}
+        )
+
+    assert first.status_code == second.status_code == retry.status_code == 201
+    assert first.json() == second.json() == retry.json()
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert conflict.status_code == 422
+
+    count = await db_session.scalar(select(func.count(Order.id)))
+    assert count == 1
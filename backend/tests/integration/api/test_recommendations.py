@@ -4,7 +4,7 @@ import json
 import pytest
 from datetime import datetime, timedelta
 from decimal import Decimal
-from unittest.mock import patch
+from unittest.mock import AsyncMock, patch
 
 from src.models.order import Order
 
@@ -224,3 +224,45 @@ async def test_get_recommendations_response_model(
         assert isinstance(data["tips"], list)
         assert isinstance(data["stats"], dict)
         assert isinstance(data["generated_at"], (str, type(None)))
+
+
+async def test_get_batch_status(client, manager_auth_headers, fake_redis):
+    """Test GET /users/recommendations/batch returns the latest run."""
+    from src.cache.batch_run import BatchRun
+
+    with patch("src.cache.batch_run.get_redis_client", AsyncMock(return_value=fake_redis)):
+        run = await BatchRun.open(total=3)
+        await run.mark_done(1)
+        await run.mark_failed(2)
+
+        response = await client.get(
+            "/api/v1/users/recommendations/batch",
+            headers=manager_auth_headers,
+        )
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["run_id"] == run.run_id
+    assert data["status"] == "running"
+    assert (data["total"], data["done"], data["failed"], data["remaining"]) == (3, 1, 1, 1)
+
+
+async def test_get_batch_status_without_run(client, manager_auth_headers, fake_redis):
+    """Test GET /users/recommendations/batch before any run."""
+    with patch("src.cache.batch_run.get_redis_client", AsyncMock(return_value=fake_redis)):
+        response = await client.get(
+            "/api/v1/users/recommendations/batch",
+            headers=manager_auth_headers,
+        )
+
+    assert response.status_code == 404
+
+
+async def test_get_batch_status_requires_manager(client, auth_headers):
+    """Test that regular users cannot read the batch status."""
+    response = await client.get(
+        "/api/v1/users/recommendations/batch",
+        headers=auth_headers,
+    )
+
+    assert response.status_code == 403
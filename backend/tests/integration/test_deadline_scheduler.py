@@ -0,0 +1,143 @@
+"""Integration tests for the deadline scheduler worker."""
+
+from datetime import date, datetime, time, timedelta
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from workers.deadlines import RETRY_DELAY, DeadlineScheduler
+
+
+class TestDeadlineScheduler:
+    """Test suite for deadline scheduler."""
+
+    @pytest.fixture(autouse=True)
+    def patch_redis(self, fake_redis):
+        with patch("workers.deadlines.get_redis_client", AsyncMock(return_value=fake_redis)):
+            yield
+
+    @pytest.fixture
+    def scheduler(self, db_session):
+        session_factory = async_sessionmaker(
+            db_session.bind, class_=AsyncSession, expire_on_commit=False
+        )
+        return DeadlineScheduler(session_factory, publish=AsyncMock())
+
+    @pytest.mark.asyncio
+    async def test_fires_once_per_cafe_and_date(
+        self, db_session, test_cafe, test_deadline, fake_redis, scheduler
+    ):
+        """Cutoff publishes one event and schedules the following week."""
+        # Monday deadline, 1 day in advance -> cutoff Sunday 10:00
+        await scheduler.load_all(datetime(2030, 1, 5, 12, 0).astimezone())  # Saturday
+
+        fire_at = scheduler.next_fire_at()
+        assert fire_at == datetime.combine(date(2030, 1, 6), time(10, 0)).astimezone()
+
+        assert await scheduler.fire_due(fire_at - timedelta(seconds=1)) == 0
+        assert await scheduler.fire_due(fire_at) == 1
+        scheduler.publish.assert_awaited_once_with(test_cafe.id, "2030-01-07")
+        assert scheduler.next_fire_at() == fire_at + timedelta(days=7)
+
+        # A restarted scheduler does not publish the same cutoff again
+        await scheduler.load_all(fire_at - timedelta(hours=1))
+        assert await scheduler.fire_due(fire_at) == 0
+        assert scheduler.publish.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_failed_publish_is_retried(
+        self, db_session, test_cafe, test_deadline, fake_redis, scheduler
+    ):
+        """Failed publish releases the marker and retries the same date."""
+        await scheduler.load_all(datetime(2030, 1, 5, 12, 0).astimezone())
+        fire_at = scheduler.next_fire_at()
+
+        scheduler.publish.side_effect = [RuntimeError("kafka down"), None]
+        assert await scheduler.fire_due(fire_at) == 0
+        assert await scheduler.fire_due(fire_at + timedelta(minutes=1)) == 1
+        assert scheduler.publish.await_args.args == (test_cafe.id, "2030-01-07")
+
+    @pytest.mark.asyncio
+    async def test_reload_cafe_replaces_entry(
+        self, db_session, test_cafe, test_deadline, fake_redis, scheduler
+    ):
+        """Reloading a cafe drops its stale heap entry."""
+        now = datetime(2030, 1, 5, 12, 0).astimezone()
+        await scheduler.load_all(now)
+
+        test_deadline.deadline_time = "08:30"
+        await db_session.commit()
+        await scheduler.reload_cafe(test_cafe.id, now)
+
+        assert scheduler.next_fire_at() == datetime.combine(
+            date(2030, 1, 6), time(8, 30)
+        ).astimezone()
+
+        test_cafe.is_active = False
+        await db_session.commit()
+        await scheduler.reload_cafe(test_cafe.id, now)
+
+        assert scheduler.next_fire_at() is None
+        assert scheduler.cafes_count == 0
+
+    @pytest.mark.asyncio
+    async def test_resync_keeps_due_cutoffs_and_retries(
+        self, db_session, test_cafe, test_deadline, fake_redis, scheduler
+    ):
+        """A reload between fire_due runs neither skips due cutoffs nor drops retries."""
+        await scheduler.load_all(datetime(2030, 1, 5, 12, 0).astimezone())
+        fire_at = scheduler.next_fire_at()
+        assert await scheduler.fire_due(fire_at - timedelta(minutes=1)) == 0
+
+        # Resync right after the cutoff passed, before the scheduler woke up
+        await scheduler.load_all(scheduler.processed_until)
+        assert scheduler.next_fire_at() == fire_at
+
+        scheduler.publish.side_effect = [RuntimeError("kafka down"), None]
+        assert await scheduler.fire_due(fire_at) == 0
+
+        await scheduler.load_all(scheduler.processed_until)
+        await scheduler.reload_cafe(test_cafe.id, scheduler.processed_until)
+        assert scheduler.next_fire_at() == fire_at + RETRY_DELAY
+        assert await scheduler.fire_due(fire_at + RETRY_DELAY) == 1
+        assert scheduler.publish.await_args.args == (test_cafe.id, "2030-01-07")
+        assert scheduler.next_fire_at() == fire_at + timedelta(days=7)
+
+    @pytest.mark.asyncio
+    async def test_listener_survives_reload_errors(self, fake_redis, scheduler):
+        """A failing reload is logged and the listener reconnects."""
+        import asyncio
+
+        from src.cache.local_cache import deadline_cache
+
+        class PubSub:
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            async def subscribe(self, *channels):
+                pass
+
+            async def listen(self):
+                yield {"type": "message", "channel": deadline_cache.channel, "data": "1"}
+                await asyncio.Event().wait()
+
+        fake_redis.pubsub = MagicMock(side_effect=PubSub)
+        reloaded = asyncio.Event()
+
+        async def reload_cafe(cafe_id, after):
+            if scheduler.reload_cafe.await_count == 1:
+                raise RuntimeError("database is down")
+            reloaded.set()
+
+        scheduler.reload_cafe = AsyncMock(side_effect=reload_cafe)
+
+        listener = asyncio.create_task(scheduler._listen_for_changes())
+        try:
+            await asyncio.wait_for(reloaded.wait(), timeout=5)
+        finally:
+            listener.cancel()
+        assert scheduler.reload_cafe.await_count == 2
@@ -6,21 +6,59 @@ from decimal import Decimal
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
 from src.gemini import AllKeysExhaustedException
+from src.gemini.result_cache import RecommendationResultCache
 from src.models.order import Order
+from src.repositories.user_stats import UserStatsRepository
+
+
+async def commit_orders(session):
+    """Commit orders added directly to the session and project them into user stats."""
+    await session.commit()
+    await UserStatsRepository(session).rebuild()
+    await session.commit()
 
 
 class TestKafkaRecommendationsWorker:
     """Test suite for recommendations worker."""
 
     @pytest.fixture
-    def mock_redis_client(self):
-        """Mock Redis client for caching."""
-        with patch("workers.recommendations.set_cache") as mock_set_cache:
+    def mock_redis_client(self, fake_redis):
+        """Mock Redis client for caching and batch run checkpoints."""
+        with (
+            patch("workers.recommendations.set_cache") as mock_set_cache,
+            patch(
+                "src.cache.batch_run.get_redis_client",
+                AsyncMock(return_value=fake_redis),
+            ),
+        ):
             mock_set_cache.return_value = AsyncMock()
             yield mock_set_cache
 
+    @pytest.fixture(autouse=True)
+    def worker_session_factory(self, test_engine):
+        """Point the worker's database sessions at the test database."""
+        with patch(
+            "workers.recommendations.async_session_factory",
+            async_sessionmaker(test_engine, class_=AsyncSession, expire_on_commit=False),
+        ) as session_factory:
+            yield session_factory
+
+    @pytest.fixture(autouse=True)
+    def deliver_tasks(self):
+        """Deliver enqueued tasks to the task handler in-process instead of via Kafka."""
+        from workers.recommendations import handle_recommendation_tasks
+
+        async def deliver(tasks):
+            await handle_recommendation_tasks([task.model_dump(mode="json") for task in tasks])
+
+        with patch(
+            "workers.recommendations.enqueue_tasks", AsyncMock(side_effect=deliver)
+        ) as mock_enqueue:
+            yield mock_enqueue
+
     @pytest.fixture
     def mock_recommendation_service(self):
         """Mock GeminiRecommendationService."""
@@ -28,6 +66,8 @@ class TestKafkaRecommendationsWorker:
             "workers.recommendations.get_recommendation_service"
         ) as mock_service:
             service_instance = AsyncMock()
+            service_instance.result_cache = RecommendationResultCache(ttl=0)
+            service_instance.generate_packed_recommendations = AsyncMock(return_value={})
             service_instance.generate_recommendations = AsyncMock(
                 return_value={
                     "summary": "Вы предпочитаете супы и салаты. Рекомендуем попробовать новые комбинации.",
@@ -42,12 +82,23 @@ class TestKafkaRecommendationsWorker:
 
     @pytest.fixture
     def mock_key_pool(self):
-        """Mock Gemini API key pool."""
+        """Mock Gemini API key pool with one healthy key."""
         with patch("workers.recommendations.get_key_pool") as mock_pool:
             pool_instance = MagicMock()
+            pool_instance.healthy_keys_count = AsyncMock(return_value=1)
+            pool_instance.seconds_until_reset = AsyncMock(return_value=3600)
             mock_pool.return_value = pool_instance
             yield pool_instance
 
+    @pytest.fixture
+    def batch_users(self):
+        """Active users of the batch (tgid 1-8) without touching the database."""
+        with patch(
+            "workers.recommendations.OrderStatsService.get_batch_user_stats",
+            AsyncMock(return_value={tgid: {"orders_count": 5} for tgid in range(1, 9)}),
+        ) as mock_stats:
+            yield mock_stats
+
     @pytest.mark.asyncio
     async def test_generate_recommendations_for_active_user(
         self,
@@ -79,7 +130,7 @@ class TestKafkaRecommendationsWorker:
                 total_price=Decimal("15.00"),
             )
             db_session.add(order)
-        await db_session.commit()
+        await commit_orders(db_session)
 
         # Act: Run batch generation
         from workers.recommendations import generate_recommendations_batch
@@ -133,7 +184,7 @@ class TestKafkaRecommendationsWorker:
                 total_price=Decimal("10.00"),
             )
             db_session.add(order)
-        await db_session.commit()
+        await commit_orders(db_session)
 
         # Act
         from workers.recommendations import generate_recommendations_batch
@@ -172,13 +223,15 @@ class TestKafkaRecommendationsWorker:
                 total_price=Decimal("10.00"),
             )
             db_session.add(order)
-        await db_session.commit()
+        await commit_orders(db_session)
 
         # Mock service to raise error
         with patch(
             "workers.recommendations.get_recommendation_service"
         ) as mock_service:
             service_instance = AsyncMock()
+            service_instance.result_cache = RecommendationResultCache(ttl=0)
+            service_instance.generate_packed_recommendations = AsyncMock(return_value={})
             service_instance.generate_recommendations = AsyncMock(
                 side_effect=Exception("Gemini API error")
             )
@@ -240,13 +293,15 @@ class TestKafkaRecommendationsWorker:
             )
             db_session.add(order)
 
-        await db_session.commit()
+        await commit_orders(db_session)
 
         # Mock service: first user succeeds, second raises AllKeysExhaustedException
         with patch(
             "workers.recommendations.get_recommendation_service"
         ) as mock_service:
             service_instance = AsyncMock()
+            service_instance.result_cache = RecommendationResultCache(ttl=0)
+            service_instance.generate_packed_recommendations = AsyncMock(return_value={})
 
             # First call succeeds, second raises exhausted exception
             service_instance.generate_recommendations = AsyncMock(
@@ -338,7 +393,7 @@ class TestKafkaRecommendationsWorker:
             )
             db_session.add(order)
 
-        await db_session.commit()
+        await commit_orders(db_session)
 
         # Act
         from workers.recommendations import generate_recommendations_batch
@@ -381,7 +436,7 @@ class TestKafkaRecommendationsWorker:
                 total_price=Decimal("10.00"),
             )
             db_session.add(order)
-        await db_session.commit()
+        await commit_orders(db_session)
 
         # Act
         from workers.recommendations import generate_recommendations_batch
@@ -434,7 +489,7 @@ class TestKafkaRecommendationsWorker:
                 total_price=Decimal("10.00"),
             )
             db_session.add(order)
-        await db_session.commit()
+        await commit_orders(db_session)
 
         # Create Kafka event
         event = {"type": "generate_recommendations", "timestamp": datetime.now(timezone.utc)}
@@ -499,7 +554,7 @@ class TestKafkaRecommendationsWorker:
                     total_price=Decimal("10.00"),
                 )
                 db_session.add(order)
-        await db_session.commit()
+        await commit_orders(db_session)
 
         # Act
         from workers.recommendations import generate_recommendations_batch
@@ -509,3 +564,328 @@ class TestKafkaRecommendationsWorker:
         # Assert: Both users should get recommendations
         assert mock_recommendation_service.generate_recommendations.call_count == 2
         assert mock_redis_client.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_batch_runs_users_concurrently_per_healthy_key(
+        self, mock_redis_client, mock_recommendation_service, mock_key_pool, batch_users,
+        monkeypatch,
+    ):
+        """Test that batch concurrency is bounded by healthy keys x in-flight limit."""
+        import asyncio
+
+        from src.config import settings
+
+        in_flight = 0
+        max_in_flight = 0
+
+        async def generate(user_stats):
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return {"summary": "ok", "tips": []}
+
+        monkeypatch.setattr(settings, "GEMINI_MAX_IN_FLIGHT_PER_KEY", 2)
+        # One user per pack, so every user is a separate call
+        monkeypatch.setattr(settings, "GEMINI_PACK_SIZE", 1)
+        mock_key_pool.healthy_keys_count.return_value = 2
+        mock_recommendation_service.generate_recommendations.side_effect = generate
+
+        from workers.recommendations import generate_recommendations_batch
+
+        await generate_recommendations_batch()
+
+        assert mock_recommendation_service.generate_recommendations.call_count == 8
+        assert mock_redis_client.call_count == 8
+        assert max_in_flight == 4
+
+    @pytest.mark.asyncio
+    async def test_batch_packs_users_and_falls_back_per_user(
+        self, mock_redis_client, mock_recommendation_service, mock_key_pool, batch_users,
+        monkeypatch,
+    ):
+        """Test that packed results are used and unparsed users get single calls."""
+        from src.config import settings
+
+        async def generate_packed(pack):
+            # Every pack misses its last user
+            return {tgid: {"summary": "packed", "tips": []} for tgid in list(pack)[:-1]}
+
+        monkeypatch.setattr(settings, "GEMINI_PACK_SIZE", 4)
+        service = mock_recommendation_service
+        service.generate_packed_recommendations.side_effect = generate_packed
+        service.generate_recommendations.return_value = {"summary": "single", "tips": []}
+
+        from workers.recommendations import generate_recommendations_batch
+
+        await generate_recommendations_batch()
+
+        assert service.generate_packed_recommendations.call_count == 2
+        assert service.generate_recommendations.call_count == 2
+        assert mock_redis_client.call_count == 8
+        summaries = [
+            json.loads(call.args[1])["summary"] for call in mock_redis_client.call_args_list
+        ]
+        assert summaries.count("single") == 2
+
+    @pytest.mark.asyncio
+    async def test_batch_resumes_stopped_run(
+        self, mock_redis_client, mock_recommendation_service, mock_key_pool, batch_users,
+        fake_redis, monkeypatch,
+    ):
+        """Test that a run stopped by exhausted keys is retried when a key quota resets."""
+        import asyncio
+
+        from src.cache.batch_run import get_batch_status
+        from src.config import settings
+
+        calls = 0
+
+        async def generate_until_exhausted(user_stats):
+            nonlocal calls
+            calls += 1
+            if calls > 3:
+                raise AllKeysExhaustedException("All keys exhausted")
+            return {"summary": "ok", "tips": []}
+
+        monkeypatch.setattr(settings, "GEMINI_MAX_IN_FLIGHT_PER_KEY", 1)
+        monkeypatch.setattr(settings, "GEMINI_PACK_SIZE", 1)
+        monkeypatch.setattr("src.cache.batch_run.COORDINATOR_TTL", 0.05)
+        mock_recommendation_service.generate_recommendations.side_effect = (
+            generate_until_exhausted
+        )
+
+        with patch("workers.recommendations.scheduler") as scheduler:
+            from workers.recommendations import generate_recommendations_batch
+
+            await generate_recommendations_batch()
+
+            status = await get_batch_status()
+            assert status["status"] == "stopped"
+            assert (status["total"], status["done"], status["remaining"]) == (8, 3, 5)
+            # Every user was enqueued before the keys ran out
+            assert status["cursor"] == 8
+
+            # Retry scheduled just after the first key quota resets
+            retry = scheduler.add_job.call_args
+            assert retry.args[0] is generate_recommendations_batch
+            assert retry.kwargs["trigger"] == "date"
+            delay = (retry.kwargs["run_date"] - datetime.now(timezone.utc)).total_seconds()
+            assert 3600 < delay <= 3660
+
+            # User 8 got recommendations from the API in the meantime
+            fake_redis.data["recommendations:user:8"] = json.dumps({
+                "summary": "manual",
+                "tips": [],
+                "generated_at": datetime.now(timezone.utc).isoformat(),
+            })
+            mock_recommendation_service.generate_recommendations.side_effect = None
+            # The retry fires after the coordinator lock expired
+            await asyncio.sleep(0.06)
+            await retry.args[0]()
+
+        generated = [call.args[0] for call in mock_redis_client.call_args_list]
+        assert generated == [f"recommendations:user:{tgid}" for tgid in range(1, 8)]
+        resumed = await get_batch_status()
+        assert resumed["run_id"] == status["run_id"]
+        assert (resumed["status"], resumed["done"], resumed["failed"]) == ("completed", 8, 0)
+        assert resumed["eta_seconds"] == 0
+
+    @pytest.mark.asyncio
+    async def test_worker_startup_resumes_unfinished_run(
+        self, mock_redis_client, mock_recommendation_service, mock_key_pool, batch_users,
+        monkeypatch,
+    ):
+        """Test that a restarted worker resumes the interrupted run, and only that."""
+        from src.cache.batch_run import STOPPED, BatchRun, get_batch_status
+        from src.config import settings
+
+        monkeypatch.setattr(settings, "GEMINI_PACK_SIZE", 1)
+        batch_users.return_value = {tgid: {"orders_count": 5} for tgid in range(1, 5)}
+
+        from workers.recommendations import resume_recommendations_batch
+
+        # Nothing to resume
+        await resume_recommendations_batch()
+        assert not batch_users.called
+
+        # The worker died after two users
+        run = await BatchRun.open(total=4)
+        await run.mark_done(1)
+        await run.mark_done(2)
+        await run.finish(STOPPED)
+
+        await resume_recommendations_batch()
+
+        generated = [call.args[0] for call in mock_redis_client.call_args_list]
+        assert generated == ["recommendations:user:3", "recommendations:user:4"]
+        status = await get_batch_status()
+        assert (status["run_id"], status["status"], status["done"]) == (run.run_id, "completed", 4)
+
+    @pytest.mark.asyncio
+    async def test_only_elected_replica_enqueues(
+        self, mock_redis_client, mock_recommendation_service, mock_key_pool, batch_users,
+        deliver_tasks, monkeypatch,
+    ):
+        """Test that replicas triggered together enqueue the batch once."""
+        import asyncio
+
+        from src.config import settings
+
+        monkeypatch.setattr(settings, "GEMINI_PACK_SIZE", 1)
+        batch_users.return_value = {tgid: {"orders_count": 5} for tgid in range(1, 5)}
+
+        from workers.recommendations import generate_recommendations_batch
+
+        await asyncio.gather(generate_recommendations_batch(), generate_recommendations_batch())
+
+        assert deliver_tasks.call_count == 1
+        assert [task.tgid for task in deliver_tasks.call_args.args[0]] == [1, 2, 3, 4]
+        assert mock_recommendation_service.generate_recommendations.call_count == 4
+
+    @pytest.mark.asyncio
+    async def test_redelivered_tasks_are_processed_once(
+        self, mock_redis_client, mock_recommendation_service, mock_key_pool, monkeypatch
+    ):
+        """Test that a task delivered to two replicas generates recommendations once."""
+        import asyncio
+
+        from src.cache.batch_run import BatchRun, get_batch_status
+        from src.config import settings
+
+        monkeypatch.setattr(settings, "GEMINI_PACK_SIZE", 1)
+        mock_key_pool.healthy_keys_count.return_value = 2
+        run = await BatchRun.open(total=4)
+        tasks = [
+            {"run_id": run.run_id, "tgid": tgid, "stats": {"orders_count": 5}}
+            for tgid in range(1, 5)
+        ]
+
+        from workers.recommendations import handle_recommendation_tasks
+
+        await asyncio.gather(
+            handle_recommendation_tasks(tasks), handle_recommendation_tasks(tasks[::-1])
+        )
+        # Redelivery after the run finished
+        await handle_recommendation_tasks(tasks[:2])
+
+        assert mock_recommendation_service.generate_recommendations.call_count == 4
+        assert mock_redis_client.call_count == 4
+        status = await get_batch_status()
+        assert (status["status"], status["done"]) == ("completed", 4)
+
+    @pytest.mark.asyncio
+    async def test_task_of_dead_claimer_is_taken_over(
+        self, mock_redis_client, mock_recommendation_service, mock_key_pool, monkeypatch
+    ):
+        """Test that a redelivered task waits out the claim of a crashed replica."""
+        from src.cache.batch_run import BatchRun, get_batch_status
+
+        monkeypatch.setattr("src.cache.batch_run.CLAIM_TTL", 0.2)
+        monkeypatch.setattr("src.cache.batch_run.CLAIM_POLL_INTERVAL", 0.05)
+        monkeypatch.setattr("workers.recommendations.CLAIM_TTL", 0.2)
+        run = await BatchRun.open(total=1)
+        # The replica that got the task first claimed the user and died
+        assert await run.claim(1)
+        tasks = [{"run_id": run.run_id, "tgid": 1, "stats": {"orders_count": 5}}]
+
+        from workers.recommendations import handle_recommendation_tasks
+
+        # Kafka redelivers the uncommitted task to another replica
+        await handle_recommendation_tasks(tasks)
+
+        assert mock_recommendation_service.generate_recommendations.call_count == 1
+        status = await get_batch_status()
+        assert (status["status"], status["done"]) == ("completed", 1)
+
+    @pytest.mark.asyncio
+    async def test_failing_worker_cancels_siblings_before_releasing_claims(
+        self, mock_redis_client, mock_recommendation_service, mock_key_pool, monkeypatch
+    ):
+        """Test that claims are released only after every worker stopped."""
+        import asyncio
+
+        from src.cache.batch_run import BatchRun
+        from src.config import settings
+
+        monkeypatch.setattr(settings, "GEMINI_MAX_IN_FLIGHT_PER_KEY", 2)
+        monkeypatch.setattr(settings, "GEMINI_PACK_SIZE", 2)
+        events = []
+
+        async def generate_packed(pack):
+            if 1 in pack:
+                raise RuntimeError("Redis unavailable")
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                events.append("cancelled")
+                raise
+
+        async def release(self, tgid):
+            events.append(f"release {tgid}")
+
+        mock_recommendation_service.generate_packed_recommendations.side_effect = generate_packed
+        monkeypatch.setattr(BatchRun, "release", release)
+        run = await BatchRun.open(total=4)
+        tasks = [
+            {"run_id": run.run_id, "tgid": tgid, "stats": {"orders_count": 5}}
+            for tgid in range(1, 5)
+        ]
+
+        from workers.recommendations import handle_recommendation_tasks
+
+        with pytest.raises(ExceptionGroup):
+            await handle_recommendation_tasks(tasks)
+
+        assert events == ["cancelled", "release 1", "release 2", "release 3", "release 4"]
+        assert not mock_redis_client.called
+
+    @pytest.mark.asyncio
+    async def test_failed_batch_is_rewound_on_every_partition(
+        self, mock_redis_client, monkeypatch
+    ):
+        """Test that a batch whose handler raised is consumed again from its first tasks."""
+        from aiokafka import TopicPartition
+        from redis.exceptions import ConnectionError as RedisConnectionError
+
+        from src.cache.batch_run import BatchRun
+
+        monkeypatch.setattr(
+            BatchRun, "load", AsyncMock(side_effect=RedisConnectionError("Redis unavailable"))
+        )
+        tasks = [
+            {"run_id": "run", "tgid": tgid, "stats": {"orders_count": 5}} for tgid in range(1, 5)
+        ]
+        message = MagicMock()
+        message.raw_message = tuple(
+            MagicMock(topic="tasks", partition=partition, offset=offset)
+            for partition, offset in ((0, 7), (1, 3), (0, 8), (1, 4))
+        )
+
+        from workers.recommendations import handle_recommendation_tasks
+
+        with pytest.raises(RedisConnectionError):
+            await handle_recommendation_tasks(tasks, message)
+
+        seeks = {call.args for call in message.consumer.seek.call_args_list}
+        assert seeks == {(TopicPartition("tasks", 0), 7), (TopicPartition("tasks", 1), 3)}
+
+
+@pytest.mark.asyncio
+async def test_enqueue_tasks_keys_messages_by_tgid():
+    """Test that tasks are published to the partitioned topic keyed by tgid."""
+    from src.kafka.events import RecommendationTaskEvent
+    from workers.recommendations import TASKS_TOPIC, broker, enqueue_tasks
+
+    tasks = [
+        RecommendationTaskEvent(run_id="run", tgid=tgid, stats={"orders_count": 5})
+        for tgid in (101, 202)
+    ]
+
+    with patch.object(broker, "publish", AsyncMock()) as publish:
+        await enqueue_tasks(tasks)
+
+    assert [call.kwargs["key"] for call in publish.call_args_list] == [b"101", b"202"]
+    assert {call.kwargs["topic"] for call in publish.call_args_list} == {TASKS_TOPIC}
+    assert publish.call_args_list[0].args[0]["tgid"] == 101
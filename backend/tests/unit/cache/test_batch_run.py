@@ -0,0 +1,154 @@
+"""Unit tests for recommendations batch run checkpoints."""
+
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from src.cache.batch_run import (
+    COMPLETED,
+    RUN_MAX_AGE,
+    STOPPED,
+    BatchRun,
+    elect_coordinator,
+    get_batch_status,
+)
+
+
+@pytest.fixture
+def redis(fake_redis):
+    with patch("src.cache.batch_run.get_redis_client", AsyncMock(return_value=fake_redis)):
+        yield fake_redis
+
+
+def cached(generated_at: datetime) -> str:
+    return json.dumps({"summary": "s", "tips": [], "generated_at": generated_at.isoformat()})
+
+
+async def test_open_starts_new_run(redis):
+    run = await BatchRun.open(total=5)
+
+    assert not run.resumed
+    status = await get_batch_status()
+    assert status["run_id"] == run.run_id
+    assert (status["status"], status["total"], status["remaining"]) == ("running", 5, 5)
+    assert status["cursor"] is None
+
+
+async def test_stopped_run_is_resumed(redis):
+    first = await BatchRun.open(total=3)
+    await first.mark_done(1)
+    await first.advance(cursor=2)
+    await first.finish(STOPPED)
+
+    run = await BatchRun.open(total=3)
+
+    assert run.resumed
+    assert run.run_id == first.run_id
+    assert await run.pending([1, 2, 3]) == [2, 3]
+    assert (await run.status())["cursor"] == 2
+
+
+async def test_completed_or_old_run_is_not_resumed(redis):
+    completed = await BatchRun.open(total=1)
+    await completed.finish(COMPLETED)
+    stale = await BatchRun.open(total=1)
+    assert stale.run_id != completed.run_id
+
+    await stale.finish(STOPPED)
+    run = await BatchRun.open(total=1, now=time.time() + RUN_MAX_AGE)
+    assert run.run_id != stale.run_id
+    assert not run.resumed
+
+
+async def test_pending_skips_users_cached_after_run_start(redis):
+    run = await BatchRun.open(total=3)
+    started = datetime.fromtimestamp(run.started_at, timezone.utc)
+    redis.data["recommendations:user:1"] = cached(started + timedelta(minutes=5))
+    redis.data["recommendations:user:2"] = cached(started - timedelta(hours=1))
+    redis.data["recommendations:user:3"] = "not json"
+
+    assert await run.pending([1, 2, 3]) == [2, 3]
+    assert (await run.status())["done"] == 1
+
+
+async def test_failed_user_is_retried_and_cleared_on_success(redis):
+    run = await BatchRun.open(total=2)
+    await run.mark_done(1)
+    await run.mark_failed(2)
+
+    assert await run.pending([1, 2]) == [2]
+
+    await run.mark_done(2)
+    status = await run.status()
+    assert (status["done"], status["failed"], status["remaining"]) == (2, 0, 0)
+
+
+async def test_eta_from_throughput_since_resume(redis):
+    run = await BatchRun.open(total=10, now=time.time() - 10)
+    for tgid in range(1, 6):
+        await run.mark_done(tgid)
+
+    status = await run.status()
+
+    # 5 users in ~10s, 5 left
+    assert 9 <= status["eta_seconds"] <= 11
+
+
+async def test_user_is_claimed_once(redis):
+    run = await BatchRun.open(total=2)
+
+    assert await run.claim(1)
+    assert not await run.claim(1)
+
+    await run.release(1)
+    assert await run.claim(1)
+
+    await run.mark_done(2)
+    assert not await run.claim(2)
+
+
+async def test_claim_waits_for_expiry_of_unrefreshed_claim(redis, monkeypatch):
+    monkeypatch.setattr("src.cache.batch_run.CLAIM_TTL", 0.1)
+    monkeypatch.setattr("src.cache.batch_run.CLAIM_POLL_INTERVAL", 0.02)
+    run = await BatchRun.open(total=1)
+    assert await run.claim(1)
+
+    assert not await run.claim(1)
+    assert await run.claim(1, wait=0.5)
+
+
+async def test_refreshed_claim_is_not_taken_over(redis, monkeypatch):
+    monkeypatch.setattr("src.cache.batch_run.CLAIM_TTL", 0.1)
+    monkeypatch.setattr("src.cache.batch_run.CLAIM_POLL_INTERVAL", 0.02)
+    run = await BatchRun.open(total=1)
+    assert await run.claim(1)
+
+    async def owner():
+        for _ in range(5):
+            await asyncio.sleep(0.05)
+            await run.refresh_claims([1])
+
+    taken, _ = await asyncio.gather(run.claim(1, wait=0.2), owner())
+    assert not taken
+
+
+async def test_load_existing_run(redis):
+    run = await BatchRun.open(total=1)
+
+    loaded = await BatchRun.load(run.run_id)
+
+    assert (loaded.run_id, loaded.started_at) == (run.run_id, run.started_at)
+    assert await BatchRun.load("missing") is None
+
+
+async def test_single_coordinator(redis):
+    assert await elect_coordinator()
+    assert not await elect_coordinator()
+
+
+async def test_no_status_without_run(redis):
+    assert await get_batch_status() is None
@@ -0,0 +1,118 @@
+"""Unit tests for the process-local versioned cache."""
+
+from datetime import datetime, timedelta
+
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from src.cache.local_cache import ExpiringLocalCache, LocalCache
+
+
+@pytest.fixture
+def mock_redis():
+    """Mock Redis client used by the local cache."""
+    with patch("src.cache.local_cache.get_redis_client") as mock:
+        redis_mock = AsyncMock()
+        mock.return_value = redis_mock
+        yield redis_mock
+
+
+async def test_get_caches_by_version(mock_redis):
+    """Test loader runs once while the Redis version is unchanged."""
+    cache = LocalCache("menu")
+    loader = AsyncMock(return_value="menu-v1")
+    mock_redis.get.return_value = "3"
+
+    assert await cache.get(1, loader) == "menu-v1"
+    assert await cache.get(1, loader) == "menu-v1"
+
+    loader.assert_awaited_once()
+
+
+async def test_get_reloads_after_version_bump(mock_redis):
+    """Test a new version in Redis makes the local entry stale."""
+    cache = LocalCache("menu")
+    loader = AsyncMock(side_effect=["menu-v1", "menu-v2"])
+    mock_redis.get.side_effect = ["3", "4"]
+
+    assert await cache.get(1, loader) == "menu-v1"
+    assert await cache.get(1, loader) == "menu-v2"
+
+
+async def test_get_skips_redis_while_listening(mock_redis):
+    """Test entries are served without Redis calls when the listener is subscribed."""
+    cache = LocalCache("menu")
+    loader = AsyncMock(return_value="menu")
+    mock_redis.get.return_value = None
+
+    await cache.get(1, loader)
+    cache._listening = True
+    mock_redis.get.reset_mock()
+
+    assert await cache.get(1, loader) == "menu"
+    mock_redis.get.assert_not_called()
+
+
+async def test_get_bypasses_cache_when_redis_unavailable(mock_redis):
+    """Test reads fall back to the loader and nothing is cached without Redis."""
+    cache = LocalCache("menu")
+    loader = AsyncMock(return_value="menu")
+    mock_redis.get.side_effect = RedisConnectionError("down")
+
+    assert await cache.get(1, loader) == "menu"
+    assert await cache.get(1, loader) == "menu"
+    assert loader.await_count == 2
+
+
+async def test_invalidate_bumps_version_and_publishes(mock_redis):
+    """Test invalidate increments the version counter and notifies other processes."""
+    cache = LocalCache("menu")
+    mock_redis.get.return_value = "1"
+    await cache.get(7, AsyncMock(return_value="menu"))
+
+    await cache.invalidate(7)
+
+    mock_redis.incr.assert_awaited_once_with("menu:version:7")
+    mock_redis.publish.assert_awaited_once_with("menu:invalidate", "7")
+    assert 7 not in cache._entries
+
+
+async def test_evict_during_load_discards_result(mock_redis):
+    """Test a load that raced an invalidation is not stored."""
+    cache = LocalCache("menu")
+    mock_redis.get.return_value = "1"
+
+    async def loader():
+        cache.evict(1)
+        return "stale"
+
+    assert await cache.get(1, loader) == "stale"
+    assert 1 not in cache._entries
+
+
+async def test_expiring_cache_serves_until_expiry(mock_redis):
+    """Test keyed values are reused until their own expiry time."""
+    cache = ExpiringLocalCache(LocalCache("availability"))
+    mock_redis.get.return_value = "1"
+    now = datetime(2030, 1, 6, 9, 0)
+    loader = AsyncMock(side_effect=[("a-1", now + timedelta(hours=1)), ("a-2", now)])
+
+    assert await cache.get("a", loader, now) == "a-1"
+    assert await cache.get("a", loader, now + timedelta(minutes=59)) == "a-1"
+    assert await cache.get("a", loader, now + timedelta(hours=1)) == "a-2"
+    assert loader.await_count == 2
+
+
+async def test_expiring_cache_dropped_on_version_bump(mock_redis):
+    """Test a new version of the backing entry drops every keyed value."""
+    cache = ExpiringLocalCache(LocalCache("availability"))
+    mock_redis.get.side_effect = ["1", "1", "2", "2"]
+    now = datetime(2030, 1, 6, 9, 0)
+    expires_at = now + timedelta(hours=1)
+
+    assert await cache.get("a", AsyncMock(return_value=("a-1", expires_at)), now) == "a-1"
+    assert await cache.get("b", AsyncMock(return_value=("b-1", expires_at)), now) == "b-1"
+    assert await cache.get("a", AsyncMock(return_value=("a-2", expires_at)), now) == "a-2"
+    assert await cache.get("b", AsyncMock(return_value=("b-2", expires_at)), now) == "b-2"
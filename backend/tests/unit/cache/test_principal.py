@@ -0,0 +1,64 @@
+"""Unit tests for the authenticated principal cache."""
+
+from decimal import Decimal
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from src.cache.principal import get_principal, invalidate_principal
+from src.models import User
+
+
+@pytest.fixture
+def redis(fake_redis):
+    """Shared tier backed by FakeRedis; the local tier is bypassed."""
+    with (
+        patch("src.cache.principal.get_redis_client", AsyncMock(return_value=fake_redis)),
+        patch(
+            "src.cache.local_cache.get_redis_client",
+            AsyncMock(side_effect=RedisConnectionError("down")),
+        ),
+    ):
+        yield fake_redis
+
+
+def _user(**overrides) -> User:
+    fields = dict(
+        tgid=42, name="Test", office="HQ", role="user", is_active=True,
+        weekly_limit=Decimal("100.00"),
+    )
+    fields.update(overrides)
+    return User(**fields)
+
+
+async def test_principal_served_from_redis(redis):
+    """Test the database is only queried on the first lookup."""
+    load_user = AsyncMock(return_value=_user())
+
+    first = await get_principal(42, load_user)
+    second = await get_principal(42, load_user)
+
+    load_user.assert_awaited_once()
+    assert "principal:42" in redis.data
+    assert (second.tgid, second.role, second.is_active) == (42, "user", True)
+    assert second.weekly_limit == first.weekly_limit == Decimal("100.00")
+
+
+async def test_invalidate_reloads_principal(redis):
+    """Test invalidation makes the next lookup hit the database."""
+    load_user = AsyncMock(side_effect=[_user(), _user(is_active=False)])
+
+    assert (await get_principal(42, load_user)).is_active is True
+    await invalidate_principal(42)
+
+    assert (await get_principal(42, load_user)).is_active is False
+    assert load_user.await_count == 2
+
+
+async def test_missing_user_not_cached(redis):
+    """Test unknown users are not cached, so approved users can log in at once."""
+    load_user = AsyncMock(return_value=None)
+
+    assert await get_principal(42, load_user) is None
+    assert redis.data == {}
@@ -0,0 +1,73 @@
+"""Unit tests for weekly spend counters."""
+
+from datetime import date
+from decimal import Decimal
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from src.cache.spend_counter import adjust_spent, get_spent
+
+
+class ScriptRedis:
+    """Dict-backed Redis emulating the adjust script."""
+
+    def __init__(self):
+        self.data: dict[str, int] = {}
+
+    async def get(self, key):
+        value = self.data.get(key)
+        return None if value is None else str(value)
+
+    async def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = int(value)
+        return True
+
+    async def eval(self, script, numkeys, key, delta, limit):
+        if key not in self.data:
+            return [-1, 0]
+        current = self.data[key]
+        if delta > 0 and limit >= 0 and current + delta > limit:
+            return [0, current]
+        self.data[key] = current + delta
+        return [1, self.data[key]]
+
+
+@pytest.fixture
+def redis():
+    redis = ScriptRedis()
+    with patch("src.cache.spend_counter.get_redis_client", AsyncMock(return_value=redis)):
+        yield redis
+
+
+async def test_adjust_seeds_and_enforces_limit(redis):
+    """Test missing counter is seeded once and the limit is checked atomically."""
+    load_spent = AsyncMock(return_value=Decimal("10.00"))
+    wednesday = date(2030, 1, 2)
+
+    applied, spent = await adjust_spent(1, wednesday, Decimal("5.50"), Decimal("20"), load_spent)
+    assert (applied, spent) == (True, Decimal("15.50"))
+    assert redis.data == {"spend:1:2029-12-31": 1550}
+
+    # Same week, different day: over the limit, counter unchanged
+    applied, spent = await adjust_spent(
+        1, date(2030, 1, 5), Decimal("5.00"), Decimal("20"), load_spent
+    )
+    assert (applied, spent) == (False, Decimal("15.50"))
+
+    # Decreases are never blocked
+    applied, spent = await adjust_spent(1, wednesday, Decimal("-15.50"), Decimal("0"), load_spent)
+    assert (applied, spent) == (True, Decimal("0.00"))
+    load_spent.assert_awaited_once()
+
+    assert await get_spent(1, wednesday, load_spent) == Decimal("0.00")
+
+
+async def test_adjust_without_loader_skips_missing_counter(redis):
+    """Test refunds do not create a counter with a partial value."""
+    applied, _ = await adjust_spent(1, date(2030, 1, 2), Decimal("-5.00"))
+
+    assert applied is True
+    assert redis.data == {}
@@ -0,0 +1,43 @@
+"""Unit tests for pooled Gemini clients against the local fake server."""
+
+from unittest.mock import AsyncMock
+
+import pytest
+
+from src.gemini.client import GeminiRecommendationService
+from src.gemini.client_pool import GeminiClientPool
+from tests.fake_gemini import FakeGeminiServer
+
+
+@pytest.fixture
+async def fake_gemini():
+    async with FakeGeminiServer() as server:
+        yield server
+
+
+@pytest.fixture
+def key_pool():
+    pool = AsyncMock()
+    pool.keys = ["test_key_1", "test_key_2"]
+    pool.acquire_key.side_effect = [(0, "test_key_1"), (1, "test_key_2")] * 3
+    return pool
+
+
+async def test_clients_are_reused_across_calls(fake_gemini, key_pool):
+    """Test that each key gets one client whose connection is reused."""
+    clients = GeminiClientPool(base_url=fake_gemini.base_url)
+    service = GeminiRecommendationService(key_pool, client_pool=clients)
+
+    results = [await service.generate_recommendations({"orders_count": 5}) for _ in range(6)]
+
+    assert results[0] == {
+        "summary": "Вы предпочитаете супы и салаты.",
+        "tips": ["Попробуйте новое горячее блюдо"],
+    }
+    assert fake_gemini.requests == 6
+    assert fake_gemini.api_keys == ["test_key_1", "test_key_2"] * 3
+    assert len(clients) == 2
+    assert fake_gemini.connections == 2
+
+    await service.close()
+    assert len(clients) == 0
@@ -6,34 +6,56 @@ from unittest.mock import AsyncMock, patch
 from src.gemini.key_pool import AllKeysExhaustedException, GeminiAPIKeyPool
 
 
-@pytest.fixture
-def mock_redis():
-    """Mock Redis client for testing."""
-    with patch("src.gemini.key_pool.get_redis_client") as mock:
-        redis_mock = AsyncMock()
-        mock.return_value = redis_mock
-        yield redis_mock
-
-
-@pytest.fixture
-def mock_get_int():
-    """Mock get_int function."""
-    with patch("src.gemini.key_pool.get_int") as mock:
-        yield mock
-
-
-@pytest.fixture
-def mock_increment():
-    """Mock increment function."""
-    with patch("src.gemini.key_pool.increment") as mock:
-        yield mock
+class ScriptRedis:
+    """Dict-backed Redis emulating the key selection script."""
+
+    def __init__(self):
+        self.data: dict[str, str] = {}
+        self.ttls: dict[str, int] = {}
+        self.rotation_log: list[str] = []
+        self.calls = 0
+
+    async def set(self, key, value):
+        self.calls += 1
+        self.data[key] = str(value)
+
+    async def mget(self, keys):
+        self.calls += 1
+        return [self.data.get(key) for key in keys]
+
+    async def ttl(self, key):
+        return self.ttls.get(key, -1 if key in self.data else -2)
+
+    async def eval(self, script, numkeys, *args):
+        self.calls += 1
+        keys, argv = args[:numkeys], args[numkeys:]
+        n, max_requests, ttl, consume, timestamp = argv
+        cursor_key, usage_keys, invalid_keys = keys[0], keys[1:1 + n], keys[1 + n:1 + 2 * n]
+        cursor = int(self.data.get(cursor_key, 0)) % n
+        first = 0 if consume else 1
+        for offset in range(first, first + n):
+            index = (cursor + offset) % n
+            if self.data.get(invalid_keys[index]) == "1":
+                continue
+            if int(self.data.get(usage_keys[index], 0)) >= max_requests:
+                continue
+            if offset > first:
+                self.rotation_log.insert(0, f"{timestamp} key{cursor}->key{index}")
+            if consume:
+                self.data[usage_keys[index]] = str(int(self.data.get(usage_keys[index], 0)) + 1)
+                self.ttls.setdefault(usage_keys[index], ttl)
+                self.data[cursor_key] = str((index + 1) % n)
+            else:
+                self.data[cursor_key] = str(index)
+            return index
+        return -1
 
 
 @pytest.fixture
-def mock_set_cache():
-    """Mock set_cache function."""
-    with patch("src.gemini.key_pool.set_cache") as mock:
-        yield mock
+def redis():
+    redis = ScriptRedis()
+    with patch("src.gemini.key_pool.get_redis_client", AsyncMock(return_value=redis)):
+        yield redis
 
 
 @pytest.fixture
@@ -45,110 +67,93 @@ def key_pool():
     )
 
 
-async def test_get_api_key_returns_key(key_pool, mock_redis, mock_get_int, mock_increment):
-    """Test that get_api_key returns a valid key."""
-    # Setup mocks
-    mock_get_int.side_effect = [0, 50]  # current_index=0, usage_count=50
-    mock_redis.get.return_value = None  # key is not invalid
-    mock_increment.return_value = 51
-
+async def test_get_api_key_returns_key(key_pool, redis):
+    """Test that get_api_key returns a valid key and counts the request in one call."""
     key = await key_pool.get_api_key()
 
     assert key == "test_key_1"
-    mock_increment.assert_called_once()
+    assert redis.data["gemini:usage:0"] == "1"
+    assert redis.ttls["gemini:usage:0"] == 86400
+    assert redis.calls == 1
 
 
-async def test_rotate_key_switches_to_next(
-    key_pool, mock_redis, mock_get_int, mock_set_cache
-):
-    """Test that rotate_key switches to the next available key."""
-    # Current index is 0, next is 1
-    mock_get_int.side_effect = [0, 10]  # current_index=0, usage_count=10
-    mock_redis.get.return_value = None  # key is not invalid
+async def test_get_api_key_spreads_over_keys(key_pool, redis):
+    """Test that consecutive requests go round-robin over the keys."""
+    keys = [await key_pool.get_api_key() for _ in range(4)]
+
+    assert keys == ["test_key_1", "test_key_2", "test_key_3", "test_key_1"]
+    assert redis.rotation_log == []
+
 
+async def test_rotate_key_switches_to_next(key_pool, redis):
+    """Test that rotate_key switches to the next available key."""
     new_key = await key_pool.rotate_key()
 
     assert new_key == "test_key_2"
-    mock_set_cache.assert_called_once_with("gemini:current_key_index", "1")
+    assert redis.data["gemini:current_key_index"] == "1"
+    assert "gemini:usage:1" not in redis.data
 
 
-async def test_all_keys_exhausted_raises_exception(
-    key_pool, mock_redis, mock_get_int
-):
+async def test_all_keys_exhausted_raises_exception(key_pool, redis):
     """Test that AllKeysExhaustedException is raised when all keys are exhausted."""
-    # Current index is 0, all keys have usage >= 195
-    mock_get_int.side_effect = [
-        0,          # current_index
-        195,        # key 0 usage
-        195,        # key 1 usage
-        195,        # key 2 usage
-    ]
-    mock_redis.get.return_value = None  # no keys are invalid
+    for i in range(3):
+        redis.data[f"gemini:usage:{i}"] = "195"
 
     with pytest.raises(AllKeysExhaustedException):
         await key_pool.rotate_key()
+    with pytest.raises(AllKeysExhaustedException):
+        await key_pool.get_api_key()
 
 
-async def test_mark_key_invalid(key_pool, mock_redis):
+async def test_mark_key_invalid(key_pool, redis):
     """Test marking a key as invalid."""
     await key_pool.mark_key_invalid(1)
 
-    mock_redis.set.assert_called_once_with("gemini:invalid:1", "1")
+    assert redis.data == {"gemini:invalid:1": "1"}
 
 
-async def test_get_api_key_rotates_when_limit_reached(
-    key_pool, mock_redis, mock_get_int, mock_increment, mock_set_cache
-):
+async def test_get_api_key_rotates_when_limit_reached(key_pool, redis):
     """Test that get_api_key automatically rotates when usage limit is reached."""
-    # Current key has 195 requests (limit reached), should rotate to next
-    mock_get_int.side_effect = [
-        0,      # current_index (initial)
-        195,    # usage_count (limit reached, triggers rotation)
-        0,      # current_index (for rotation)
-        10,     # usage for next key (key 1) - available
-    ]
-    mock_redis.get.return_value = None  # no keys are invalid
-    mock_increment.return_value = 11
+    redis.data["gemini:usage:0"] = "195"
 
     key = await key_pool.get_api_key()
 
-    # Should have rotated to key 2 (index 1)
     assert key == "test_key_2"
-    # Check that set_cache was called to update the index
-    assert any(call[0][0] == "gemini:current_key_index" and call[0][1] == "1"
-               for call in mock_set_cache.call_args_list)
+    assert redis.data["gemini:usage:1"] == "1"
+    assert redis.data["gemini:current_key_index"] == "2"
+    assert len(redis.rotation_log) == 1
+    assert redis.rotation_log[0].endswith("key0->key1")
 
 
-async def test_get_api_key_skips_invalid_keys(
-    key_pool, mock_redis, mock_get_int, mock_increment, mock_set_cache
-):
+async def test_get_api_key_skips_invalid_keys(key_pool, redis):
     """Test that get_api_key skips keys marked as invalid."""
-    # Current key (0) is marked invalid, should rotate to next
-    mock_get_int.side_effect = [
-        0,      # current_index (initial)
-        50,     # usage_count (not at limit)
-        0,      # current_index (for rotation when invalid)
-        10,     # usage for next valid key (key 1)
-    ]
-    # First call: key 0 is invalid, second call: key 1 is invalid, third call: key 2 is valid
-    mock_redis.get.side_effect = ["1", "1", None, None]
-    mock_increment.return_value = 11
+    await key_pool.mark_key_invalid(0)
+    await key_pool.mark_key_invalid(1)
 
-    key = await key_pool.get_api_key()
+    key_index, key = await key_pool.acquire_key()
+
+    assert (key_index, key) == (2, "test_key_3")
 
-    # Should have rotated to key 3 (index 2) (skipping invalid keys 0 and 1)
-    assert key == "test_key_3"
 
+async def test_quota_is_never_exceeded(redis):
+    """Test that the per-key limit holds across many requests."""
+    key_pool = GeminiAPIKeyPool(keys=["a", "b"], max_requests_per_key=3)
+
+    keys = [await key_pool.get_api_key() for _ in range(6)]
+    with pytest.raises(AllKeysExhaustedException):
+        await key_pool.get_api_key()
 
-async def test_get_pool_status(key_pool, mock_redis, mock_get_int):
-    """Test getting pool status."""
-    mock_get_int.side_effect = [
-        0,      # current_index
-        50,     # usage key 0
-        100,    # usage key 1
-        10,     # usage key 2
-    ]
-    mock_redis.get.side_effect = [None, "1", None]  # key 1 is invalid
+    assert sorted(keys) == ["a", "a", "a", "b", "b", "b"]
+
+
+async def test_get_pool_status(key_pool, redis):
+    """Test getting pool status with a single read."""
+    redis.data.update({
+        "gemini:usage:0": "50",
+        "gemini:usage:1": "100",
+        "gemini:usage:2": "10",
+        "gemini:invalid:1": "1",
+    })
 
     status = await key_pool.get_pool_status()
 
@@ -157,9 +162,34 @@ async def test_get_pool_status(key_pool, mock_redis, mock_get_int):
     assert status["max_requests_per_key"] == 195
     assert status["usage_counts"] == {0: 50, 1: 100, 2: 10}
     assert status["invalid_keys"] == [1]
+    assert redis.calls == 1
+
+
+async def test_healthy_keys_count(key_pool, redis):
+    """Test that exhausted and invalid keys are not counted as healthy."""
+    redis.data.update({
+        "gemini:usage:0": "195",
+        "gemini:usage:1": "100",
+        "gemini:invalid:2": "1",
+    })
+
+    assert await key_pool.healthy_keys_count() == 1
 
 
 def test_key_pool_requires_non_empty_keys():
     """Test that GeminiAPIKeyPool raises ValueError with empty keys."""
     with pytest.raises(ValueError, match="API keys list cannot be empty"):
         GeminiAPIKeyPool(keys=[])
+
+
+async def test_seconds_until_reset_of_first_exhausted_key(key_pool, redis):
+    """Test that the wait is the shortest remaining TTL of an exhausted key."""
+    assert await key_pool.seconds_until_reset() is None
+
+    redis.data.update({"gemini:usage:0": "195", "gemini:usage:1": "195", "gemini:usage:2": "10"})
+    redis.ttls.update({"gemini:usage:0": 5000, "gemini:usage:1": 1200, "gemini:usage:2": 100})
+    assert await key_pool.seconds_until_reset() == 1200
+
+    # Invalid keys never reset
+    redis.data["gemini:invalid:1"] = "1"
+    assert await key_pool.seconds_until_reset() == 5000
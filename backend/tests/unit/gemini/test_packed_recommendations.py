@@ -0,0 +1,72 @@
+"""Unit tests for multi-user packed Gemini requests."""
+
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from src.gemini.client import GeminiRecommendationService
+from src.gemini.client_pool import GeminiClientPool
+from src.gemini.result_cache import RecommendationResultCache
+from tests.fake_gemini import FakeGeminiServer
+
+
+def packed_reply(prompt: str):
+    """Answer id=1 correctly, id=2 without tips list, skip id=3."""
+    return [
+        {"id": "1", "summary": "Резюме 1", "tips": ["Совет"]},
+        {"id": 2, "summary": "Резюме 2", "tips": "не список"},
+        {"summary": "без id", "tips": []},
+    ]
+
+
+@pytest.fixture
+async def service(fake_redis):
+    key_pool = AsyncMock()
+    key_pool.keys = ["test_key_1"]
+    key_pool.acquire_key.return_value = (0, "test_key_1")
+
+    async with FakeGeminiServer(response=packed_reply) as server:
+        service = GeminiRecommendationService(
+            key_pool,
+            client_pool=GeminiClientPool(base_url=server.base_url),
+            result_cache=RecommendationResultCache(ttl=3600),
+        )
+        with patch("src.gemini.result_cache.get_redis_client", AsyncMock(return_value=fake_redis)):
+            yield service, server
+        await service.close()
+
+
+async def test_packed_request_returns_parsed_users_only(service):
+    """Test one request for the group, with unusable entries left for fallback."""
+    service, server = service
+    users = {
+        101: {"orders_count": 5},
+        102: {"orders_count": 6},
+        103: {"orders_count": 7},
+        104: {"orders_count": 5},  # same prompt as 101
+    }
+
+    results = await service.generate_packed_recommendations(users)
+
+    assert server.requests == 1
+    assert "id=1" in server.prompts[0] and "id=3" in server.prompts[0]
+    assert "id=4" not in server.prompts[0]
+    expected = {"summary": "Резюме 1", "tips": ["Совет"]}
+    assert results == {101: expected, 104: expected}
+
+    # Parsed results are cached under the single-user fingerprint
+    assert await service.generate_recommendations({"orders_count": 5}) == expected
+    assert server.requests == 1
+
+
+async def test_unparseable_packed_response_falls_back(service):
+    """Test that a non-JSON packed reply yields no results instead of an error."""
+    service, server = service
+    server.response = lambda prompt: "not json"
+
+    results = await service.generate_packed_recommendations(
+        {1: {"orders_count": 5}, 2: {"orders_count": 6}}
+    )
+
+    assert results == {}
+    assert server.requests == 1
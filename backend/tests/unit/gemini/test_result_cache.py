@@ -0,0 +1,78 @@
+"""Unit tests for the Gemini result cache keyed by prompt fingerprint."""
+
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from src.gemini.client import GeminiRecommendationService
+from src.gemini.client_pool import GeminiClientPool
+from src.gemini.result_cache import RecommendationResultCache
+from tests.fake_gemini import FakeGeminiServer
+
+
+def make_stats(categories: dict, favorites: list) -> dict:
+    return {
+        "orders_count": 10,
+        "categories": categories,
+        "unique_dishes": 3,
+        "total_dishes_available": 20,
+        "favorite_dishes": favorites,
+    }
+
+
+@pytest.fixture
+async def service(fake_redis):
+    key_pool = AsyncMock()
+    key_pool.keys = ["test_key_1"]
+    key_pool.acquire_key.return_value = (0, "test_key_1")
+
+    async with FakeGeminiServer() as server:
+        service = GeminiRecommendationService(
+            key_pool,
+            client_pool=GeminiClientPool(base_url=server.base_url),
+            result_cache=RecommendationResultCache(ttl=3600),
+        )
+        with patch("src.gemini.result_cache.get_redis_client", AsyncMock(return_value=fake_redis)):
+            yield service, server
+        await service.close()
+
+
+async def test_identical_stats_share_one_gemini_call(service):
+    """Test that stats differing only in ordering hit the cached result."""
+    service, server = service
+    soup = {"count": 6, "percent": 60.0}
+    main = {"count": 4, "percent": 40.0}
+    borsch = {"name": "Борщ", "count": 6}
+    salad = {"name": "Салат", "count": 4}
+
+    first = await service.generate_recommendations(
+        make_stats({"soup": soup, "main": main}, [borsch, salad])
+    )
+    second = await service.generate_recommendations(
+        make_stats({"main": main, "soup": soup}, [salad, borsch])
+    )
+
+    assert first == second
+    assert server.requests == 1
+    assert service.result_cache.stats() == {
+        "cache_hits": 1,
+        "cache_misses": 1,
+        "cache_hit_rate": "50.0%",
+    }
+
+    # Different stats make a new request
+    await service.generate_recommendations(make_stats({"soup": soup}, [borsch]))
+    assert server.requests == 2
+
+
+async def test_disabled_cache_always_calls_gemini(service, fake_redis):
+    """Test that TTL 0 disables the result cache."""
+    service, server = service
+    service.result_cache = RecommendationResultCache(ttl=0)
+    stats = make_stats({}, [])
+
+    await service.generate_recommendations(stats)
+    await service.generate_recommendations(stats)
+
+    assert server.requests == 2
+    assert fake_redis.data == {}
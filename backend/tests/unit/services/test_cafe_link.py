@@ -271,6 +271,27 @@ async def test_list_requests_pagination(
     assert result["skip"] == 0
     assert result["limit"] == 3
 
+    # Same created_at for all requests: the id tiebreaker must keep pages disjoint
+    from datetime import datetime, timezone
+
+    from sqlalchemy import update
+
+    from src.models.cafe import CafeLinkRequest
+
+    await db_session.execute(
+        update(CafeLinkRequest).values(created_at=datetime(2030, 1, 1, tzinfo=timezone.utc))
+    )
+    await db_session.commit()
+    result = await cafe_link_service.list_requests(skip=0, limit=3)
+
+    # Next page via cursor: no COUNT, remaining items
+    next_page = await cafe_link_service.list_requests(limit=3, cursor=result["next_cursor"])
+
+    assert next_page["total"] is None
+    assert len(next_page["items"]) == 2
+    assert next_page["next_cursor"] is None
+    assert not {r.id for r in result["items"]} & {r.id for r in next_page["items"]}
+
 
 async def test_list_requests_filter_by_status(
     db_session, cafe_link_service, test_cafe_for_linking
@@ -145,3 +145,63 @@ async def test_validate_order_deadline_raises_on_failure(db_session, test_cafe):
         await service.validate_order_deadline(test_cafe.id, past_date)
 
     assert exc_info.value.status_code == 400
+
+
+def test_compiled_schedule_check_range():
+    """Test compiled schedule answers a date range in memory."""
+    from datetime import datetime
+
+    from src.models.deadline import Deadline
+    from src.services.deadline import CompiledSchedule
+
+    schedule = CompiledSchedule.compile(
+        1,
+        [
+            Deadline(weekday=0, deadline_time="10:00", is_enabled=True, advance_days=1),
+            Deadline(weekday=2, deadline_time="12:30", is_enabled=False, advance_days=0),
+        ],
+    )
+    # Friday 2030-01-04 09:00 local time
+    now = datetime(2030, 1, 4, 9, 0).astimezone()
+
+    availability = schedule.check_range(date(2030, 1, 6), 4, now=now)  # Sun..Wed
+
+    assert [a.date.weekday() for a in availability] == [6, 0, 1, 2]
+    assert availability[0].can_order is False  # Sunday - no slot
+    assert availability[1].can_order is True  # Monday - deadline Sunday 10:00
+    assert availability[1].deadline.date() == date(2030, 1, 6)
+    assert availability[1].deadline.hour == 10
+    assert "No delivery" in availability[2].reason
+    assert "disabled" in availability[3].reason.lower()
+
+    late = datetime(2030, 1, 6, 10, 1).astimezone()
+    assert schedule.check(date(2030, 1, 7), now=late).can_order is False
+
+
+def test_compiled_schedule_next_cutoff():
+    """Test next cutoff accounts for advance days and shared cutoffs."""
+    from datetime import datetime
+
+    from src.models.deadline import Deadline
+    from src.services.deadline import CompiledSchedule
+
+    schedule = CompiledSchedule.compile(
+        1,
+        [
+            # Saturday and Sunday are both closed on Friday 18:00
+            Deadline(weekday=5, deadline_time="18:00", is_enabled=True, advance_days=1),
+            Deadline(weekday=6, deadline_time="18:00", is_enabled=True, advance_days=2),
+            Deadline(weekday=0, deadline_time="10:00", is_enabled=False, advance_days=0),
+        ],
+    )
+    # Wednesday 2030-01-02
+    fire_at, order_dates = schedule.next_cutoff(datetime(2030, 1, 2, 12, 0).astimezone())
+
+    assert fire_at == datetime(2030, 1, 4, 18, 0).astimezone()
+    assert order_dates == [date(2030, 1, 5), date(2030, 1, 6)]
+
+    fire_at, order_dates = schedule.next_cutoff(fire_at)
+    assert fire_at == datetime(2030, 1, 11, 18, 0).astimezone()
+    assert order_dates == [date(2030, 1, 12), date(2030, 1, 13)]
+
+    assert CompiledSchedule.compile(1, []).next_cutoff(datetime.now().astimezone()) is None
@@ -182,3 +182,115 @@ async def test_manager_can_delete_any_order(
     # Verify order is deleted
     with pytest.raises(HTTPException):
         await service.get_order(test_order.id)
+
+
+@pytest.mark.asyncio
+async def test_load_snapshot_fixed_query_count(
+    db_session, test_combo, test_menu_items
+):
+    """Test menu snapshot costs the same number of queries for any order size."""
+    from sqlalchemy import event
+
+    service = OrderService(db_session)
+    statements: list[str] = []
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = db_session.bind.sync_engine
+    event.listen(engine, "before_cursor_execute", count_statement)
+    try:
+        snapshot = await service.menu_service.load_snapshot(
+            combo_id=test_combo.id,
+            items=[
+                {"type": "combo", "category": "soup", "menu_item_id": test_menu_items[0].id},
+                {"type": "combo", "category": "main", "menu_item_id": test_menu_items[1].id},
+                {"type": "combo", "category": "salad", "menu_item_id": test_menu_items[2].id},
+            ],
+            extras=[{"menu_item_id": test_menu_items[3].id, "quantity": 2}],
+        )
+        load_queries = len(statements)
+
+        # Validation and pricing run in memory
+        statements.clear()
+        await service.menu_service.validate_combo_items(
+            test_combo.id,
+            [
+                {"category": "soup", "menu_item_id": test_menu_items[0].id},
+                {"category": "main", "menu_item_id": test_menu_items[1].id},
+                {"category": "salad", "menu_item_id": test_menu_items[2].id},
+            ],
+            snapshot,
+        )
+        extras_price = await service.menu_service.calculate_extras_price(
+            [{"menu_item_id": test_menu_items[3].id, "quantity": 2}], snapshot
+        )
+    finally:
+        event.remove(engine, "before_cursor_execute", count_statement)
+
+    assert load_queries <= 3  # combo + menu items + selectin options
+    assert statements == []
+    assert len(snapshot.menu_items) == 4
+    assert extras_price == Decimal("5.00")
+
+
+@pytest.mark.asyncio
+async def test_order_writes_keep_rollups_in_sync(
+    db_session, test_manager, test_order, test_menu_items
+):
+    """Test incremental rollup updates match a rebuild from orders."""
+    from src.repositories.order_rollup import OrderRollupRepository
+
+    service = OrderService(db_session)
+    rollups = OrderRollupRepository(db_session)
+    cafe_id, order_date = test_order.cafe_id, test_order.order_date
+    await rollups.rebuild(cafe_id, order_date)
+
+    async def snapshot():
+        return [tuple(row[:5]) for row in await rollups.list_for_date(cafe_id, order_date)]
+
+    await service.update_order(
+        test_order.id,
+        test_manager.tgid,
+        is_manager=True,
+        data=OrderUpdate(extras=[{"menu_item_id": test_menu_items[3].id, "quantity": 3}]),
+    )
+    incremental = await snapshot()
+    await rollups.rebuild(cafe_id, order_date)
+    assert incremental == await snapshot()
+    assert ("extra", test_menu_items[3].id, "", 3, Decimal("0")) in incremental
+    assert ("order", 0, "", 1, Decimal("22.50")) in incremental
+
+    await service.delete_order(test_order.id, test_manager.tgid, is_manager=True)
+    assert await snapshot() == []
+
+
+@pytest.mark.asyncio
+async def test_create_order_weekly_limit(
+    db_session, test_user, test_cafe, test_combo, test_menu_items, test_deadline
+):
+    """Test orders over the user's weekly limit are rejected."""
+    test_user.weekly_limit = Decimal("20.00")
+    await db_session.commit()
+
+    service = OrderService(db_session)
+    today = date.today()
+    order_date = today + timedelta(days=(0 - today.weekday()) % 7 + 7)  # Monday in 1-2 weeks
+    order_data = OrderCreate(
+        cafe_id=test_cafe.id,
+        order_date=order_date,
+        combo_id=test_combo.id,
+        items=[
+            {"category": "soup", "menu_item_id": test_menu_items[0].id},
+            {"category": "main", "menu_item_id": test_menu_items[1].id},
+            {"category": "salad", "menu_item_id": test_menu_items[2].id},
+        ],
+    )
+
+    await service.create_order(test_user.tgid, order_data)
+
+    with pytest.raises(HTTPException) as exc_info:
+        await service.create_order(test_user.tgid, order_data)
+
+    assert exc_info.value.status_code == 400
+    assert "Weekly limit exceeded: 5.00 remaining" in exc_info.value.detail
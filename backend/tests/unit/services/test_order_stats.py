@@ -8,6 +8,7 @@ from src.models.cafe import Cafe
 from src.models.order import Order
 from src.models.user import User
 from src.models.cafe import MenuItem
+from src.repositories.user_stats import UserStatsRepository
 from src.services.order_stats import OrderStatsService
 
 
@@ -242,3 +243,100 @@ async def test_get_user_stats_favorite_dishes(
     assert favorite_dishes[1]["count"] == 3
     assert favorite_dishes[2]["name"] == "Caesar Salad"
     assert favorite_dishes[2]["count"] == 2
+
+
+async def test_get_user_stats_last_order_outside_window(
+    db_session, stats_service, test_user, test_cafe, test_menu_items, test_combo, monkeypatch
+):
+    """Test last order date is reported even when no orders fall into the window."""
+    monkeypatch.setattr("src.services.order_stats._total_dishes_cache", None)
+    old_order = Order(
+        user_tgid=test_user.tgid,
+        cafe_id=test_cafe.id,
+        order_date=(datetime.now() - timedelta(days=60)).date(),
+        status="confirmed",
+        combo_id=test_combo.id,
+        items=[{"category": "soup", "menu_item_id": test_menu_items[0].id}],
+        extras=[],
+        total_price=Decimal("10.00"),
+        created_at=datetime.now() - timedelta(days=60),
+    )
+    db_session.add(old_order)
+    await db_session.commit()
+
+    stats = await stats_service.get_user_stats(test_user.tgid, days=30)
+
+    assert stats["orders_count"] == 0
+    assert stats["categories"] == {}
+    assert stats["unique_dishes"] == 0
+    assert stats["favorite_dishes"] == []
+    assert stats["last_order_date"] == old_order.created_at
+    assert stats["total_dishes_available"] == sum(item.is_available for item in test_menu_items)
+
+
+async def test_get_batch_user_stats_reads_projection(
+    stats_service, test_user_with_orders, db_session, test_cafe, test_combo
+):
+    """Test batch stats from the rebuilt projection equal per-user stats."""
+    user, orders = test_user_with_orders
+    occasional = User(
+        tgid=333333, name="Occasional", office="Office A", role="user", is_active=True
+    )
+    db_session.add(occasional)
+    db_session.add(
+        Order(
+            user_tgid=occasional.tgid,
+            cafe_id=test_cafe.id,
+            order_date=datetime.now().date(),
+            status="confirmed",
+            combo_id=test_combo.id,
+            items=[],
+            extras=[],
+            total_price=Decimal("10.00"),
+        )
+    )
+    await db_session.commit()
+
+    await UserStatsRepository(db_session).rebuild()
+    batch = await stats_service.get_batch_user_stats(min_orders=5)
+
+    assert list(batch) == [user.tgid]
+    assert batch[user.tgid] == await stats_service.get_user_stats(user.tgid, days=30)
+
+
+async def test_projection_follows_order_writes(
+    db_session, stats_service, test_manager, test_order, test_menu_items, monkeypatch
+):
+    """Test projected stats match a raw scan after order updates, deletes and roll-off."""
+    from src.schemas.order import OrderUpdate
+    from src.services.order import OrderService
+
+    monkeypatch.setattr("src.services.order_stats._total_dishes_cache", None)
+    user_tgid = test_order.user_tgid
+    repo = UserStatsRepository(db_session)
+    await repo.rebuild()
+    projected = await stats_service.get_projected_stats(user_tgid)
+    assert projected == await stats_service.get_user_stats(user_tgid)
+
+    service = OrderService(db_session)
+    await service.update_order(
+        test_order.id,
+        test_manager.tgid,
+        is_manager=True,
+        data=OrderUpdate(extras=[{"menu_item_id": test_menu_items[3].id, "quantity": 3}]),
+    )
+    projected = await stats_service.get_projected_stats(user_tgid)
+    assert projected == await stats_service.get_user_stats(user_tgid)
+    assert projected["orders_count"] == 1
+    assert {"name": test_menu_items[3].name, "count": 3} in projected["favorite_dishes"]
+
+    # Days leaving the window are subtracted from the totals
+    assert await repo.roll_off(datetime.now().date() + timedelta(days=30)) > 0
+    assert all(not row.count for row in await repo.list_totals(user_tgid))
+    await repo.rebuild()
+
+    await service.delete_order(test_order.id, test_manager.tgid, is_manager=True)
+    projected = await stats_service.get_projected_stats(user_tgid)
+    assert projected["orders_count"] == 0
+    assert projected["categories"] == {}
+    assert projected["last_order_date"] is None
@@ -0,0 +1,120 @@
+"""Tests for SummaryService."""
+
+from datetime import date
+from decimal import Decimal
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event
+
+from src.models.cafe import MenuItem
+from src.models.order import Order
+from src.repositories.order_rollup import OrderRollupRepository
+from src.schemas.summary import SummaryCreate
+from src.services.summary import SummaryService
+
+
+@pytest.mark.asyncio
+async def test_create_summary_from_rollups(
+    db_session, test_user, test_cafe, test_combo, test_menu_items
+):
+    """Test summary breakdown covers combos, standalone items and extras without scanning orders."""
+    pizza = MenuItem(
+        cafe_id=test_cafe.id,
+        name="Pizza",
+        category="main",
+        price=Decimal("7.00"),
+        is_available=True,
+    )
+    db_session.add(pizza)
+    await db_session.flush()
+
+    order_date = date(2030, 1, 7)
+    soup, main, salad, coffee = test_menu_items
+    combo_items = [
+        {"type": "combo", "category": "soup", "menu_item_id": soup.id},
+        {"type": "combo", "category": "main", "menu_item_id": main.id},
+        {"type": "combo", "category": "salad", "menu_item_id": salad.id},
+    ]
+    orders = [
+        Order(
+            user_tgid=test_user.tgid, cafe_id=test_cafe.id, order_date=order_date,
+            combo_id=test_combo.id, items=combo_items,
+            extras=[{"menu_item_id": coffee.id, "quantity": 2}], total_price=Decimal("20.00"),
+        ),
+        Order(
+            user_tgid=test_user.tgid, cafe_id=test_cafe.id, order_date=order_date,
+            combo_id=None,
+            items=[
+                {"type": "standalone", "menu_item_id": pizza.id, "quantity": 2,
+                 "options": {"size": "L", "crust": "thin"}},
+                {"type": "standalone", "menu_item_id": pizza.id, "quantity": 1, "options": {}},
+            ],
+            extras=[{"menu_item_id": coffee.id, "quantity": 1}], total_price=Decimal("23.50"),
+        ),
+        Order(
+            user_tgid=test_user.tgid, cafe_id=test_cafe.id, order_date=order_date,
+            combo_id=None,
+            items=[
+                {"type": "standalone", "menu_item_id": pizza.id, "quantity": 1,
+                 "options": {"crust": "thin", "size": "L"}},
+            ],
+            extras=[], total_price=Decimal("7.00"),
+        ),
+        Order(
+            user_tgid=test_user.tgid, cafe_id=test_cafe.id, order_date=order_date,
+            status="cancelled", combo_id=test_combo.id, items=combo_items,
+            extras=[], total_price=Decimal("15.00"),
+        ),
+    ]
+    db_session.add_all(orders)
+    await db_session.commit()
+    assert await OrderRollupRepository(db_session).rebuild(test_cafe.id, order_date) == 8
+
+    service = SummaryService(db_session)
+    statements: list[str] = []
+
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = db_session.bind.sync_engine
+    event.listen(engine, "before_cursor_execute", count_statement)
+    try:
+        summary = await service.create_summary(
+            SummaryCreate(cafe_id=test_cafe.id, date=order_date)
+        )
+    finally:
+        event.remove(engine, "before_cursor_execute", count_statement)
+
+    assert len(statements) == 2  # rollups + insert
+    assert summary.total_orders == 3
+    assert summary.total_amount == Decimal("50.50")
+
+    breakdown = summary.breakdown
+    assert breakdown["combos"] == [
+        {"id": test_combo.id, "name": "Combo A", "quantity": 1, "amount": "15.00"}
+    ]
+    assert breakdown["extras"] == [
+        {"id": coffee.id, "name": "Coffee", "quantity": 3, "amount": "7.50"}
+    ]
+    assert [i["quantity"] for i in breakdown["combo_items"]] == [1, 1, 1]
+    standalone = sorted(breakdown["standalone"], key=lambda i: i["quantity"])
+    assert standalone == [
+        {"id": pizza.id, "name": "Pizza", "quantity": 1, "amount": "7.00", "options": {}},
+        {"id": pizza.id, "name": "Pizza", "quantity": 3, "amount": "21.00",
+         "options": {"crust": "thin", "size": "L"}},
+    ]
+
+    csv = service.format_summary_csv(summary)
+    assert "Pizza,crust: thin; size: L,3,21.00" in csv
+
+
+@pytest.mark.asyncio
+async def test_create_summary_no_orders(db_session, test_cafe):
+    """Test summary creation fails without orders."""
+    service = SummaryService(db_session)
+
+    with pytest.raises(HTTPException) as exc_info:
+        await service.create_summary(SummaryCreate(cafe_id=test_cafe.id, date=date(2030, 1, 8)))
+
+    assert exc_info.value.status_code == 400
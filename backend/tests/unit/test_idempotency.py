@@ -0,0 +1,29 @@
+"""Tests for Idempotency-Key handling."""
+
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from src.database import run_after_commit, run_on_rollback
+from src.idempotency import IdempotentRequest
+
+
+@pytest.mark.asyncio
+async def test_rolled_back_request_releases_key(fake_redis):
+    """Test a request whose transaction rolled back can be retried right away."""
+    session = MagicMock(info={})
+    request = IdempotentRequest(session, "order-1", "1:POST:/api/v1/orders", "body")
+
+    with patch("src.idempotency.get_redis_client", AsyncMock(return_value=fake_redis)):
+        assert await request.run(AsyncMock(return_value="created")) == "created"
+        assert json.loads(fake_redis.data[request.redis_key])["state"] == "pending"
+
+        # The commit failed
+        await run_on_rollback(session)
+        assert request.redis_key not in fake_redis.data
+
+        assert await request.run(AsyncMock(return_value="created")) == "created"
+        await run_after_commit(session)
+
+    assert json.loads(fake_redis.data[request.redis_key])["state"] == "done"
@@ -0,0 +1,60 @@
+"""Tests for token-bucket rate limiting."""
+
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from src.config import settings
+from src.rate_limit import LocalTokenBuckets, route_cost
+
+
+def test_route_cost():
+    """Test expensive routes cost more and health checks are free."""
+    assert route_cost("GET", "/health/all") == 0
+    assert route_cost("GET", "/api/v1/cafes") == 1
+    assert route_cost("POST", "/api/v1/orders") == 3
+    assert route_cost("GET", "/api/v1/orders") == 1
+    assert route_cost("POST", "/api/v1/users/42/recommendations/generate") == 20
+
+
+def test_local_buckets_refill():
+    """Test tokens run out and refill over time."""
+    buckets = LocalTokenBuckets()
+
+    with patch("src.rate_limit.time.monotonic", return_value=100.0):
+        assert buckets.take("k", 2, capacity=4, rate=1.0) == (True, 0)
+        assert buckets.take("k", 2, capacity=4, rate=1.0) == (True, 0)
+        assert buckets.take("k", 3, capacity=4, rate=1.0) == (False, 3)
+
+    with patch("src.rate_limit.time.monotonic", return_value=103.0):
+        assert buckets.take("k", 3, capacity=4, rate=1.0) == (True, 0)
+
+
+def test_local_buckets_bounded():
+    """Test least recently used buckets are dropped."""
+    buckets = LocalTokenBuckets(max_size=2)
+    for key in ("a", "b", "c"):
+        buckets.take(key, 1, capacity=4, rate=1.0)
+
+    assert list(buckets._buckets) == ["b", "c"]
+
+
+@pytest.mark.asyncio
+async def test_middleware_returns_429_with_retry_after(client, monkeypatch):
+    """Test the middleware rejects anonymous bursts, falling back to local buckets."""
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(settings, "RATE_LIMIT_CAPACITY", 2)
+    monkeypatch.setattr(settings, "RATE_LIMIT_REFILL_PER_SECOND", 0.1)
+    headers = {"X-Real-IP": "203.0.113.7"}
+
+    with patch(
+        "src.rate_limit.get_redis_client",
+        AsyncMock(side_effect=RedisConnectionError("down")),
+    ):
+        statuses = [await client.get("/api/v1/cafes", headers=headers) for _ in range(3)]
+
+    assert all(r.status_code != 429 for r in statuses[:2])
+    assert statuses[2].status_code == 429
+    assert statuses[2].headers["Retry-After"] == "10"
+    assert statuses[2].json() == {"detail": "Too many requests"}
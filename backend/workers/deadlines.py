@@ -0,0 +1,309 @@
+"""
+Deadline scheduler that publishes deadline.passed events on time.
+
+Loads all deadline schedules once, keeps a min-heap with the next cutoff of
+every active cafe and sleeps until the earliest one. When a cutoff passes it
+publishes a DeadlinePassedEvent for each order date it closes and schedules
+the cafe's following cutoff. Schedule changes arrive via the Redis cache
+invalidation channels, so only the affected cafe is recomputed.
+"""
+
+import asyncio
+import heapq
+import logging
+from collections.abc import Awaitable, Callable
+from datetime import date, datetime, timedelta
+
+from redis.exceptions import RedisError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.cache.local_cache import availability_cache, deadline_cache
+from src.cache.redis_client import get_redis_client
+from src.config import settings
+from src.kafka.producer import get_kafka_broker, publish_deadline_passed
+from src.repositories.deadline import DeadlineRepository
+from src.services.deadline import CompiledSchedule
+
+logger = logging.getLogger(__name__)
+
+# Database setup
+engine = create_async_engine(settings.DATABASE_URL, echo=False)
+async_session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+# Cutoffs missed while the scheduler was down are still fired within this window
+CATCH_UP_WINDOW = timedelta(hours=6)
+# Full reload as a safety net for missed invalidation messages
+RESYNC_INTERVAL = timedelta(hours=1)
+# Delay before retrying a failed publish
+RETRY_DELAY = timedelta(seconds=30)
+# How long the "already fired" marker is kept in Redis
+FIRED_MARKER_TTL = 7 * 86400
+
+FIRED_MARKER_KEY = "deadline:fired:{cafe_id}:{order_date}"
+
+# Generation of publish retries: they survive reloads, since their cutoff has passed
+RETRY_GENERATION = 0
+
+
+class DeadlineScheduler:
+    """
+    Timer heap of upcoming deadline cutoffs, one entry per active cafe.
+
+    Heap entries carry a per-cafe generation; when a cafe is reloaded its
+    generation is bumped and older entries are discarded lazily on pop.
+    Reloads schedule cutoffs after the last fire_due run, so cutoffs that
+    are due but not yet fired are kept.
+    Each (cafe, order date) is published at most once thanks to a Redis
+    SET NX marker, which also makes restarts and extra replicas safe.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession],
+        publish: Callable[[int, str], Awaitable[None]] = publish_deadline_passed,
+    ):
+        self.session_factory = session_factory
+        self.publish = publish
+        self._heap: list[tuple[datetime, int, int, tuple[date, ...]]] = []
+        self._schedules: dict[int, CompiledSchedule] = {}
+        self._generations: dict[int, int] = {}
+        # Cutoffs up to this time were handled by fire_due
+        self.processed_until: datetime | None = None
+        self._wakeup = asyncio.Event()
+
+    @property
+    def cafes_count(self) -> int:
+        return len(self._schedules)
+
+    def next_fire_at(self) -> datetime | None:
+        """Time of the earliest live heap entry."""
+        while self._heap:
+            fire_at, cafe_id, generation, _ = self._heap[0]
+            if self._is_live(cafe_id, generation):
+                return fire_at
+            heapq.heappop(self._heap)
+        return None
+
+    async def load_all(self, after: datetime) -> None:
+        """
+        Load every active cafe's schedule in one query and rebuild the heap.
+
+        Cutoffs are scheduled from `after`; pending publish retries are kept.
+        """
+        async with self.session_factory() as session:
+            deadlines_by_cafe = await DeadlineRepository(session).get_for_active_cafes()
+
+        self._heap = [entry for entry in self._heap if entry[2] == RETRY_GENERATION]
+        heapq.heapify(self._heap)
+        self._schedules = {}
+        for cafe_id, deadlines in deadlines_by_cafe.items():
+            self._set_schedule(cafe_id, CompiledSchedule.compile(cafe_id, deadlines), after)
+
+        logger.info(
+            "Deadline schedules loaded",
+            extra={"cafes_count": self.cafes_count, "heap_size": len(self._heap)},
+        )
+
+    async def reload_cafe(self, cafe_id: int, after: datetime) -> None:
+        """Recompute the heap entry of a single cafe from `after` after its schedule changed."""
+        async with self.session_factory() as session:
+            deadlines_by_cafe = await DeadlineRepository(session).get_for_active_cafes([cafe_id])
+
+        if cafe_id in deadlines_by_cafe:
+            schedule = CompiledSchedule.compile(cafe_id, deadlines_by_cafe[cafe_id])
+            self._set_schedule(cafe_id, schedule, after)
+        else:
+            # Cafe deleted or deactivated
+            self._schedules.pop(cafe_id, None)
+            self._generations[cafe_id] = self._generations.get(cafe_id, 0) + 1
+
+        logger.info("Deadline schedule reloaded", extra={"cafe_id": cafe_id})
+
+    async def fire_due(self, now: datetime) -> int:
+        """
+        Publish events for every cutoff that is due at `now`.
+
+        Returns:
+            Number of deadline.passed events published
+        """
+        published = 0
+        while self._heap and self._heap[0][0] <= now:
+            fire_at, cafe_id, generation, order_dates = heapq.heappop(self._heap)
+            if not self._is_live(cafe_id, generation):
+                continue
+
+            pending = []
+            for order_date in order_dates:
+                result = await self._fire(cafe_id, order_date)
+                if result is None:
+                    pending.append(order_date)
+                elif result:
+                    published += 1
+
+            if pending:
+                retry_at = now + RETRY_DELAY
+                heapq.heappush(self._heap, (retry_at, cafe_id, RETRY_GENERATION, tuple(pending)))
+            if generation != RETRY_GENERATION:
+                self._schedule_next(cafe_id, fire_at)
+        self.processed_until = now
+        return published
+
+    async def run(self, stop_event: asyncio.Event) -> None:
+        """Sleep until the next cutoff (or a schedule change) until stopped."""
+        now = datetime.now().astimezone()
+        self.processed_until = now - CATCH_UP_WINDOW
+        await self.load_all(self.processed_until)
+        last_resync = now
+
+        listener = asyncio.create_task(self._listen_for_changes())
+        try:
+            while not stop_event.is_set():
+                now = datetime.now().astimezone()
+                if now - last_resync >= RESYNC_INTERVAL:
+                    await self.load_all(self.processed_until)
+                    last_resync = now
+
+                await self.fire_due(now)
+
+                next_fire_at = self.next_fire_at()
+                timeout = RESYNC_INTERVAL - (now - last_resync)
+                if next_fire_at is not None:
+                    timeout = min(timeout, next_fire_at - now)
+
+                self._wakeup.clear()
+                stop_wait = asyncio.create_task(stop_event.wait())
+                wakeup_wait = asyncio.create_task(self._wakeup.wait())
+                await asyncio.wait(
+                    {stop_wait, wakeup_wait},
+                    timeout=max(timeout.total_seconds(), 0),
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                stop_wait.cancel()
+                wakeup_wait.cancel()
+        finally:
+            listener.cancel()
+
+    def _is_live(self, cafe_id: int, generation: int) -> bool:
+        return generation == RETRY_GENERATION or self._generations.get(cafe_id) == generation
+
+    def _set_schedule(self, cafe_id: int, schedule: CompiledSchedule, after: datetime) -> None:
+        self._schedules[cafe_id] = schedule
+        self._generations[cafe_id] = self._generations.get(cafe_id, 0) + 1
+        self._schedule_next(cafe_id, after)
+
+    def _schedule_next(self, cafe_id: int, after: datetime) -> None:
+        schedule = self._schedules.get(cafe_id)
+        if schedule is None:
+            return
+        cutoff = schedule.next_cutoff(after)
+        if cutoff is None:
+            return
+        fire_at, order_dates = cutoff
+        heapq.heappush(
+            self._heap, (fire_at, cafe_id, self._generations[cafe_id], tuple(order_dates))
+        )
+
+    async def _fire(self, cafe_id: int, order_date: date) -> bool | None:
+        """
+        Publish one deadline.passed event unless it was already published.
+
+        Returns:
+            True if published, False if already published elsewhere,
+            None if it has to be retried
+        """
+        marker = FIRED_MARKER_KEY.format(cafe_id=cafe_id, order_date=order_date.isoformat())
+        try:
+            redis = await get_redis_client()
+            if not await redis.set(marker, "1", nx=True, ex=FIRED_MARKER_TTL):
+                logger.debug(
+                    "Deadline already published, skipping",
+                    extra={"cafe_id": cafe_id, "date": order_date.isoformat()},
+                )
+                return False
+        except RedisError as e:
+            logger.warning(
+                "Failed to set deadline marker, will retry",
+                extra={"cafe_id": cafe_id, "date": order_date.isoformat(), "error": str(e)},
+            )
+            return None
+
+        try:
+            await self.publish(cafe_id, order_date.isoformat())
+        except Exception:
+            # Allow the retry to publish again
+            try:
+                await redis.delete(marker)
+            except RedisError:
+                pass
+            return None
+        return True
+
+    async def _listen_for_changes(self) -> None:
+        """Reload affected cafes on deadline/availability invalidation messages."""
+        while True:
+            try:
+                redis = await get_redis_client()
+                async with redis.pubsub() as pubsub:
+                    await pubsub.subscribe(deadline_cache.channel, availability_cache.channel)
+                    async for message in pubsub.listen():
+                        if message.get("type") != "message":
+                            continue
+                        after = self.processed_until or datetime.now().astimezone()
+                        if message["channel"] == deadline_cache.channel:
+                            await self.reload_cafe(int(message["data"]), after)
+                        else:
+                            # Cafe activated/deactivated - cheap enough to reload everything
+                            await self.load_all(after)
+                        self._wakeup.set()
+            except asyncio.CancelledError:
+                raise
+            except (RedisError, OSError, ValueError) as e:
+                logger.warning("Schedule change listener disconnected", extra={"error": str(e)})
+            except Exception:
+                # E.g. the database is down during a reload; the hourly resync catches up
+                logger.exception("Schedule change listener failed, restarting")
+            await asyncio.sleep(1)
+
+
+if __name__ == "__main__":
+    import signal
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    logger.info(
+        "Deadline scheduler starting",
+        extra={
+            "kafka_broker": settings.KAFKA_BROKER_URL,
+            "topic": "lunch-bot.deadlines",
+        },
+    )
+
+    async def main():
+        """Main function to run the scheduler."""
+        broker = get_kafka_broker()
+        scheduler = DeadlineScheduler(async_session_factory)
+
+        async with broker:
+            logger.info("Deadline scheduler ready")
+
+            # Create stop event
+            stop_event = asyncio.Event()
+
+            # Handle graceful shutdown
+            def shutdown_handler(signum, frame):
+                logger.info("Received shutdown signal")
+                stop_event.set()
+
+            signal.signal(signal.SIGINT, shutdown_handler)
+            signal.signal(signal.SIGTERM, shutdown_handler)
+
+            await scheduler.run(stop_event)
+
+        logger.info("Deadline scheduler shutting down")
+        await engine.dispose()
+
+    asyncio.run(main())
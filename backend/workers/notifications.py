@@ -11,11 +11,14 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import selectinload, sessionmaker
 
+from src.cache.local_cache import start_cache_listeners, stop_cache_listeners
 from src.config import settings
 from src.kafka.events import DeadlinePassedEvent
-from src.models.cafe import Cafe, Combo, MenuItem
+from src.models.cafe import Cafe, Combo
 from src.models.order import Order
 from src.models.user import User
+from src.schemas.menu import MenuItemResponse
+from src.services.menu import MenuService
 
 logger = logging.getLogger(__name__)
 
@@ -62,23 +65,22 @@ async def get_cafe_with_orders(
     return cafe, orders
 
 
-async def get_menu_items(db: AsyncSession, cafe_id: int) -> dict[int, MenuItem]:
-    """Fetch all menu items for a cafe.
+async def get_menu_items(db: AsyncSession, cafe_id: int) -> dict[int, MenuItemResponse]:
+    """Fetch all menu items for a cafe from the shared menu cache.
 
     Args:
-        db: Database session
+        db: Database session (used on cache miss)
         cafe_id: ID of the cafe
 
     Returns:
-        Dictionary mapping menu_item_id to MenuItem
+        Dictionary mapping menu_item_id to menu item
     """
-    result = await db.execute(select(MenuItem).where(MenuItem.cafe_id == cafe_id))
-    items = result.scalars().all()
-    return {item.id: item for item in items}
+    menu = await MenuService(db).get_cafe_menu(cafe_id)
+    return menu.items_by_id
 
 
 def format_notification(
-    cafe: Cafe, date: str, orders: list[Order], menu_items: dict[int, MenuItem]
+    cafe: Cafe, date: str, orders: list[Order], menu_items: dict[int, MenuItemResponse]
 ) -> str:
     """Format notification message for Telegram.
 
@@ -362,6 +364,7 @@ if __name__ == "__main__":
     async def main():
         """Main function to run the broker."""
         logger.info("Broker connecting to Kafka")
+        await start_cache_listeners()
 
         async with broker:
             logger.info("Notifications worker ready - waiting for messages")
@@ -384,6 +387,7 @@ if __name__ == "__main__":
                 logger.info("KeyboardInterrupt received")
 
         logger.info("Notifications worker shutting down")
+        await stop_cache_listeners()
         await engine.dispose()
 
     asyncio.run(main())
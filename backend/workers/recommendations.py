@@ -3,21 +3,51 @@ Recommendations worker for batch generation of Gemini-based food recommendations
 
 Runs scheduled batch job at 03:00 AM daily to generate personalized
 recommendations for active users. Uses APScheduler for scheduling.
+
+Any number of replicas can run: one of them is elected to enqueue the batch
+as per-user tasks on a partitioned Kafka topic, and all of them consume the
+tasks in one consumer group.
 """
 
 import asyncio
+import itertools
 import json
 import logging
-from datetime import datetime, timezone
+import time
+from collections.abc import Iterator
+from datetime import date, datetime, timedelta, timezone
 
+from aiokafka import TopicPartition
+from aiokafka.admin import AIOKafkaAdminClient, NewTopic
+from aiokafka.errors import TopicAlreadyExistsError
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from faststream import AckPolicy
 from faststream.kafka import KafkaBroker
+from faststream.kafka.annotations import KafkaMessage
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
+from src.cache.batch_run import (
+    CLAIM_REFRESH_INTERVAL,
+    CLAIM_TTL,
+    COMPLETED,
+    RUNNING,
+    STOPPED,
+    BatchRun,
+    elect_coordinator,
+    get_resumable_run,
+)
 from src.cache.redis_client import set_cache
 from src.config import settings
-from src.gemini import AllKeysExhaustedException, get_key_pool
+from src.gemini import (
+    AllKeysExhaustedException,
+    close_recommendation_service,
+    get_key_pool,
+    get_recommendation_service,
+)
+from src.gemini.result_cache import RecommendationResultCache
+from src.kafka.events import RecommendationTaskEvent
+from src.repositories.user_stats import UserStatsRepository
 from src.services.order_stats import OrderStatsService
 
 logger = logging.getLogger(__name__)
@@ -32,108 +62,357 @@ broker = KafkaBroker(settings.KAFKA_BROKER_URL)
 # APScheduler for nightly batch job
 scheduler = AsyncIOScheduler()
 
+# Log batch progress every N processed users
+PROGRESS_LOG_INTERVAL = 50
+
+# Per-user batch tasks, keyed by tgid and shared by the replicas of one group
+TASKS_TOPIC = "lunch-bot.recommendation-tasks"
+TASKS_GROUP = "recommendations-workers"
+# Tasks per consumed batch: enough full packs to keep every key busy
+TASKS_BATCH_SIZE = (
+    settings.GEMINI_PACK_SIZE
+    * len(settings.gemini_keys_list)
+    * settings.GEMINI_MAX_IN_FLIGHT_PER_KEY
+)
+# Tasks published between cursor checkpoints
+ENQUEUE_CHUNK = 500
+# Seconds after the first key quota reset before the batch is retried
+RETRY_MARGIN = 60
+
+
+async def roll_off_user_stats():
+    """
+    Remove days that left the 30-day window from the user stats projection.
+
+    Scheduled on every replica; UserStatsRepository.roll_off serializes the
+    runs with an advisory lock, so only the first one changes anything.
+    """
+    async with async_session_factory() as session:
+        removed = await UserStatsRepository(session).roll_off(date.today())
+        await session.commit()
+    logger.info("User stats rolled off", extra={"removed_rows": removed})
+
+
+class BatchProgress:
+    """Counters, throughput and result cache hit rate of a running recommendations batch."""
+
+    def __init__(self, total_users: int, result_cache: RecommendationResultCache):
+        self.total_users = total_users
+        self.result_cache = result_cache
+        self.success_count = 0
+        self.error_count = 0
+        # Users answered by a packed multi-user request
+        self.packed_count = 0
+        self.started_at = time.monotonic()
+
+    @property
+    def processed(self) -> int:
+        return self.success_count + self.error_count
+
+    def summary(self) -> dict:
+        elapsed = time.monotonic() - self.started_at
+        return {
+            "total_users": self.total_users,
+            "processed_users": self.processed,
+            "success_count": self.success_count,
+            "error_count": self.error_count,
+            "packed_users": self.packed_count,
+            "elapsed_seconds": round(elapsed, 1),
+            "users_per_second": round(self.processed / elapsed, 2) if elapsed > 0 else 0.0,
+            **self.result_cache.stats(),
+        }
+
+
+def iter_packs(users: dict[int, dict], size: int) -> Iterator[dict[int, dict]]:
+    """Split {tgid: stats} into consecutive groups of at most `size` users."""
+    items = iter(users.items())
+    while pack := dict(itertools.islice(items, max(size, 1))):
+        yield pack
+
+
+async def generate_for_user(
+    recommendation_service, tgid: int, user_stats: dict, recommendations: dict | None = None
+) -> None:
+    """
+    Cache recommendations for one user in Redis (TTL 24h).
+
+    `recommendations` comes from a packed request; without it a single-user
+    request is made.
+    """
+    if recommendations is None:
+        logger.debug(
+            "Generating recommendations",
+            extra={
+                "user_tgid": tgid,
+                "orders_count": user_stats["orders_count"],
+            },
+        )
+        recommendations = await recommendation_service.generate_recommendations(user_stats)
+
+    cache_key = f"recommendations:user:{tgid}"
+    cache_data = {
+        "summary": recommendations.get("summary"),
+        "tips": recommendations.get("tips", []),
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+    }
+    await set_cache(cache_key, json.dumps(cache_data), ttl=86400)
+
+    logger.info(
+        "Generated recommendations for user",
+        extra={
+            "user_tgid": tgid,
+            "summary_length": len(recommendations.get("summary") or ""),
+            "tips_count": len(recommendations.get("tips", [])),
+        },
+    )
+
+
+async def ensure_tasks_topic() -> None:
+    """Create TASKS_TOPIC with RECOMMENDATIONS_TASK_PARTITIONS partitions if missing."""
+    admin = AIOKafkaAdminClient(bootstrap_servers=settings.KAFKA_BROKER_URL)
+    await admin.start()
+    try:
+        response = await admin.create_topics([
+            NewTopic(
+                name=TASKS_TOPIC,
+                num_partitions=settings.RECOMMENDATIONS_TASK_PARTITIONS,
+                replication_factor=1,
+            )
+        ])
+        for topic, error_code, *_ in response.topic_errors:
+            if error_code not in (0, TopicAlreadyExistsError.errno):
+                logger.error(
+                    "Failed to create recommendation tasks topic",
+                    extra={"topic": topic, "error_code": error_code},
+                )
+    finally:
+        await admin.close()
+
+
+async def enqueue_tasks(tasks: list[RecommendationTaskEvent]) -> None:
+    """Publish tasks to TASKS_TOPIC keyed by tgid, waiting for all acks."""
+    await asyncio.gather(
+        *(
+            broker.publish(
+                task.model_dump(mode="json"),
+                topic=TASKS_TOPIC,
+                key=str(task.tgid).encode(),
+            )
+            for task in tasks
+        )
+    )
+
 
 async def generate_recommendations_batch():
     """
-    Batch-generate recommendations for active users.
+    Enqueue the recommendations batch as per-user tasks.
 
-    Process:
-    1. Get active users with >= 5 orders in last 30 days
-    2. For each user:
-       a. Collect order statistics
-       b. Send to Gemini API (via key pool with rotation)
-       c. Cache result in Redis with TTL 24h
-    3. Log progress and errors
+    Triggered on every worker replica (APScheduler at 03:00, manual Kafka
+    event); only the replica that wins the coordinator lock enqueues.
 
-    If all API keys are exhausted, stops batch and logs error.
-    Individual user errors are logged but don't stop the batch.
+    Process:
+    1. Elect the coordinator (Redis SET NX, see src.cache.batch_run)
+    2. Read order statistics of all active users (>= 5 orders in last
+       30 days) from the user stats projection
+    3. Open the batch run, or resume a stopped one: users already done, and
+       users whose recommendations were cached after the run started, are
+       skipped
+    4. Publish one RecommendationTaskEvent per pending user to TASKS_TOPIC,
+       keyed by tgid, in tgid order; the run cursor records the last
+       enqueued user
+
+    The tasks are processed by handle_recommendation_tasks on all replicas.
+    If all API keys are exhausted, nothing is enqueued and a retry is
+    scheduled for the key quota reset.
     """
+    if not await elect_coordinator():
+        logger.info("Recommendations batch is enqueued by another replica, skipping")
+        return
+
     logger.info("Starting recommendations batch generation")
 
-    async with async_session_factory() as session:
-        stats_service = OrderStatsService(session)
+    try:
+        async with async_session_factory() as session:
+            # Statistics of active users (>= 5 orders in last 30 days)
+            active_users = await OrderStatsService(session).get_batch_user_stats(min_orders=5)
+        logger.info(f"Found {len(active_users)} active users for recommendations")
 
-        try:
-            # Get active users (>= 5 orders in last 30 days)
-            active_users = await stats_service.get_active_users(min_orders=5, days=30)
-            logger.info(f"Found {len(active_users)} active users for recommendations")
+        if not active_users:
+            logger.info("No active users found, skipping batch")
+            return
 
-            if not active_users:
-                logger.info("No active users found, skipping batch")
-                return
+        healthy_keys = await get_key_pool().healthy_keys_count()
+        if healthy_keys == 0:
+            logger.error(
+                "All Gemini API keys exhausted, skipping batch",
+                extra={"total_users": len(active_users)},
+            )
+            await schedule_batch_retry()
+            return
+
+        run = await BatchRun.open(total=len(active_users))
+        # tgid order makes the cursor meaningful across resumed runs
+        pending_tgids = await run.pending(sorted(active_users))
+    except Exception as e:
+        logger.error(
+            "Critical error in batch generation",
+            extra={"error": str(e)},
+            exc_info=True,
+        )
+        raise
 
-            success_count = 0
-            error_count = 0
-            key_pool = get_key_pool()
+    logger.info(
+        "Batch run resumed" if run.resumed else "Batch run started",
+        extra={
+            "run_id": run.run_id,
+            "total_users": len(active_users),
+            "pending_users": len(pending_tgids),
+        },
+    )
+    if not pending_tgids:
+        await run.finish(COMPLETED)
+        logger.info("All users already done, skipping batch", extra={"run_id": run.run_id})
+        return
+
+    tasks = [
+        RecommendationTaskEvent(run_id=run.run_id, tgid=tgid, stats=active_users[tgid])
+        for tgid in pending_tgids
+    ]
+    for i in range(0, len(tasks), ENQUEUE_CHUNK):
+        chunk = tasks[i:i + ENQUEUE_CHUNK]
+        await enqueue_tasks(chunk)
+        await run.advance(cursor=chunk[-1].tgid)
 
-            for tgid in active_users:
-                try:
-                    # Get user statistics
-                    user_stats = await stats_service.get_user_stats(tgid, days=30)
+    logger.info(
+        "Batch tasks enqueued",
+        extra={
+            "run_id": run.run_id,
+            "tasks_count": len(tasks),
+            "topic": TASKS_TOPIC,
+        },
+    )
 
-                    logger.debug(
-                        "Generating recommendations",
-                        extra={
-                            "user_tgid": tgid,
-                            "orders_count": user_stats["orders_count"],
-                        },
-                    )
 
-                    # Generate recommendations via Gemini API
-                    # Note: This assumes GeminiRecommendationService exists (subtask 3.2)
-                    # For now, create a mock structure until client.py is implemented
-                    try:
-                        from src.gemini.client import (
-                            get_recommendation_service,
-                        )
-
-                        recommendation_service = get_recommendation_service()
-                        recommendations = await recommendation_service.generate_recommendations(
-                            user_stats
-                        )
-                    except ImportError:
-                        # Fallback if client not implemented yet
-                        logger.warning(
-                            "GeminiRecommendationService not available, skipping user",
-                            extra={"user_tgid": tgid},
-                        )
-                        error_count += 1
-                        continue
-
-                    # Cache in Redis (TTL 24 hours)
-                    cache_key = f"recommendations:user:{tgid}"
-                    cache_data = {
-                        "summary": recommendations.get("summary"),
-                        "tips": recommendations.get("tips", []),
-                        "generated_at": datetime.now(timezone.utc).isoformat(),
-                    }
-
-                    await set_cache(cache_key, json.dumps(cache_data), ttl=86400)
-
-                    success_count += 1
-                    logger.info(
-                        "Generated recommendations for user",
-                        extra={
-                            "user_tgid": tgid,
-                            "summary_length": len(recommendations.get("summary", "")),
-                            "tips_count": len(recommendations.get("tips", [])),
-                        },
+async def resume_recommendations_batch():
+    """
+    Resume an unfinished batch run, e.g. after a worker restart.
+
+    Does nothing unless the latest run is running or stopped and younger
+    than RUN_MAX_AGE; older runs are left to the nightly job.
+    """
+    run = await get_resumable_run()
+    if run is None:
+        return
+    logger.info("Resuming unfinished recommendations batch", extra={"run_id": run.run_id})
+    await generate_recommendations_batch()
+
+
+async def schedule_batch_retry():
+    """
+    Schedule the batch for when the first exhausted API key's quota resets.
+
+    The stopped run is resumed then if it is still young enough, otherwise
+    a new run starts. Replicas that schedule the same retry are
+    deduplicated by the coordinator election.
+    """
+    delay = await get_key_pool().seconds_until_reset()
+    if delay is None:
+        logger.error("No Gemini API key quota is going to reset, batch retry not scheduled")
+        return
+
+    run_date = datetime.now(timezone.utc) + timedelta(seconds=delay + RETRY_MARGIN)
+    scheduler.add_job(
+        generate_recommendations_batch,
+        trigger="date",
+        run_date=run_date,
+        id="retry_recommendations",
+        replace_existing=True,
+    )
+    logger.info(
+        "Recommendations batch retry scheduled",
+        extra={"run_date": run_date.isoformat()},
+    )
+
+
+async def process_users(run: BatchRun, users: dict[int, dict]) -> None:
+    """
+    Generate recommendations for claimed users of a batch run.
+
+    Process:
+    1. Split users into packs of GEMINI_PACK_SIZE and send each pack as one
+       multi-user Gemini request; users whose result did not parse fall
+       back to single-user requests
+    2. Run packs concurrently: the number of workers is the number of
+       healthy API keys times GEMINI_MAX_IN_FLIGHT_PER_KEY, and the
+       recommendation service caps in-flight calls per key
+    3. Cache each result in Redis with TTL 24h and mark the user done;
+       users whose stats match an earlier prompt are answered from the
+       Gemini result cache
+    4. Log progress, throughput and result cache hit rate every
+       PROGRESS_LOG_INTERVAL users
+
+    If all API keys are exhausted, workers stop taking new users, the run
+    is left stopped and a retry is scheduled for the key quota reset. Individual user
+    errors are logged but don't stop the batch. Claims are refreshed while
+    the users are processed; claims of users that were not done are
+    released.
+    """
+    recommendation_service = get_recommendation_service()
+    progress = BatchProgress(len(users), recommendation_service.result_cache)
+    exhausted = asyncio.Event()
+    done: set[int] = set()
+
+    def stop_exhausted():
+        if not exhausted.is_set():
+            exhausted.set()
+            logger.error(
+                "All Gemini API keys exhausted, stopping batch",
+                extra={"run_id": run.run_id, **progress.summary()},
+            )
+
+    healthy_keys = await get_key_pool().healthy_keys_count()
+    if healthy_keys == 0:
+        stop_exhausted()
+        packs = []
+    else:
+        packs = list(iter_packs(users, settings.GEMINI_PACK_SIZE))
+    concurrency = min(len(packs), healthy_keys * settings.GEMINI_MAX_IN_FLIGHT_PER_KEY)
+    # Shared by all workers, so every pack is taken exactly once
+    pending = iter(packs)
+
+    async def run_worker():
+        for pack in pending:
+            if exhausted.is_set():
+                return
+            try:
+                packed = (
+                    await recommendation_service.generate_packed_recommendations(pack)
+                    if len(pack) > 1
+                    else {}
+                )
+            except AllKeysExhaustedException:
+                stop_exhausted()
+                return
+
+            for tgid, user_stats in pack.items():
+                try:
+                    recommendations = packed.get(tgid)
+                    await generate_for_user(
+                        recommendation_service, tgid, user_stats, recommendations
                     )
+                    await run.mark_done(tgid)
+                    done.add(tgid)
+                    progress.success_count += 1
+                    if recommendations is not None:
+                        progress.packed_count += 1
 
                 except AllKeysExhaustedException:
-                    logger.error(
-                        "All Gemini API keys exhausted, stopping batch",
-                        extra={
-                            "processed_users": success_count + error_count,
-                            "total_users": len(active_users),
-                            "success_count": success_count,
-                            "error_count": error_count,
-                        },
-                    )
-                    break
+                    stop_exhausted()
+                    return
 
                 except Exception as e:
-                    error_count += 1
+                    await run.mark_failed(tgid)
+                    progress.error_count += 1
                     logger.error(
                         "Failed to generate recommendations for user",
                         extra={
@@ -143,28 +422,136 @@ async def generate_recommendations_batch():
                         exc_info=True,
                     )
 
-            logger.info(
-                "Batch generation completed",
-                extra={
-                    "total_users": len(active_users),
-                    "success_count": success_count,
-                    "error_count": error_count,
-                    "success_rate": f"{success_count / len(active_users) * 100:.1f}%"
-                    if active_users
-                    else "0%",
-                },
-            )
+                if progress.processed % PROGRESS_LOG_INTERVAL == 0:
+                    logger.info("Batch progress", extra=progress.summary())
+
+    async def refresh_claims():
+        # Keeps the claims alive while this replica works on the users
+        while True:
+            await asyncio.sleep(CLAIM_REFRESH_INTERVAL)
+            await run.refresh_claims(users.keys() - done)
+
+    heartbeat = asyncio.create_task(refresh_claims())
+    try:
+        # A failing worker cancels its siblings, so no claim is released
+        # while another worker is still processing that user
+        async with asyncio.TaskGroup() as workers:
+            for _ in range(concurrency):
+                workers.create_task(run_worker())
+    finally:
+        heartbeat.cancel()
+        for tgid in users.keys() - done:
+            await run.release(tgid)
+
+    if exhausted.is_set():
+        await run.finish(STOPPED)
+        await schedule_batch_retry()
 
-        except Exception as e:
-            logger.error(
-                "Critical error in batch generation",
-                extra={"error": str(e)},
-                exc_info=True,
+    logger.info(
+        "Batch tasks processed",
+        extra={
+            "run_id": run.run_id,
+            **progress.summary(),
+            "concurrency": concurrency,
+        },
+    )
+
+    status = await run.status()
+    if status["status"] == RUNNING and status["remaining"] == 0:
+        await run.finish(COMPLETED)
+        logger.info(
+            "Batch generation completed",
+            extra={
+                **status,
+                "status": COMPLETED,
+                "success_rate": f"{status['done'] / status['total'] * 100:.1f}%",
+            },
+        )
+
+
+@broker.subscriber(
+    TASKS_TOPIC,
+    group_id=TASKS_GROUP,
+    batch=True,
+    max_records=TASKS_BATCH_SIZE,
+    ack_policy=AckPolicy.NACK_ON_ERROR,
+)
+async def handle_recommendation_tasks(tasks: list[dict], message: KafkaMessage = None):
+    """
+    Process a batch of per-user recommendation tasks.
+
+    All replicas consume TASKS_TOPIC in one consumer group, so each task is
+    delivered to one of them. Offsets are committed after the batch is
+    handled: tasks of a crashed replica are redelivered to another one, and
+    a batch whose handler raised (e.g. Redis unavailable) is rewound and
+    consumed again.
+
+    Every user is claimed before processing. A task whose user is done is
+    skipped; one whose claim is held waits until the owner finishes the user
+    (skipped) or its claim expires because the owner died (taken over). So
+    tasks delivered twice (redelivery, re-enqueued run) are processed once,
+    and no redelivered task is acked unprocessed.
+
+    Args:
+        tasks: RecommendationTaskEvent payloads
+        message: Consumed batch, injected by FastStream
+    """
+    try:
+        await process_tasks(tasks)
+    except Exception:
+        if message is not None:
+            rewind_batch(message)
+        raise
+
+
+def rewind_batch(message: KafkaMessage) -> None:
+    """
+    Seek every partition of a failed batch back to its first task.
+
+    FastStream's nack only rewinds the partition of the first record; tasks
+    of the other partitions would be committed by the next handled batch.
+    """
+    offsets: dict[TopicPartition, int] = {}
+    for record in message.raw_message:
+        partition = TopicPartition(record.topic, record.partition)
+        offsets[partition] = min(offsets.get(partition, record.offset), record.offset)
+    for partition, offset in offsets.items():
+        message.consumer.seek(partition, offset)
+
+
+async def process_tasks(tasks: list[dict]) -> None:
+    """Claim and process the users of a batch of tasks, grouped by run."""
+    users_by_run: dict[str, dict[int, dict]] = {}
+    for task in tasks:
+        event = RecommendationTaskEvent.model_validate(task)
+        users_by_run.setdefault(event.run_id, {})[event.tgid] = event.stats
+
+    for run_id, users in users_by_run.items():
+        run = await BatchRun.load(run_id)
+        if run is None:
+            logger.warning(
+                "Batch run expired, dropping tasks",
+                extra={"run_id": run_id, "tasks_count": len(users)},
+            )
+            continue
+
+        # A claim held elsewhere is waited for: it expires if its owner died
+        claims = await asyncio.gather(*(run.claim(tgid, wait=CLAIM_TTL) for tgid in users))
+        claimed = {
+            tgid: user_stats
+            for (tgid, user_stats), is_claimed in zip(users.items(), claims)
+            if is_claimed
+        }
+        if len(claimed) < len(users):
+            logger.info(
+                "Skipping users done or being processed by another worker",
+                extra={"run_id": run_id, "skipped_count": len(users) - len(claimed)},
             )
-            raise
+        if claimed:
+            await process_users(run, claimed)
 
 
-@broker.subscriber("lunch-bot.daily-tasks")
+@broker.subscriber("lunch-bot.daily-tasks", group_id=TASKS_GROUP)
 async def handle_daily_task(event: dict):
     """
     Alternative trigger: manual batch generation via Kafka event.
@@ -210,21 +597,40 @@ if __name__ == "__main__":
             id="daily_recommendations",
             replace_existing=True,
         )
+        scheduler.add_job(
+            roll_off_user_stats,
+            trigger="cron",
+            hour=0,
+            minute=5,
+            id="daily_user_stats_roll_off",
+            replace_existing=True,
+        )
         scheduler.start()
 
         logger.info(
             "Recommendations scheduler started",
             extra={
-                "schedule": "03:00 daily",
+                "schedule": "03:00 daily (stats roll-off 00:05)",
                 "kafka_broker": settings.KAFKA_BROKER_URL,
             },
         )
 
+        await ensure_tasks_topic()
         logger.info("Broker connecting to Kafka")
 
         async with broker:
             logger.info("Recommendations worker ready - waiting for messages")
 
+            # A run interrupted by a restart or exhausted keys carries on now
+            try:
+                await resume_recommendations_batch()
+            except Exception as e:
+                logger.error(
+                    "Failed to resume recommendations batch",
+                    extra={"error": str(e)},
+                    exc_info=True,
+                )
+
             # Create stop event
             stop_event = asyncio.Event()
 
@@ -245,6 +651,7 @@ if __name__ == "__main__":
         logger.info("Recommendations worker shutting down")
         if scheduler.running:
             scheduler.shutdown(wait=False)
+        await close_recommendation_service()
         await engine.dispose()
 
     asyncio.run(main())
@@ -0,0 +1,75 @@
+"""
+Rebuild order rollups from the orders table.
+
+OrderService keeps order_rollups (and the user stats projection) up to date
+on every write; this command recomputes them from scratch (after the
+migration, or to repair drift).
+
+Usage:
+    python -m workers.rollups [--cafe-id ID] [--date YYYY-MM-DD]
+    python -m workers.rollups --user-stats
+"""
+
+import argparse
+import asyncio
+import logging
+from datetime import date
+
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.config import settings
+from src.repositories.order_rollup import OrderRollupRepository
+from src.repositories.user_stats import UserStatsRepository
+
+logger = logging.getLogger(__name__)
+
+
+async def rebuild_rollups(
+    session: AsyncSession, cafe_id: int | None = None, order_date: date | None = None
+) -> int:
+    """Recompute rollups in a single transaction; returns number of rows written."""
+    rows = await OrderRollupRepository(session).rebuild(cafe_id=cafe_id, order_date=order_date)
+    await session.commit()
+    return rows
+
+
+async def rebuild_user_stats(session: AsyncSession) -> int:
+    """Recompute the 30-day user stats projection; returns number of daily rows written."""
+    rows = await UserStatsRepository(session).rebuild()
+    await session.commit()
+    return rows
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+
+    parser = argparse.ArgumentParser(description="Rebuild order rollups")
+    parser.add_argument("--cafe-id", type=int, default=None)
+    parser.add_argument("--date", type=date.fromisoformat, default=None)
+    parser.add_argument(
+        "--user-stats", action="store_true", help="Rebuild the user stats projection instead"
+    )
+    args = parser.parse_args()
+
+    async def main():
+        engine = create_async_engine(settings.DATABASE_URL, echo=False)
+        session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+        async with session_factory() as session:
+            if args.user_stats:
+                rows = await rebuild_user_stats(session)
+            else:
+                rows = await rebuild_rollups(session, cafe_id=args.cafe_id, order_date=args.date)
+        await engine.dispose()
+        if args.user_stats:
+            logger.info("User stats rebuilt", extra={"rows": rows})
+            return
+        logger.info(
+            "Order rollups rebuilt",
+            extra={"cafe_id": args.cafe_id, "date": args.date, "rows": rows},
+        )
+
+    asyncio.run(main())